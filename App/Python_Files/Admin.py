@@ -2,6 +2,18 @@ from flask import Blueprint, render_template, session, redirect, url_for, flash,
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from app.db import get_db_connection
+from app.notifications import enqueue_fanout, wake_fanout_worker, get_fanout_job, create_broadcast
+from app.admin_stats import get_dashboard_stats, invalidate_dashboard_stats
+from app.events_catalogue import invalidate_catalogue
+from app.dashboard_data import invalidate_all_dashboards
+from app.user_stats import record_completion, record_review
+from app.points_ledger import record_points, event_key, challenge_key
+from app.redemptions import approve_redemption, reject_redemption, set_reward_stock, VOUCHER_DAYS
+from app.search import event_match_ids, search_events, search_challenges, search_faqs
+from app.exports import EXPORTS, FORMATS, build_export_query, export_response
+from app.event_capacity import refresh_event_capacity, adjust_filled, fill_from_waitlist, expire_waitlist
+from app.live_chat import (notify_chat, stream_response, stream_cursor, fetch_messages, latest_message_id,
+                           conditional_json, record_message, mark_chat_read)
 from functools import wraps
 import os
 from datetime import datetime, timedelta
@@ -195,54 +207,48 @@ def admin_logout():
 @admin_bp.route('/dashboard')
 @admin_required
 def admin_dashboard():
-    """Admin dashboard with all features."""
-    conn = get_db_connection()
-    
-    # Pending users
-    pending_users = conn.execute(
-        "SELECT user_id, name, role, email, phone FROM user WHERE verification_status = 'pending'"
-    ).fetchall()
-    
-    # All users for points management
-    all_users = conn.execute(
-        "SELECT user_id, name, role, total_points FROM user ORDER BY total_points DESC"
-    ).fetchall()
-    
-    # All events
-    events = conn.execute(
-        """SELECT e.event_id, e.title, e.start_datetime, e.location, e.status, g.name as grc_name
-           FROM event e
-           LEFT JOIN grc g ON e.grc_id = g.grc_id
-           ORDER BY e.start_datetime DESC"""
-    ).fetchall()
-    
-    # GRCs for event creation form
-    grcs = conn.execute("SELECT grc_id, name FROM grc").fetchall()
-    
-    # Statistics for Dashboard Cards
-    total_users = len(all_users)
-    total_points = sum(user['total_points'] for user in all_users)
-    
-    current_open_tickets = conn.execute(
-        "SELECT COUNT(*) FROM support_ticket WHERE status = 'open'"
-    ).fetchone()[0]
-    
-    ongoing_events = conn.execute(
-        "SELECT COUNT(*) FROM event WHERE status = 'published'"
-    ).fetchone()[0]
-    
-    conn.close()
-    
+    """Admin dashboard cards (aggregates only; lists live on their own pages)."""
+    stats = get_dashboard_stats()
     return render_template('admin/admin_dashboard.html', 
                            # user_name and admin_email are now injected via context_processor
-                           total_users=total_users,
-                           total_points=total_points,
-                           current_open_tickets=current_open_tickets,
-                           ongoing_events=ongoing_events,
-                           events=events,
-                           pending_users=pending_users,
-                           all_users=all_users,
-                           grcs=grcs)
+                           stats=stats)
+
+
+@admin_bp.route('/api/dashboard-stats')
+@admin_required
+def admin_dashboard_stats():
+    """Dashboard KPIs as JSON (?refresh=1 bypasses the cache)."""
+    return jsonify(get_dashboard_stats(force=request.args.get('refresh') == '1'))
+
+
+@admin_bp.route('/api/search')
+@admin_required
+def admin_search():
+    """Ranked prefix search over events, challenges and FAQs of any status: ?q=&limit="""
+    text = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    
+    conn = get_db_connection()
+    results = {
+        'events': search_events(conn, text, statuses=None, limit=limit),
+        'challenges': search_challenges(conn, text, statuses=None, limit=limit),
+        'faqs': search_faqs(conn, text, active_only=False, limit=limit)
+    }
+    conn.close()
+    return jsonify(results)
+
+
+@admin_bp.after_request
+def refresh_stats_after_write(response):
+    """
+    Any admin write may change a dashboard number, so drop the cached snapshot.
+    Proof verification, challenge approvals, broadcasts and event changes reach
+    many users' dashboards too, so those are dropped as well.
+    """
+    if request.method == 'POST':
+        invalidate_dashboard_stats()
+        invalidate_all_dashboards()
+    return response
 
 # =====================================================
 # USER VERIFICATION / APPROVAL
@@ -336,24 +342,24 @@ def edit_user(user_id):
 @admin_required
 def add_points(user_id):
     """
-    Manually add points to a user's account.
-    Logs the transaction in 'points_transaction' table for audit.
+    Manually add (or, with a negative amount, deduct) points.
+    Goes through the points ledger; a form's idempotency_key makes resubmits no-ops.
     """
     points = int(request.form.get('points', 0))
     remarks = request.form.get('remarks', 'Admin adjustment')
+    token = request.form.get('idempotency_key')
     
     conn = get_db_connection()
-    conn.execute(
-        "UPDATE user SET total_points = total_points + ? WHERE user_id = ?",
-        (points, user_id)
-    )
-    conn.execute(
-        "INSERT INTO points_transaction (user_id, points_change, remarks) VALUES (?, ?, ?)",
-        (user_id, points, remarks)
-    )
+    result, _ = record_points(conn, user_id, points, 'adjustment',
+                              key=f"adjustment:{token}" if token else None, remarks=remarks)
     conn.commit()
     conn.close()
-    flash(f"Added {points} points.", "success")
+    if result == 'ok':
+        flash(f"Added {points} points.", "success")
+    elif result == 'duplicate':
+        flash("These points were already added.", "info")
+    else:
+        flash("User not found or not enough points to deduct.", "error")
     return redirect(url_for('admin.admin_dashboard'))
 
 # =====================================================
@@ -418,6 +424,7 @@ def create_event():
         "INSERT INTO event_role_requirement (event_id, role_type, required_count) VALUES (?, 'participant', ?)",
         (event_id, participant_capacity)
     )
+    refresh_event_capacity(conn, event_id)
     
     conn.commit()
     conn.close()
@@ -439,6 +446,7 @@ def admin_manage_events():
     """Display the event management page with filters."""
     filter_status = request.args.get('filter', 'pending')
     search_query = request.args.get('search', '').strip()
+    notification_job = get_fanout_job(request.args.get('job', type=int)) if request.args.get('job') else None
     
     conn = get_db_connection()
     
@@ -456,12 +464,13 @@ def admin_manage_events():
             e.description,
             e.grc_id,
             g.name as grc_name,
-            (SELECT COUNT(*) FROM event_booking eb WHERE eb.event_id = e.event_id AND eb.status = 'booked') as participant_count,
-            (SELECT COALESCE(SUM(required_count), 0) FROM event_role_requirement err WHERE err.event_id = e.event_id) as manpower_required,
-            (SELECT required_count FROM event_role_requirement err WHERE err.event_id = e.event_id AND err.role_type = 'teacher') as mentor_capacity,
-            (SELECT required_count FROM event_role_requirement err WHERE err.event_id = e.event_id AND err.role_type = 'participant') as participant_capacity
+            ecs.teacher_filled + ecs.participant_filled as participant_count,
+            ecs.teacher_required + ecs.participant_required as manpower_required,
+            ecs.teacher_required as mentor_capacity,
+            ecs.participant_required as participant_capacity
         FROM event e
         LEFT JOIN grc g ON e.grc_id = g.grc_id
+        LEFT JOIN event_capacity_summary ecs ON ecs.event_id = e.event_id
     """
     
     # Store parameters for the query
@@ -484,9 +493,12 @@ def admin_manage_events():
         where_clauses.append("e.status = 'voided' AND (e.void_reason IS NULL OR e.void_reason NOT LIKE '%[ARCHIVED]%')")
         
     # Apply Search Logic (if search_query exists)
-    if search_query:
-        where_clauses.append("(e.title LIKE ? OR e.location LIKE ?)")
-        params.extend([f'%{search_query}%', f'%{search_query}%'])
+    # Full-text prefix search over title, description and location (see search.py)
+    match = event_match_ids(search_query) if search_query else None
+    if match:
+        match_sql, match_params = match
+        where_clauses.append(f"e.event_id IN ({match_sql})")
+        params.extend(match_params)
     
     # Construct the full WHERE clause
     if where_clauses:
@@ -549,7 +561,8 @@ def admin_manage_events():
                            category_display=category_display,
                            current_filter=filter_status,
                            search_query=search_query,
-                           published_challenges=challenges_list)
+                           published_challenges=challenges_list,
+                           notification_job=notification_job)
 
 
 @admin_bp.route('/create-challenge')
@@ -660,6 +673,7 @@ def admin_update_challenge(challenge_id):
     )
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     
     flash("Challenge updated successfully.", "success")
     # Redirect to the same filter tab based on status? 
@@ -694,6 +708,7 @@ def admin_publish_challenge(challenge_id):
     )
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     flash("Challenge published!", "success")
     return redirect(url_for('admin.admin_manage_events', filter='approved'))
 
@@ -708,6 +723,7 @@ def admin_unpublish_challenge(challenge_id):
     )
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     flash("Challenge unpublished.", "success")
     return redirect(url_for('admin.admin_manage_events', filter='approved'))
 
@@ -719,6 +735,7 @@ def admin_delete_challenge(challenge_id):
     conn.execute("DELETE FROM challenge WHERE challenge_id = ?", (challenge_id,))
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     
     flash("Challenge deleted.", "success")
     return redirect(url_for('admin.admin_manage_events'))
@@ -742,26 +759,15 @@ def admin_void_challenge(challenge_id):
         (void_reason, challenge_id)
     )
     
-    # Create notifications for all users if checkbox is checked
-    notified_count = 0
+    # Broadcast to all users if checkbox is checked
     if notify_users:
-        # Fetch all users (youth and senior roles)
-        all_users = conn.execute("""
-            SELECT user_id, name, role 
-            FROM user 
-            WHERE role IN ('youth', 'senior')
-        """).fetchall()
-        
         notification_message = f"The challenge '{challenge_title}' has been cancelled."
-        for user in all_users:
-            conn.execute("""
-                INSERT INTO notification (user_id, message, challenge_id, created_at) 
-                VALUES (?, ?, ?, datetime('now'))
-            """, (user['user_id'], notification_message, challenge_id))
-            notified_count += 1
+        create_broadcast(conn, notification_message, audience='all',
+                         challenge_id=challenge_id, admin_id=session.get('admin_id'))
     
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     
     # No flash message - just redirect to voided tab
     return redirect(url_for('admin.admin_manage_events', filter='voided'))
@@ -783,21 +789,13 @@ def admin_end_challenge(challenge_id):
     )
     
     # Notify all users about challenge ending
-    all_users = conn.execute("""
-        SELECT user_id, name, role 
-        FROM user 
-        WHERE role IN ('youth', 'senior')
-    """).fetchall()
-    
     notification_message = f"The challenge '{challenge_title}' has ended."
-    for user in all_users:
-        conn.execute("""
-            INSERT INTO notification (user_id, message, challenge_id, created_at) 
-            VALUES (?, ?, ?, datetime('now'))
-        """, (user['user_id'], notification_message, challenge_id))
+    create_broadcast(conn, notification_message, audience='all',
+                     challenge_id=challenge_id, admin_id=session.get('admin_id'))
     
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     
     # No flash message - just redirect to ended tab (filter=past)
     return redirect(url_for('admin.admin_manage_events', filter='past'))
@@ -841,9 +839,13 @@ def admin_update_event(event_id):
     conn.execute("DELETE FROM event_role_requirement WHERE event_id = ? AND role_type IN ('teacher', 'participant')", (event_id,))
     conn.execute("INSERT INTO event_role_requirement (event_id, role_type, required_count) VALUES (?, 'teacher', ?)", (event_id, mentor_capacity))
     conn.execute("INSERT INTO event_role_requirement (event_id, role_type, required_count) VALUES (?, 'participant', ?)", (event_id, participant_capacity))
+    refresh_event_capacity(conn, event_id)
+    # Raised capacity goes to the people already waiting
+    fill_from_waitlist(conn, event_id)
     
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     
     flash("Event updated successfully.", "success")
     return redirect(url_for('admin.admin_manage_events'))
@@ -855,6 +857,7 @@ def admin_delete_event(event_id):
     """Delete an event permanently (only for pending events)."""
     conn = get_db_connection()
     conn.execute("DELETE FROM event WHERE event_id = ?", (event_id,))
+    conn.execute("DELETE FROM event_capacity_summary WHERE event_id = ?", (event_id,))
     conn.commit()
     conn.close()
     
@@ -884,6 +887,7 @@ def admin_publish_event(event_id):
     conn.execute("UPDATE event SET status = 'published', published_at = datetime('now') WHERE event_id = ?", (event_id,))
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     
     flash("Event published successfully! It is now visible to users.", "success")
     return redirect(url_for('admin.admin_manage_events', filter='approved'))
@@ -896,6 +900,7 @@ def admin_unpublish_event(event_id):
     conn.execute("UPDATE event SET status = 'approved', published_at = NULL WHERE event_id = ?", (event_id,))
     conn.commit()
     conn.close()
+    invalidate_catalogue()
     
     flash("Event unpublished. It is now hidden from users.", "success")
     return redirect(url_for('admin.admin_manage_events', filter='approved'))
@@ -907,6 +912,7 @@ def admin_void_event(event_id):
     """Void an approved event (approved -> voided)."""
     void_reason = request.form.get('void_reason', 'No reason provided')
     notify_users = request.form.get('notify_users') == 'yes'  # Check if checkbox is checked
+    audience = request.form.get('notify_audience', 'all')  # 'all' members or only 'booked' participants
     
     conn = get_db_connection()
     
@@ -925,31 +931,27 @@ def admin_void_event(event_id):
     
     # Update event status to voided
     conn.execute("UPDATE event SET status = 'voided', void_reason = ? WHERE event_id = ?", (void_reason, event_id))
+    expire_waitlist(conn, event_id)
     
-    # Create notifications only if checkbox is checked
-    # Create notifications only if checkbox is checked
-    notified_count = 0
+    # Notify only if checkbox is checked: one broadcast for everyone,
+    # or a personal notification per booked participant
+    job_id = None
     if notify_users:
-        # Fetch all users (youth and senior roles) to match Challenge workflow
-        all_users = conn.execute("""
-            SELECT user_id, name, role 
-            FROM user 
-            WHERE role IN ('youth', 'senior')
-        """).fetchall()
-
         notification_message = f"The event '{event_title}' has been cancelled by the organisers."
-        for user in all_users:
-            conn.execute("""
-                INSERT INTO notification (user_id, message, event_id, created_at) 
-                VALUES (?, ?, ?, datetime('now'))
-            """, (user['user_id'], notification_message, event_id))
-            notified_count += 1
+        if audience == 'booked':
+            job_id = enqueue_fanout(conn, notification_message, audience='booked',
+                                    event_id=event_id, admin_id=session.get('admin_id'))
+        else:
+            create_broadcast(conn, notification_message, audience='all',
+                             event_id=event_id, admin_id=session.get('admin_id'))
     
     conn.commit()
     conn.close()
+    invalidate_catalogue()
+    wake_fanout_worker()
     
     # Clean redirect without flash
-    return redirect(url_for('admin.admin_manage_events', filter='voided'))
+    return redirect(url_for('admin.admin_manage_events', filter='voided', job=job_id))
 
 
 @admin_bp.route('/event-cancellation-confirm')
@@ -972,6 +974,7 @@ def event_cancellation_confirm():
 @admin_required
 def admin_end_event(event_id):
     """End an approved event (approved -> ended/past)."""
+    audience = request.form.get('notify_audience', 'all')
     conn = get_db_connection()
     
     # Get event title and participants
@@ -980,26 +983,35 @@ def admin_end_event(event_id):
 
     # Update event status
     conn.execute("UPDATE event SET status = 'ended' WHERE event_id = ?", (event_id,))
+    expire_waitlist(conn, event_id)
 
-    # Notify ALL users (consistent with Challenges)
-    all_users = conn.execute("""
-        SELECT user_id, name, role 
-        FROM user 
-        WHERE role IN ('youth', 'senior')
-    """).fetchall()
-
+    # Notify ALL users by default (consistent with Challenges)
     message = f"The event '{event_title}' has ended. We hope you enjoyed it!"
-    for user in all_users:
-         conn.execute("""
-            INSERT INTO notification (user_id, message, event_id, created_at) 
-            VALUES (?, ?, ?, datetime('now'))
-        """, (user['user_id'], message, event_id))
+    job_id = None
+    if audience == 'booked':
+        job_id = enqueue_fanout(conn, message, audience='booked',
+                                event_id=event_id, admin_id=session.get('admin_id'))
+    else:
+        create_broadcast(conn, message, audience='all',
+                         event_id=event_id, admin_id=session.get('admin_id'))
 
     conn.commit()
     conn.close()
+    invalidate_catalogue()
+    wake_fanout_worker()
     
     # Clean redirect without flash
-    return redirect(url_for('admin.admin_manage_events', filter='past'))
+    return redirect(url_for('admin.admin_manage_events', filter='past', job=job_id))
+
+
+@admin_bp.route('/notification-jobs/<int:job_id>')
+@admin_required
+def admin_notification_job_status(job_id):
+    """Progress of a notification fan-out job (polled by the manage events page)."""
+    job = get_fanout_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
 
 @admin_bp.route('/clear-tab/<tab_name>', methods=['POST'])
@@ -1034,23 +1046,90 @@ def admin_clear_tab(tab_name):
 # =====================================================
 # USER MANAGEMENT PAGE
 # =====================================================
+USERS_PAGE_SIZE = 50
+
+# Filter tabs on the user management page -> SQL condition
+USER_FILTERS = {
+    'all': None,
+    'senior': "role = 'senior'",
+    'youth': "role = 'youth'",
+    'unverified': "verification_status != 'verified'",
+}
+
+
+def fetch_users_page(conn, filter_name='all', search='', cursor=None, limit=USERS_PAGE_SIZE):
+    """
+    One page of users, newest first, using keyset pagination on (created_at, user_id).
+
+    `cursor` is the next_cursor returned for the previous page ("<created_at>|<user_id>").
+    Returns (users, next_cursor); next_cursor is None on the last page.
+    """
+    where = []
+    params = []
+
+    if USER_FILTERS.get(filter_name):
+        where.append(USER_FILTERS[filter_name])
+    if search:
+        where.append("name LIKE ?")
+        params.append(f'%{search}%')
+    if cursor:
+        created_at, _, last_id = cursor.rpartition('|')
+        if created_at and last_id.isdigit():
+            where.append("(created_at, user_id) < (?, ?)")
+            params.extend([created_at, int(last_id)])
+
+    query = """SELECT user_id, name, email, phone, role, verification_status, total_points,
+                      created_at, birth_date, language_pref, profession, verification_photo
+               FROM user"""
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY created_at DESC, user_id DESC LIMIT ?"
+    params.append(limit + 1)  # one extra row tells us whether there is another page
+
+    rows = conn.execute(query, params).fetchall()
+    users = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = f"{users[-1]['created_at']}|{users[-1]['user_id']}"
+    return users, next_cursor
+
+
 @admin_bp.route('/manage-users')
 @admin_required
 def admin_manage_users():
-    """Display the user management page."""
+    """Display the user management page (first page; the rest is loaded via /admin/api/users)."""
+    filter_name = request.args.get('filter', 'all')
+    search = request.args.get('search', '').strip()
+    
     conn = get_db_connection()
+    users, next_cursor = fetch_users_page(conn, filter_name, search)
+    conn.close()
     
-    # Get all users with extended details for the new UI including verification_photo
-    all_users = conn.execute(
-        """SELECT user_id, name, email, phone, role, verification_status, total_points, 
-                  created_at, birth_date, language_pref, profession, verification_photo
-           FROM user ORDER BY created_at DESC"""
-    ).fetchall()
+    return render_template('admin/admin_manage_users.html',
+                           all_users=users,
+                           next_cursor=next_cursor,
+                           current_filter=filter_name if filter_name in USER_FILTERS else 'all',
+                           search_query=search)
+
+
+@admin_bp.route('/api/users')
+@admin_required
+def admin_users_api():
+    """Next page of the user table as rendered rows: ?filter=&search=&cursor=&limit="""
+    filter_name = request.args.get('filter', 'all')
+    search = request.args.get('search', '').strip()
+    cursor = request.args.get('cursor') or None
+    limit = min(max(request.args.get('limit', USERS_PAGE_SIZE, type=int), 1), 200)
     
+    conn = get_db_connection()
+    users, next_cursor = fetch_users_page(conn, filter_name, search, cursor, limit)
     conn.close()
     
-    return render_template('admin/admin_manage_users.html',
-                           all_users=all_users)
+    return jsonify({
+        'html': render_template('admin/admin_user_rows.html', users=users),
+        'count': len(users),
+        'next_cursor': next_cursor
+    })
 
 
 @admin_bp.route('/verify-user/<int:user_id>', methods=['POST'])
@@ -1167,19 +1246,6 @@ def admin_support_tickets():
     filter_status = request.args.get('filter', 'all')
     
     conn = get_db_connection()
-
-    # --- SELF-REPAIR: Ensure columns exist ---
-    try:
-        conn.execute("ALTER TABLE support_ticket ADD COLUMN screenshot_path TEXT")
-        conn.commit()
-    except:
-        pass # Column likely exists
-
-    try:
-        conn.execute("ALTER TABLE support_ticket ADD COLUMN event_name TEXT")
-        conn.commit()
-    except:
-        pass # Column likely exists
     
     # 2. Build the base query
     query = """SELECT st.ticket_id, st.subject, st.description, st.status, st.created_at, st.screenshot_path,
@@ -1347,7 +1413,7 @@ def admin_manage_rewards():
             u.total_points as user_points,
             r.reward_id,
             r.name as reward_name,
-            r.points_required
+            COALESCE(rr.points_spent, r.points_required) as points_required
         FROM reward_redemption rr
         JOIN user u ON rr.user_id = u.user_id
         JOIN reward r ON rr.reward_id = r.reward_id
@@ -1390,20 +1456,31 @@ def admin_verify_proof(event_id, user_id):
     
     # 1. Get points to award
     # For now assuming base_points_participant. In future could be dynamic based on role.
-    event = conn.execute("SELECT base_points_participant FROM event WHERE event_id = ?", (event_id,)).fetchone()
+    event = conn.execute("SELECT title, base_points_participant FROM event WHERE event_id = ?", (event_id,)).fetchone()
     points = event['base_points_participant'] if event and event['base_points_participant'] else 100 # Default
     
     # 2. Update status to completed
+    booking = conn.execute("SELECT role_type, status FROM event_booking WHERE event_id = ? AND user_id = ?",
+                           (event_id, user_id)).fetchone()
     conn.execute("UPDATE event_booking SET status = 'completed' WHERE event_id = ? AND user_id = ?", 
                  (event_id, user_id))
+    if booking and booking['status'] == 'booked' and booking['role_type'] in ('teacher', 'participant'):
+        adjust_filled(conn, event_id, booking['role_type'], -1)
+    if booking and booking['status'] != 'completed':
+        record_completion(conn, user_id, event_id)
                  
-    # 3. Award points to user
-    conn.execute("UPDATE user SET total_points = total_points + ? WHERE user_id = ?", (points, user_id))
+    # 3. Award points to user (once per booking, however often this is clicked)
+    result, _ = record_points(conn, user_id, points, 'event', key=event_key(event_id, user_id),
+                              remarks=f"Event completed: {event['title']}" if event else "Event completed",
+                              event_id=event_id)
     
     conn.commit()
     conn.close()
     
-    flash(f"Proof verified! Awarded {points} points.", "success")
+    if result == 'ok':
+        flash(f"Proof verified! Awarded {points} points.", "success")
+    else:
+        flash("Proof verified. Points were already awarded for this event.", "info")
     return redirect(url_for('admin.admin_manage_rewards'))
 
 @admin_bp.route('/reject-proof/<int:event_id>/<int:user_id>', methods=['POST'])
@@ -1431,10 +1508,12 @@ def admin_reject_proof(event_id, user_id):
     )
     
     # Also delete the review if exists (so they have to resubmit both)
-    conn.execute(
+    deleted = conn.execute(
         "DELETE FROM review WHERE event_id = ? AND user_id = ?",
         (event_id, user_id)
-    )
+    ).rowcount
+    if deleted:
+        record_review(conn, user_id, -deleted)
     
     conn.commit()
     conn.close()
@@ -1483,27 +1562,14 @@ def admin_approve_challenge_proof(completion_id):
     
     # Only award points if target is reached
     if approved_count >= target:
-        # Check if points were already awarded for this challenge
-        existing_transaction = conn.execute("""
-            SELECT transaction_id FROM points_transaction
-            WHERE user_id = ? AND remarks LIKE ?
-        """, (completion['user_id'], f"Challenge completed: {completion['title']}%")).fetchone()
+        # Award points once per user and challenge (the idempotency key is the "already awarded" check)
+        result, _ = record_points(conn, completion['user_id'], points, 'challenge',
+                                  key=challenge_key(completion['challenge_id'], completion['user_id']),
+                                  remarks=f"Challenge completed: {completion['title']}",
+                                  challenge_id=completion['challenge_id'])
+        conn.commit()
         
-        if not existing_transaction:
-            # Award points
-            conn.execute("""
-                UPDATE user 
-                SET total_points = total_points + ? 
-                WHERE user_id = ?
-            """, (points, completion['user_id']))
-            
-            # Log transaction
-            conn.execute("""
-                INSERT INTO points_transaction (user_id, points_change, remarks)
-                VALUES (?, ?, ?)
-            """, (completion['user_id'], points, f"Challenge completed: {completion['title']}"))
-            
-            conn.commit()
+        if result == 'ok':
             flash(f"Challenge proof approved! Target reached ({approved_count}/{target}). {points} points awarded!", "success")
         else:
             flash(f"Challenge proof approved! Progress: {approved_count}/{target}. Points already awarded.", "info")
@@ -1605,21 +1671,41 @@ def admin_edit_reward(reward_id):
     name = request.form.get('name')
     description = request.form.get('description')
     points_required = request.form.get('points_required')
-    total_quantity = request.form.get('total_quantity') or None
     is_active = request.form.get('is_active') == 'on'
     
     if not name or not points_required:
         flash("Reward name and points are required.", "error")
         return redirect(url_for('admin.admin_manage_rewards'))
     
-    conn = get_db_connection()
-    conn.execute("""
-        UPDATE reward 
-        SET name = ?, description = ?, points_required = ?, total_quantity = ?, is_active = ?
-        WHERE reward_id = ?
-    """, (name, description, int(points_required), total_quantity, 1 if is_active else 0, reward_id))
+    # Stock as typed and as the page showed it (blank = unlimited); users may have
+    # reserved units since, so only the difference is applied
+    try:
+        total_quantity = int(request.form['total_quantity']) if request.form.get('total_quantity') else None
+        loaded_quantity = int(request.form['loaded_quantity']) if request.form.get('loaded_quantity') else None
+    except ValueError:
+        flash("Quantity must be a whole number.", "error")
+        return redirect(url_for('admin.admin_manage_rewards'))
+    if total_quantity is not None and total_quantity < 0:
+        flash("Quantity cannot be negative.", "error")
+        return redirect(url_for('admin.admin_manage_rewards'))
     
-    conn.commit()
+    conn = get_db_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("""
+            UPDATE reward 
+            SET name = ?, description = ?, points_required = ?, is_active = ?
+            WHERE reward_id = ?
+        """, (name, description, int(points_required), 1 if is_active else 0, reward_id))
+        if not set_reward_stock(conn, reward_id, loaded_quantity, total_quantity):
+            conn.rollback()
+            conn.close()
+            flash("This reward's stock was changed while you were editing. Please reload and try again.", "error")
+            return redirect(url_for('admin.admin_manage_rewards'))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     conn.close()
     
     flash(f"Reward updated successfully!", "success")
@@ -1629,76 +1715,19 @@ def admin_edit_reward(reward_id):
 @admin_bp.route('/approve-redemption/<int:redemption_id>', methods=['POST'])
 @admin_required
 def admin_approve_redemption(redemption_id):
-    """Approve a reward redemption request."""
-    conn = get_db_connection()
-    
-    # Get redemption details including reward_id and quantity
-    redemption = conn.execute("""
-        SELECT rr.user_id, rr.reward_id, r.points_required, r.name, r.total_quantity, u.total_points
-        FROM reward_redemption rr
-        JOIN reward r ON rr.reward_id = r.reward_id
-        JOIN user u ON rr.user_id = u.user_id
-        WHERE rr.redemption_id = ?
-    """, (redemption_id,)).fetchone()
+    """Approve a reward redemption request (stock and points were reserved when it was made)."""
+    result, redemption = approve_redemption(get_db_connection(), redemption_id)
     
-    if not redemption:
+    if result == 'not_found':
         flash("Redemption not found.", "error")
-        conn.close()
-        return redirect(url_for('admin.admin_manage_rewards'))
-    
-    # Check if user still has enough points
-    if redemption['total_points'] < redemption['points_required']:
-        flash(f"User doesn't have enough points for {redemption['name']}.", "error")
-        conn.close()
-        return redirect(url_for('admin.admin_manage_rewards'))
-    
-    # Check if reward still has quantity available (if quantity is tracked)
-    if redemption['total_quantity'] is not None and redemption['total_quantity'] <= 0:
+    elif result == 'already_decided':
+        flash("This redemption has already been handled.", "info")
+    elif result == 'out_of_stock':
         flash(f"'{redemption['name']}' is out of stock.", "error")
-        conn.close()
-        return redirect(url_for('admin.admin_manage_rewards'))
-    
-    # Deduct points from user
-    conn.execute("""
-        UPDATE user 
-        SET total_points = total_points - ? 
-        WHERE user_id = ?
-    """, (redemption['points_required'], redemption['user_id']))
-    
-    # Update redemption status to approved and set expiry date (30 days from now)
-    from datetime import datetime, timedelta
-    expiry_date = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-    
-    conn.execute("""
-        UPDATE reward_redemption 
-        SET status = 'approved', expiry_date = ?
-        WHERE redemption_id = ?
-    """, (expiry_date, redemption_id))
-    
-    # Decrement reward quantity if it's tracked (not NULL)
-    if redemption['total_quantity'] is not None:
-        new_quantity = redemption['total_quantity'] - 1
-        
-        # If quantity reaches 0, also deactivate the reward
-        if new_quantity <= 0:
-            conn.execute("""
-                UPDATE reward 
-                SET total_quantity = 0, is_active = 0 
-                WHERE reward_id = ?
-            """, (redemption['reward_id'],))
-            flash(f"Reward redemption approved! '{redemption['name']}' is now out of stock and has been deactivated.", "success")
-        else:
-            conn.execute("""
-                UPDATE reward 
-                SET total_quantity = ? 
-                WHERE reward_id = ?
-            """, (new_quantity, redemption['reward_id']))
-            flash(f"Reward redemption approved! {redemption['points_required']} points deducted. {new_quantity} remaining.", "success")
+    elif result == 'insufficient':
+        flash(f"User doesn't have enough points for {redemption['name']}.", "error")
     else:
-        flash(f"Reward redemption approved! {redemption['points_required']} points deducted.", "success")
-    
-    conn.commit()
-    conn.close()
+        flash(f"Reward redemption approved! '{redemption['name']}' voucher is valid for {VOUCHER_DAYS} days.", "success")
     
     return redirect(url_for('admin.admin_manage_rewards'))
 
@@ -1706,33 +1735,45 @@ def admin_approve_redemption(redemption_id):
 @admin_bp.route('/reject-redemption/<int:redemption_id>', methods=['POST'])
 @admin_required
 def admin_reject_redemption(redemption_id):
-    """Reject a reward redemption request."""
-    conn = get_db_connection()
-    
-    # Get redemption details for flash message
-    redemption = conn.execute("""
-        SELECT r.name
-        FROM reward_redemption rr
-        JOIN reward r ON rr.reward_id = r.reward_id
-        WHERE rr.redemption_id = ?
-    """, (redemption_id,)).fetchone()
-    
-    reward_name = redemption['name'] if redemption else 'Unknown'
-    
-    # Delete the redemption request (or could set status to 'rejected')
-    conn.execute("""
-        DELETE FROM reward_redemption 
-        WHERE redemption_id = ?
-    """, (redemption_id,))
+    """Reject a reward redemption request; its stock goes back and its points are refunded."""
+    result, redemption = reject_redemption(get_db_connection(), redemption_id)
     
-    conn.commit()
-    conn.close()
-    
-    flash(f"Redemption for '{reward_name}' rejected.", "info")
+    if result == 'not_found':
+        flash("Redemption not found.", "error")
+    elif result == 'already_decided':
+        flash("This redemption has already been handled.", "info")
+    else:
+        flash(f"Redemption for '{redemption['name']}' rejected.", "info")
     return redirect(url_for('admin.admin_manage_rewards'))
 
 
 
+# =====================================================
+# DATA EXPORTS
+# =====================================================
+@admin_bp.route('/export/<dataset>')
+@admin_required
+def admin_export(dataset):
+    """
+    Stream a dataset as a CSV or NDJSON download (see exports.py).
+    
+    /admin/export/participants?event_id=&status=
+    /admin/export/redemptions?status=
+    /admin/export/points?user_id=
+    /admin/export/tickets?status=
+    Add &format=ndjson for newline-delimited JSON (default csv).
+    """
+    fmt = request.args.get('format', 'csv')
+    if dataset not in EXPORTS or fmt not in FORMATS:
+        return jsonify({'success': False, 'message': 'Unknown export'}), 404
+    try:
+        sql, params = build_export_query(dataset, request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return export_response(dataset, fmt, sql, params)
+
+
 # =====================================================
 # VIEW EVENT PARTICIPANTS
 # =====================================================
@@ -1825,8 +1866,7 @@ def admin_live_chats():
         chats = conn.execute(
             """SELECT cs.session_id, cs.user_id, cs.status, cs.created_at, cs.last_message_at,
                       u.name as user_name,
-                      (SELECT message_text FROM live_chat_message WHERE session_id = cs.session_id ORDER BY created_at DESC LIMIT 1) as last_message,
-                      (SELECT COUNT(*) FROM live_chat_message WHERE session_id = cs.session_id) as message_count
+                      cs.last_message_text as last_message, cs.message_count, cs.unread_by_admin as unread_count
                FROM live_chat_session cs
                JOIN user u ON cs.user_id = u.user_id
                ORDER BY cs.last_message_at DESC"""
@@ -1894,13 +1934,16 @@ def get_chat_details(session_id):
         result['locked_by_admin'] = chat['connected_admin_name']
         return jsonify(result)
     
-    # Mark this admin as connected
+    # Mark this admin as connected (opening the chat also reads it)
     conn.execute(
         "UPDATE live_chat_session SET admin_connected = 1, connected_admin_id = ? WHERE session_id = ?",
         (admin_id, session_id)
     )
+    mark_chat_read(conn, session_id, 'admin')
     conn.commit()
     conn.close()
+    if not chat['admin_connected']:
+        notify_chat(session_id)
     
     result = dict(chat)
     result['is_locked'] = False
@@ -1909,21 +1952,30 @@ def get_chat_details(session_id):
 @admin_bp.route('/get-chat-messages/<int:session_id>')
 @admin_required
 def get_chat_messages(session_id):
-    """Get all messages for a chat session"""
+    """Get messages for a chat session (only those after ?after_message_id= if given)"""
     conn = get_db_connection()
+    after_id = request.args.get('after_message_id', 0, type=int)
+    last_id = latest_message_id(conn, session_id)
     
-    messages = conn.execute(
-        """SELECT m.*, u.name as sender_name
-           FROM live_chat_message m
-           LEFT JOIN user u ON m.sender_id = u.user_id AND m.sender_type = 'user'
-           WHERE m.session_id = ?
-           ORDER BY m.created_at ASC""",
-        (session_id,)
-    ).fetchall()
+    # New messages are being handed to the admin - they have read them now
+    if last_id > after_id:
+        mark_chat_read(conn, session_id, 'admin')
+        conn.commit()
     
-    conn.close()
+    etag = f"admin-chat-{session_id}-{after_id}-{last_id}"
+    response = conditional_json(request, etag, lambda: {
+        'messages': fetch_messages(conn, session_id, after_id),
+        'last_message_id': last_id
+    })
     
-    return jsonify({'messages': [dict(m) for m in messages]})
+    conn.close()
+    return response
+
+@admin_bp.route('/chat-stream/<int:session_id>')
+@admin_required
+def admin_chat_stream(session_id):
+    """Server-Sent Events stream of new messages for a chat session"""
+    return stream_response(session_id, stream_cursor(request), reader='admin')
 
 @admin_bp.route('/send-chat-message', methods=['POST'])
 @admin_required
@@ -1965,20 +2017,12 @@ def send_chat_message():
         (admin_id, session_id)
     )
     
-    # Insert admin message
-    conn.execute(
-        "INSERT INTO live_chat_message (session_id, sender_type, sender_id, message_text) VALUES (?, 'admin', ?, ?)",
-        (session_id, admin_id, message_text)
-    )
-    
-    # Update last_message_at
-    conn.execute(
-        "UPDATE live_chat_session SET last_message_at = CURRENT_TIMESTAMP WHERE session_id = ?",
-        (session_id,)
-    )
+    # Insert admin message and update the session summary (last message, counters)
+    record_message(conn, session_id, 'admin', admin_id, message_text)
     
     conn.commit()
     conn.close()
+    notify_chat(session_id)
     
     return jsonify({'status': 'sent'})
 
@@ -1996,6 +2040,7 @@ def close_chat_session(session_id):
     
     conn.commit()
     conn.close()
+    notify_chat(session_id)
     
     return jsonify({'status': 'closed'})
 
@@ -2012,6 +2057,7 @@ def reopen_chat_session(session_id):
     
     conn.commit()
     conn.close()
+    notify_chat(session_id)
     
     return jsonify({'status': 'reopened'})
 
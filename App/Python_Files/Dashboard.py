@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request
 from app.db import get_db_connection
+from app.notifications import mark_broadcast_read
+from app.dashboard_data import get_dashboard_bundle, invalidate_dashboard
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -23,122 +25,28 @@ def dashboard():
     role = session.get('user_role')
     user_id = session.get('user_id')
     
-    # Verify user exists in DB to prevent stale sessions
+    # Whole dashboard in one cached bundle; also verifies the user exists (stale sessions)
     conn = get_db_connection()
-    user = conn.execute("SELECT * FROM user WHERE user_id = ?", (user_id,)).fetchone()
-    if not user:
-        conn.close()
+    bundle = get_dashboard_bundle(conn, user_id)
+    conn.close()
+    if not bundle:
         session.clear()
         flash("Session expired. Please log in again.", "warning")
         return redirect(url_for('home.login_page'))
-    
-    # Mock/Default User Object to satisfy template (Merge DB data with mocks if needed)
-    # Using real name from DB
+
+    # Impact numbers come from the user_stats rollup (see app/user_stats.py)
+    user = bundle['user']
     user_data = {
         'name': user['name'],
         'points': user['total_points'],
-        'events_completed': 12, # Still mock for now
-        'total_hours': 45,      # Still mock for now
-        'impact_score': 98,      # Still mock for now
+        'events_completed': user['events_completed'],
+        'total_hours': f"{user['total_hours']:g}",
+        'impact_score': user['impact_score'],
         'profile_photo': user['profile_photo']
     }
-
-    # Get user's real upcoming events from event_booking table
-    upcoming_events_raw = conn.execute('''
-        SELECT 
-            e.event_id,
-            e.title,
-            e.start_datetime,
-            e.location,
-            e.category,
-            eb.role_type,
-            eb.status
-        FROM event_booking eb
-        JOIN event e ON eb.event_id = e.event_id
-        WHERE eb.user_id = ? 
-          AND eb.status = 'booked'
-          AND e.status NOT IN ('voided', 'cancelled')
-          AND datetime(e.start_datetime) > datetime('now')
-        ORDER BY e.start_datetime ASC
-        LIMIT 5
-    ''', (user_id,)).fetchall()
-    
-    # Format events for template
-    upcoming_events = []
-    for event in upcoming_events_raw:
-        # Parse datetime
-        datetime_str = event['start_datetime']
-        date_part = datetime_str.split(' ')[0] if ' ' in datetime_str else datetime_str
-        time_part = datetime_str.split(' ')[1][:5] if ' ' in datetime_str else ''
-        
-        upcoming_events.append({
-            'id': event['event_id'],
-            'title': event['title'],
-            'date': date_part,
-            'time': time_part,
-            'location': event['location'],
-            'category': event['category'],
-            'role': event['role_type']  # 'teacher' or 'participant'
-        })
-    
-    
-    notifications_rows = conn.execute('''
-        SELECT notification_id, message, created_at, event_id, challenge_id 
-        FROM notification 
-        WHERE user_id = ? AND is_read = 0 
-        ORDER BY created_at DESC
-    ''', (user_id,)).fetchall()
-
-    notifications = [dict(row) for row in notifications_rows]
-
-    # Fetch Active/Published Challenges with Progress
-    challenges_raw = conn.execute('''
-        SELECT 
-            c.challenge_id,
-            c.title,
-            c.description,
-            c.start_date,
-            c.end_date,
-            c.bonus_points,
-            c.target_count,
-            c.status,
-            (SELECT COUNT(*) 
-             FROM user_challenge uc
-             WHERE uc.user_id = ? 
-               AND uc.challenge_id = c.challenge_id
-               AND uc.status = 'approved'
-            ) as progress_count
-        FROM challenge c
-        WHERE c.status IN ('active', 'published')
-        ORDER BY c.end_date ASC
-    ''', (user_id,)).fetchall()
-
-    challenges = []
-    from datetime import datetime
-    for c in challenges_raw:
-        # Calculate days left
-        try:
-            end_date = datetime.strptime(c['end_date'], '%Y-%m-%d')
-            days_left = (end_date - datetime.now()).days
-            if days_left < 0:
-                time_str = "Ended"
-            else:
-                time_str = f"Ends in {days_left} days"
-        except:
-            time_str = c['end_date']
-
-        challenges.append({
-            'id': c['challenge_id'],
-            'title': c['title'],
-            'description': c['description'],
-            'bonus_points': c['bonus_points'],
-            'target_count': c['target_count'] or 1,
-            'progress': c['progress_count'],
-            'time_left': time_str,
-            'status': 'Completed' if c['progress_count'] >= (c['target_count'] or 1) else 'In Progress'
-        })
-    
-    conn.close()
+    upcoming_events = bundle['upcoming_events']
+    notifications = bundle['notifications']
+    challenges = bundle['challenges']
 
     if role == 'admin':
         return redirect(url_for('admin.admin_dashboard'))
@@ -163,26 +71,32 @@ def dashboard():
 
 
 @dashboard_bp.route('/notification/<int:notification_id>/dismiss', methods=['POST'])
-def dismiss_notification(notification_id):
+@dashboard_bp.route('/notification/broadcast/<int:broadcast_id>/dismiss', methods=['POST'])
+def dismiss_notification(notification_id=None, broadcast_id=None):
     """
     API Endpoint: Dismiss a notification.
-    Marks the notification as read via AJAX.
+    Marks the notification (or broadcast, for this user only) as read via AJAX.
     """
     if 'user_id' not in session:
         return {'status': 'error', 'message': 'Unauthorized'}, 401
     
     user_id = session.get('user_id')
     conn = get_db_connection()
-    # Ensure user owns this notification
-    conn.execute("UPDATE notification SET is_read = 1 WHERE notification_id = ? AND user_id = ?", 
-                 (notification_id, user_id))
+    if broadcast_id is not None:
+        mark_broadcast_read(conn, broadcast_id, user_id)
+    else:
+        # Ensure user owns this notification
+        conn.execute("UPDATE notification SET is_read = 1 WHERE notification_id = ? AND user_id = ?", 
+                     (notification_id, user_id))
     conn.commit()
     conn.close()
+    invalidate_dashboard(user_id)
     return {'status': 'success'}
 
 
 @dashboard_bp.route('/notification/<int:notification_id>/view')
-def view_notification_details(notification_id):
+@dashboard_bp.route('/notification/broadcast/<int:broadcast_id>/view')
+def view_notification_details(notification_id=None, broadcast_id=None):
     """
     Handle notification click.
     Marks as read and redirects to relevant page (e.g., Event Details or Challenge Details).
@@ -195,13 +109,21 @@ def view_notification_details(notification_id):
     conn = get_db_connection()
     
     # Get notification details
-    note = conn.execute("SELECT event_id, challenge_id FROM notification WHERE notification_id = ? AND user_id = ?", 
-                       (notification_id, user_id)).fetchone()
+    if broadcast_id is not None:
+        note = conn.execute("SELECT event_id, challenge_id FROM notification_broadcast WHERE broadcast_id = ?", 
+                           (broadcast_id,)).fetchone()
+    else:
+        note = conn.execute("SELECT event_id, challenge_id FROM notification WHERE notification_id = ? AND user_id = ?", 
+                           (notification_id, user_id)).fetchone()
     
     if note:
         # Mark as read
-        conn.execute("UPDATE notification SET is_read = 1 WHERE notification_id = ?", (notification_id,))
+        if broadcast_id is not None:
+            mark_broadcast_read(conn, broadcast_id, user_id)
+        else:
+            conn.execute("UPDATE notification SET is_read = 1 WHERE notification_id = ?", (notification_id,))
         conn.commit()
+        invalidate_dashboard(user_id)
         
         # Check challenge_id first (use bracket notation for Row objects)
         challenge_id = note['challenge_id'] if note['challenge_id'] else None
@@ -231,11 +153,15 @@ def challenge_details(challenge_id):
     user_role = session.get('user_role')
     conn = get_db_connection()
     
-    # Get challenge details
-    challenge = conn.execute(
-        "SELECT * FROM challenge WHERE challenge_id = ?",
-        (challenge_id,)
-    ).fetchone()
+    # Get challenge details (day offsets worked out in SQL; the scheduler ends challenges past their end_date)
+    challenge = conn.execute("""
+        SELECT c.*,
+               julianday(c.start_date) - julianday('now', 'localtime') AS days_to_start,
+               julianday(c.end_date) - julianday('now', 'localtime') AS days_to_end,
+               julianday('now', 'localtime') - julianday(c.published_at) < 8 AS is_new
+        FROM challenge c
+        WHERE c.challenge_id = ?
+    """, (challenge_id,)).fetchone()
     
     if not challenge:
         conn.close()
@@ -308,46 +234,28 @@ def challenge_details(challenge_id):
     ''', (user_id, challenge['start_date'], challenge['end_date'])).fetchone()['count']
     
     # Determine challenge status
-    from datetime import datetime
-    try:
-        # Try parsing with time first, then fallback to just date
-        try:
-            start_date = datetime.strptime(challenge['start_date'], '%Y-%m-%d %H:%M')
-            end_date = datetime.strptime(challenge['end_date'], '%Y-%m-%d %H:%M')
-        except ValueError:
-            try:
-                start_date = datetime.strptime(challenge['start_date'], '%Y-%m-%d')
-                end_date = datetime.strptime(challenge['end_date'], '%Y-%m-%d')
-            except ValueError:
-                 # Try with seconds if present
-                start_date = datetime.strptime(challenge['start_date'], '%Y-%m-%d %H:%M:%S')
-                end_date = datetime.strptime(challenge['end_date'], '%Y-%m-%d %H:%M:%S')
-
-        now = datetime.now()
-        
-        if now < start_date:
-            status = 'Not Yet Started'
-            days_until = (start_date - now).days
-            if days_until == 0:
-                 hours_until = int((start_date - now).seconds / 3600)
-                 time_left = f"Starts in {hours_until} hours"
-            else:
-                 time_left = f"Starts in {days_until} days"
-        elif now > end_date:
-            status = 'Ended'
-            time_left = "Challenge has ended"
-        else:
-            status = 'Active'
-            days_left = (end_date - now).days
-            if days_left == 0:
-                 hours_left = int((end_date - now).seconds / 3600)
-                 time_left = f"{hours_left} hours remaining"
-            else:
-                 time_left = f"{days_left} days remaining"
-    except Exception as e:
-        print(f"Date parsing error: {e}")
+    if challenge['days_to_start'] is None or challenge['days_to_end'] is None:
+        # Unparseable dates: treat as running
         status = 'Active'
         time_left = challenge['end_date']
+    elif challenge['days_to_start'] > 0:
+        status = 'Not Yet Started'
+        days_until = int(challenge['days_to_start'])
+        if days_until == 0:
+             time_left = f"Starts in {int(challenge['days_to_start'] * 24)} hours"
+        else:
+             time_left = f"Starts in {days_until} days"
+    elif challenge['days_to_end'] < 0:
+        # Past its end but the scheduler has not ended it yet
+        status = 'Ended'
+        time_left = "Challenge has ended"
+    else:
+        status = 'Active'
+        days_left = int(challenge['days_to_end'])
+        if days_left == 0:
+             time_left = f"{int(challenge['days_to_end'] * 24)} hours remaining"
+        else:
+             time_left = f"{days_left} days remaining"
     
     # Check if challenge has Ended - if so, show ended page (reusing cancelled template)
     if status == 'Ended':
@@ -356,14 +264,7 @@ def challenge_details(challenge_id):
         challenge_view['status'] = 'Ended'
         conn.close()
         return render_template('shared/challenge_cancelled.html', challenge=challenge_view, user_role=user_role)
-    is_new = False
-    if challenge['published_at']:
-        try:
-            published_date = datetime.fromisoformat(challenge['published_at'].replace(' ', 'T'))
-            days_since_published = (datetime.now() - published_date).days
-            is_new = days_since_published <= 7
-        except:
-            pass
+    is_new = bool(challenge['is_new'])
     
     
     # Prepare challenge data
@@ -1,5 +1,11 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash, request
+from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify
 from app.db import get_db_connection
+from app.events_catalogue import get_catalogue
+from app.event_ranking import build_ranking_index, load_user_profile, rank_events
+from app.search import search_events, search_challenges
+from app.event_capacity import (get_event_capacity, claim_slot, release_slot, join_waitlist,
+                                leave_waitlist, get_waitlist_entry)
+from app.dashboard_data import invalidate_dashboard
 
 events_bp = Blueprint('events', __name__)
 
@@ -17,34 +23,27 @@ def get_active_challenges():
     """Fetch published monthly challenges visible to users."""
     db = get_db_connection()
     
-    # Check if published_at column exists
-    cursor = db.execute("PRAGMA table_info(challenge)")
-    columns = [row['name'] for row in cursor.fetchall()]
-    has_published_at = 'published_at' in columns
-    
-    if has_published_at:
-        cursor = db.execute('''
-            SELECT *,
-                   CASE 
-                       WHEN published_at IS NOT NULL 
-                       AND julianday('now') - julianday(published_at) <= 7 
-                       THEN 1 
-                       ELSE 0 
-                   END as is_new
-            FROM challenge 
-            WHERE status = 'published' 
-            ORDER BY is_new DESC, end_date ASC
-        ''')
-    else:
-        cursor = db.execute("SELECT *, 0 as is_new FROM challenge WHERE status = 'published' ORDER BY end_date ASC")
-        
+    # published_at is guaranteed by migration 1, which migrate_database runs at startup
+    cursor = db.execute('''
+        SELECT *,
+               CASE 
+                   WHEN published_at IS NOT NULL 
+                   AND julianday('now') - julianday(published_at) <= 7 
+                   THEN 1 
+                   ELSE 0 
+               END as is_new
+        FROM challenge 
+        WHERE status = 'published' 
+        ORDER BY is_new DESC, end_date ASC
+    ''')
+    
     challenges = cursor.fetchall()
     
     # Convert to list of dicts for template usage
     challenge_list = []
     for c in challenges:
         c_dict = dict(c)
-        c_dict['is_new'] = bool(c['is_new']) if has_published_at else False
+        c_dict['is_new'] = bool(c['is_new'])
         challenge_list.append(c_dict)
         
     return challenge_list
@@ -53,38 +52,20 @@ def get_all_events():
     """Fetch all open events from database."""
     db = get_db_connection()
     
-    # Check if published_at column exists
-    cursor = db.execute("PRAGMA table_info(event)")
-    columns = [row['name'] for row in cursor.fetchall()]
-    has_published_at = 'published_at' in columns
-    
-    if has_published_at:
-        # Use the new query with published_at
-        cursor = db.execute('''
-            SELECT event_id, title, description, category, led_by, 
-                   start_datetime, location, status, base_points_participant,
-                   published_at,
-                   CASE 
-                       WHEN published_at IS NOT NULL 
-                       AND julianday('now') - julianday(published_at) <= 7 
-                       THEN 1 
-                       ELSE 0 
-                   END as is_new
-            FROM event 
-            WHERE status IN ('published')
-            ORDER BY is_new DESC, start_datetime ASC
-        ''')
-    else:
-        # Fallback query without published_at (backward compatibility)
-        cursor = db.execute('''
-            SELECT event_id, title, description, category, led_by, 
-                   start_datetime, location, status, base_points_participant,
-                   NULL as published_at,
-                   0 as is_new
-            FROM event 
-            WHERE status IN ('published')
-            ORDER BY start_datetime ASC
-        ''')
+    cursor = db.execute('''
+        SELECT event_id, title, description, category, led_by, 
+               start_datetime, location, status, base_points_participant, grc_id,
+               published_at,
+               CASE 
+                   WHEN published_at IS NOT NULL 
+                   AND julianday('now') - julianday(published_at) <= 7 
+                   THEN 1 
+                   ELSE 0 
+               END as is_new
+        FROM event 
+        WHERE status IN ('published')
+        ORDER BY is_new DESC, start_datetime ASC
+    ''')
     
     events = cursor.fetchall()
     
@@ -107,29 +88,15 @@ def get_all_events():
             'time': time_part,
             'location': e['location'],
             'points': e['base_points_participant'],
-            'is_new': bool(e['is_new']) if has_published_at else False,
-            'published_at': e['published_at'] if has_published_at else None
+            'grc_id': e['grc_id'],
+            'is_new': bool(e['is_new']),
+            'published_at': e['published_at']
         })
     
     return event_list
 
-def get_user_interests(user_id):
-    """Get skill categories user is interested in."""
-    db = get_db_connection()
-    cursor = db.execute('''
-        SELECT DISTINCT s.category
-        FROM user_skill_interest usi
-        JOIN skill s ON usi.skill_id = s.skill_id
-        WHERE usi.user_id = ?
-    ''', (user_id,))
-    
-    interests = [row['category'] for row in cursor.fetchall()]
-    return interests
-
-def categorize_events(events, user_interests=None):
-    """Organize events into recommendation sections."""
-    recommended = []
-    bond_events = []
+def categorize_events(events):
+    """Organize events into the sections that are the same for every user."""
     new_events = []
     by_category = {}
     
@@ -144,45 +111,27 @@ def categorize_events(events, user_interests=None):
         # Add to new events if marked as new
         if event.get('is_new', False):
             new_events.append(event)
-        
-        # Add to bond events (social games are for bonding)
-        if category == 'social_games':
-            bond_events.append(event)
-        
-        # Check if matches user interests
-        if user_interests:
-            # Map event categories to skill categories
-            category_skill_map = {
-                'tech_digital': 'Tech and Digital',
-                'life_skills': 'Life Skills',
-                'health_wellness': 'Health and Wellness',
-                'culture_creative': 'Culture and Creative'
-            }
-            skill_category = category_skill_map.get(category)
-            if skill_category and skill_category in user_interests:
-                recommended.append(event)
-    
-    # If no recommendations based on interests, show popular events (fallback)
-    if not recommended:
-        recommended = events[:5]
     
     # Sort new events by published_at DESC (most recent first)
     new_events.sort(key=lambda x: x.get('published_at', '') or '', reverse=True)
     
-    # DEDUPLICATION:
-    # If an event is in 'new', remove it from 'recommended' and 'bond' to avoid duplicates on dashboard
-    new_ids = {e['id'] for e in new_events}
-    
-    recommended = [e for e in recommended if e['id'] not in new_ids]
-    bond_events = [e for e in bond_events if e['id'] not in new_ids]
-    
     return {
         'new': new_events[:8],  # Limit to 8 newest events
-        'recommended': recommended[:8],  # Limit to 8
-        'bond': bond_events[:8],  # Limit to 8
+        'new_ids': {e['id'] for e in new_events},  # kept out of the ranked sections to avoid duplicates
         'by_category': by_category
     }
 
+
+def build_events_catalogue():
+    """Everything on /events that does not depend on the viewer (cached by events_catalogue)."""
+    all_events = get_all_events()
+    catalogue = categorize_events(all_events)
+    catalogue['events'] = all_events
+    catalogue['ranking'] = build_ranking_index(all_events)
+    catalogue['challenges'] = get_active_challenges()
+    return catalogue
+
+
 @events_bp.route('/events')
 def events():
     """Route to Events Page."""
@@ -193,36 +142,42 @@ def events():
     role = session.get('user_role')
     user_id = session.get('user_id')
     
-    # Fetch all events
-    all_events = get_all_events()
+    if role == 'admin':
+        return redirect(url_for('admin.admin_dashboard'))
     
-    # Get user's interests
-    user_interests = get_user_interests(user_id) if user_id else []
+    # Shared catalogue (cached until an admin changes it), then the per-user part
+    catalogue = get_catalogue(build_events_catalogue)
+    profile = load_user_profile(get_db_connection(), user_id)
+    exclude_ids = catalogue['new_ids'] | profile['booked']
+    recommended = rank_events(catalogue['ranking'], profile, 8, exclude_ids)
+    # Social games are for bonding
+    bond = rank_events(catalogue['ranking'], profile, 8, exclude_ids, categories=('social_games',))
     
-    # Categorize events
-    categorized = categorize_events(all_events, user_interests)
+    template = 'senior/senior_events.html' if role == 'senior' else 'youth/youth_events.html'
+    return render_template(template,
+                           new_events=catalogue['new'],
+                           recommended_events=recommended,
+                           bond_events=bond,
+                           events_by_category=catalogue['by_category'],
+                           category_display=CATEGORY_DISPLAY,
+                           challenges=catalogue['challenges'])
+
+
+@events_bp.route('/events/search')
+def events_search():
+    """Ranked prefix search over published events and challenges: ?q=&limit="""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
-    # Fetch Challenges
-    challenges = get_active_challenges()
+    text = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 50)
     
-    if role == 'admin':
-        return redirect(url_for('admin.admin_dashboard'))
-    elif role == 'senior':
-        return render_template('senior/senior_events.html',
-                             new_events=categorized['new'],
-                             recommended_events=categorized['recommended'],
-                             bond_events=categorized['bond'],
-                             events_by_category=categorized['by_category'],
-                             category_display=CATEGORY_DISPLAY,
-                             challenges=challenges)
-    else:  # youth or default
-        return render_template('youth/youth_events.html',
-                             new_events=categorized['new'],
-                             recommended_events=categorized['recommended'],
-                             bond_events=categorized['bond'],
-                             events_by_category=categorized['by_category'],
-                             category_display=CATEGORY_DISPLAY,
-                             challenges=challenges)
+    db = get_db_connection()
+    return jsonify({
+        'success': True,
+        'events': search_events(db, text, limit=limit),
+        'challenges': search_challenges(db, text, limit=limit)
+    })
 
 
 # =====================================================
@@ -239,34 +194,20 @@ def get_event_by_id(event_id):
     """Fetch full event details by ID."""
     db = get_db_connection()
     
-    # Check if published_at column exists
-    cursor = db.execute("PRAGMA table_info(event)")
-    columns = [row['name'] for row in cursor.fetchall()]
-    has_published_at = 'published_at' in columns
-    
-    if has_published_at:
-        cursor = db.execute('''
-            SELECT e.*, g.name as grc_name,
-                   CASE 
-                       WHEN e.published_at IS NOT NULL 
-                       AND julianday('now') - julianday(e.published_at) <= 7 
-                       THEN 1 
-                       ELSE 0 
-                   END as is_new
-            FROM event e
-            LEFT JOIN grc g ON e.grc_id = g.grc_id
-            WHERE e.event_id = ? 
-            AND e.status IN ('approved', 'published', 'voided', 'cancelled')
-        ''', (event_id,))
-    else:
-        cursor = db.execute('''
-            SELECT e.*, g.name as grc_name, 0 as is_new
-            FROM event e
-            LEFT JOIN grc g ON e.grc_id = g.grc_id
-            WHERE e.event_id = ? 
-            AND e.status IN ('approved', 'published', 'voided', 'cancelled')
-        ''', (event_id,))
-        
+    cursor = db.execute('''
+        SELECT e.*, g.name as grc_name,
+               CASE 
+                   WHEN e.published_at IS NOT NULL 
+                   AND julianday('now') - julianday(e.published_at) <= 7 
+                   THEN 1 
+                   ELSE 0 
+               END as is_new
+        FROM event e
+        LEFT JOIN grc g ON e.grc_id = g.grc_id
+        WHERE e.event_id = ? 
+        AND e.status IN ('approved', 'published', 'voided', 'cancelled')
+    ''', (event_id,))
+    
     event = cursor.fetchone()
     
     if not event:
@@ -294,35 +235,11 @@ def get_event_by_id(event_id):
         'max_capacity': event['max_capacity'],
         'status': event['status'],
         'void_reason': event['void_reason'],
-        'is_new': bool(event['is_new']) if has_published_at else False,
-        'published_at': event['published_at'] if has_published_at else None
+        'is_new': bool(event['is_new']),
+        'published_at': event['published_at']
     }
 
 
-def get_role_requirements(event_id):
-    """Get required slots per role for an event (Mentor and Participant only)."""
-    db = get_db_connection()
-    cursor = db.execute('''
-        SELECT role_type, required_count
-        FROM event_role_requirement
-        WHERE event_id = ? AND role_type IN ('teacher', 'participant')
-    ''', (event_id,))
-    
-    requirements = {}
-    for row in cursor.fetchall():
-        requirements[row['role_type']] = row['required_count']
-    
-    # Return defaults if no requirements set (only if DB record missing)
-    # The logic above already fetches correct values from DB.
-    # We just ensure keys exist for safety.
-    if 'teacher' not in requirements:
-        requirements['teacher'] = 5
-    if 'participant' not in requirements:
-        requirements['participant'] = 15
-    
-    return requirements
-
-
 def get_role_bookings(event_id):
     """Get current bookings per role with user details (Mentor and Participant only)."""
     db = get_db_connection()
@@ -351,18 +268,26 @@ def get_role_bookings(event_id):
     return bookings
 
 
-def get_role_slots(event_id):
-    """Calculate filled vs required slots per role (Mentor and Participant only)."""
-    requirements = get_role_requirements(event_id)
-    bookings = get_role_bookings(event_id)
+def get_role_slots(event_id, include_users=True):
+    """
+    Calculate filled vs required slots per role (Mentor and Participant only).
+    Counts come from event_capacity_summary; the booked users are only
+    fetched when the slot panel needs to list them.
+    """
+    conn = get_db_connection()
+    capacity = get_event_capacity(conn, event_id)
+    if conn.in_transaction:
+        # Keep a summary row backfilled just now (seed data) and release the write lock
+        conn.commit()
+    bookings = get_role_bookings(event_id) if include_users else {}
     
     slots = {}
     total_filled = 0
     total_capacity = 0
     
     for role in ['teacher', 'participant']:
-        required = requirements.get(role, 0)
-        filled = len(bookings.get(role, []))
+        required = capacity[role]['required']
+        filled = capacity[role]['filled']
         available = max(0, required - filled)
         
         slots[role] = {
@@ -455,8 +380,9 @@ def event_details(event_id):
     # Get role slot information
     slots = get_role_slots(event_id)
     
-    # Check if user is already signed up
+    # Check if user is already signed up (or waiting for a slot)
     user_signed_up_role = is_user_signed_up(event_id, user_id)
+    waitlist_entry = None if user_signed_up_role else get_waitlist_entry(db, event_id, user_id)
     
     # Check mentor eligibility
     can_mentor = can_user_mentor(event['led_by'], role)
@@ -469,6 +395,7 @@ def event_details(event_id):
                          slots=slots,
                          role_display=ROLE_DISPLAY,
                          user_signed_up_role=user_signed_up_role,
+                         waitlist_entry=waitlist_entry,
                          user_role=role,
                          can_mentor=can_mentor,
                          has_started=has_started,
@@ -515,40 +442,40 @@ def event_signup(event_id):
             flash(f"Only {event['led_by'].capitalize()}s can mentor this event.", "error")
             return redirect(url_for('events.event_details', event_id=event_id))
     
-    # Check if already signed up
-    existing_role = is_user_signed_up(event_id, user_id)
-    if existing_role:
-        flash(f"You are already signed up as {ROLE_DISPLAY.get(existing_role, existing_role)}.", "warning")
+    role_name = ROLE_DISPLAY.get(role_type, role_type)
+    
+    # "Join waitlist" button on a full role
+    if request.form.get('waitlist') == '1':
+        result, detail = join_waitlist(get_db_connection(), event_id, user_id, role_type)
+        if result == 'booked':
+            invalidate_dashboard(user_id)
+        if result == 'waitlisted':
+            flash(f"You're #{detail} on the {role_name} waitlist. We'll sign you up and notify you when a slot opens.", "success")
+        elif result == 'already_waiting':
+            flash(f"You're already on the waitlist (#{detail}).", "info")
+        elif result == 'already_booked':
+            flash(f"You are already signed up as {ROLE_DISPLAY.get(detail, detail)}.", "warning")
+        else:
+            flash(f"A slot was free - successfully signed up as {role_name}! 🎉", "success")
         return redirect(url_for('events.event_details', event_id=event_id))
     
-    # Check slot availability
-    slots = get_role_slots(event_id)
-    if slots[role_type]['is_full']:
-        flash(f"Sorry, {ROLE_DISPLAY.get(role_type, role_type)} slots are full.", "error")
+    # Cheap early exit while an event is full (no write lock taken)
+    slots = get_role_slots(event_id, include_users=False)
+    if slots[role_type]['is_full'] and not is_user_signed_up(event_id, user_id):
+        flash(f"Sorry, {role_name} slots are full. You can join the waitlist instead.", "error")
         return redirect(url_for('events.event_details', event_id=event_id))
     
-    # Check for existing booking (to handle re-signup after withdrawal)
-    db = get_db_connection()
-    cursor = db.execute('SELECT status FROM event_booking WHERE user_id = ? AND event_id = ?', (user_id, event_id))
-    existing_booking = cursor.fetchone()
-    
-    if existing_booking:
-        # Update existing record (e.g. if status was 'cancelled')
-        db.execute('''
-            UPDATE event_booking 
-            SET role_type = ?, status = 'booked', booked_at = datetime('now')
-            WHERE user_id = ? AND event_id = ?
-        ''', (role_type, user_id, event_id))
-    else:
-        # Insert new record
-        db.execute('''
-            INSERT INTO event_booking (user_id, event_id, role_type, status, booked_at)
-            VALUES (?, ?, ?, 'booked', datetime('now'))
-        ''', (user_id, event_id, role_type))
-        
-    db.commit()
+    # Duplicate check, capacity check and booking in one transaction
+    result, booked_role = claim_slot(get_db_connection(), event_id, user_id, role_type)
     
-    flash(f"Successfully signed up as {ROLE_DISPLAY.get(role_type, role_type)}! 🎉", "success")
+    if result == 'already_booked':
+        flash(f"You are already signed up as {ROLE_DISPLAY.get(booked_role, booked_role)}.", "warning")
+    elif result == 'full':
+        flash(f"Sorry, {role_name} slots are full. You can join the waitlist instead.", "error")
+    else:
+        leave_waitlist(get_db_connection(), event_id, user_id)
+        invalidate_dashboard(user_id)
+        flash(f"Successfully signed up as {role_name}! 🎉", "success")
     return redirect(url_for('events.event_details', event_id=event_id))
 
 
@@ -561,21 +488,25 @@ def event_withdraw(event_id):
     
     user_id = session.get('user_id')
     
-    # Check if signed up
-    existing_role = is_user_signed_up(event_id, user_id)
-    if not existing_role:
+    # Cancel the booking and free the seat in one transaction
+    if not release_slot(get_db_connection(), event_id, user_id):
         flash("You are not signed up for this event.", "warning")
         return redirect(url_for('events.event_details', event_id=event_id))
     
-    # Update booking status to cancelled
-    db = get_db_connection()
-    db.execute('''
-        UPDATE event_booking 
-        SET status = 'cancelled'
-        WHERE event_id = ? AND user_id = ?
-    ''', (event_id, user_id))
-    db.commit()
-    
+    invalidate_dashboard(user_id)
     flash("You have withdrawn from this event.", "info")
     return redirect(url_for('events.event_details', event_id=event_id))
 
+
+@events_bp.route('/event/<int:event_id>/waitlist/leave', methods=['POST'])
+def event_leave_waitlist(event_id):
+    """Take the user off an event's waitlist."""
+    if 'user_id' not in session:
+        flash("Please log in.", "warning")
+        return redirect(url_for('home.login_page'))
+    
+    if leave_waitlist(get_db_connection(), event_id, session.get('user_id')):
+        flash("You have left the waitlist.", "info")
+    else:
+        flash("You are not on the waitlist for this event.", "warning")
+    return redirect(url_for('events.event_details', event_id=event_id))
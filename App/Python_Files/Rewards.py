@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify
 from app.db import get_db_connection
+from app.redemptions import request_redemption
+from app.dashboard_data import invalidate_dashboard
 from datetime import datetime
 
 rewards_bp = Blueprint('rewards', __name__)
@@ -97,20 +99,19 @@ def rewards():
     all_rewards_rows = conn.execute(all_rewards_query).fetchall()
     all_rewards_list = [dict(row) for row in all_rewards_rows]
     
-    # Fetch History Rewards (expired + used/dismissed)
+    # Fetch History Rewards (expired + used/dismissed); vouchers are expired by the scheduler
     history_rewards_query = """
         SELECT rr.redemption_id, r.name, rr.expiry_date, rr.status,
                CASE 
                    WHEN rr.status = 'redeemed' THEN 'Used'
                    WHEN rr.status = 'cancelled' THEN 'Cancelled'
-                   WHEN rr.expiry_date IS NOT NULL AND rr.expiry_date < date('now') THEN 'Expired'
+                   WHEN rr.status = 'expired' THEN 'Expired'
                    ELSE 'Active'
                END as display_status
         FROM reward_redemption rr
         JOIN reward r ON rr.reward_id = r.reward_id
         WHERE rr.user_id = ? 
-          AND (rr.status IN ('redeemed', 'cancelled') 
-               OR (rr.status = 'approved' AND rr.expiry_date IS NOT NULL AND rr.expiry_date < date('now')))
+          AND rr.status IN ('redeemed', 'cancelled', 'expired')
         ORDER BY rr.created_at DESC
     """
     history_rewards_rows = conn.execute(history_rewards_query, (user_id,)).fetchall()
@@ -159,11 +160,11 @@ def dismiss_reward():
         conn.close()
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
     
-    # Update status to 'redeemed' (meaning user has claimed it)
+    # Update status to 'redeemed' (meaning user has claimed it) - only a live voucher can be claimed
     conn.execute("""
         UPDATE reward_redemption 
         SET status = 'redeemed' 
-        WHERE redemption_id = ? AND user_id = ?
+        WHERE redemption_id = ? AND user_id = ? AND status = 'approved'
     """, (redemption_id, user_id))
     
     conn.commit()
@@ -174,48 +175,30 @@ def dismiss_reward():
 
 @rewards_bp.route('/redeem_reward', methods=['POST'])
 def redeem_reward():
-    """Handle reward redemption request."""
+    """
+    Handle reward redemption request.
+    Stock and points are reserved straight away; the price comes from the
+    reward table, never from the client.
+    """
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not logged in'}), 401
     
     user_id = session.get('user_id')
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
+    reward_id = data.get('reward_id')
     
-    reward_name = data.get('reward_name')
-    reward_vendor = data.get('reward_vendor')  
-    points_required = data.get('points_required')
-    
-    if not reward_name or not points_required:
+    if not reward_id:
         return jsonify({'success': False, 'error': 'Missing reward data'}), 400
     
-    conn = get_db_connection()
-    
-    # Get user's current points
-    user = conn.execute("SELECT total_points FROM user WHERE user_id = ?", (user_id,)).fetchone()
-    if not user:
-        conn.close()
-        return jsonify({'success': False, 'error': 'User not found'}), 404
-    
-    user_points = user['total_points']
-    
-    # Check if user has enough points
-    if user_points < points_required:
-        conn.close()
-        return jsonify({'success': False, 'error': 'Insufficient points'}), 400
+    # Stock check, points check and request in one transaction
+    result, detail = request_redemption(get_db_connection(), user_id, reward_id)
     
-    # Get reward_id
-    reward = conn.execute("SELECT reward_id FROM reward WHERE name = ?", (reward_name,)).fetchone()
-    if not reward:
-        conn.close()
+    if result == 'not_found':
         return jsonify({'success': False, 'error': 'Reward not found'}), 404
+    if result == 'out_of_stock':
+        return jsonify({'success': False, 'error': 'Sorry, this reward is out of stock'}), 409
+    if result == 'insufficient':
+        return jsonify({'success': False, 'error': 'Insufficient points'}), 400
     
-    # Create redemption request (status='requested')
-    conn.execute("""
-        INSERT INTO reward_redemption (user_id, reward_id, status)
-        VALUES (?, ?, 'requested')
-    """, (user_id, reward['reward_id']))
-    
-    conn.commit()
-    conn.close()
-    
-    return jsonify({'success': True, 'message': 'Redemption request submitted'})
+    invalidate_dashboard(user_id)
+    return jsonify({'success': True, 'message': 'Redemption request submitted', 'points': detail[1]})
@@ -1,5 +1,8 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify
 from app.db import get_db_connection # This ensures we use the SAME database as Admin
+from app.search import search_faqs
+from app.live_chat import (notify_chat, stream_response, stream_cursor, fetch_messages, conditional_json,
+                           record_message, mark_chat_read)
 import datetime
 import os
 import uuid
@@ -94,6 +97,15 @@ def senior_support():
 
 
 
+@support_bp.route('/faq/search')
+def faq_search():
+    """Ranked prefix search over active FAQ articles: ?q="""
+    text = request.args.get('q', '').strip()
+    conn = get_db_connection()
+    faqs = search_faqs(conn, text, limit=10)
+    conn.close()
+    return jsonify({'success': True, 'faqs': faqs})
+
 @support_bp.route('/submit-ticket', methods=['POST'])
 def submit_ticket():
     # Handle FormData instead of JSON
@@ -166,31 +178,7 @@ def submit_ticket():
     conn = get_db_connection()
 
     try:
-        # --- SELF-REPAIR: Create Table if it doesn't exist ---
-        # This prevents "Table not found" errors
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS support_ticket (
-                ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                subject TEXT NOT NULL,
-                description TEXT NOT NULL,
-                status TEXT DEFAULT 'open',
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES user (user_id)
-            );
-        """)
-        
-        # Add screenshot column if it doesn't exist
-        try:
-            conn.execute("ALTER TABLE support_ticket ADD COLUMN screenshot_path TEXT")
-        except:
-            pass  # Column already exists
-
-        # Add event_name column if it doesn't exist
-        try:
-            conn.execute("ALTER TABLE support_ticket ADD COLUMN event_name TEXT")
-        except:
-            pass  # Column already exists
+        # screenshot_path / event_name columns are added by migration 2 (app/migrations.py)
 
         # 3. INSERT the ticket into the database
         conn.execute(
@@ -324,26 +312,18 @@ def send_message():
         conn.close()
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Insert message
-    conn.execute(
-        "INSERT INTO live_chat_message (session_id, sender_type, sender_id, message_text) VALUES (?, 'user', ?, ?)",
-        (session_id, user_id, message_text)
-    )
-    
-    # Update last_message_at
-    conn.execute(
-        "UPDATE live_chat_session SET last_message_at = CURRENT_TIMESTAMP WHERE session_id = ?",
-        (session_id,)
-    )
+    # Insert message and update the session summary (last message, counters)
+    record_message(conn, session_id, 'user', user_id, message_text)
     
     conn.commit()
     conn.close()
+    notify_chat(session_id)
     
     return jsonify({'status': 'sent'})
 
 @support_bp.route('/get-messages/<int:session_id>')
 def get_messages(session_id):
-    """Fetch all messages for a chat session"""
+    """Fetch messages for a chat session (only those after ?after_message_id= if given)"""
     user_id = session.get('user_id')
     
     if not user_id:
@@ -363,24 +343,48 @@ def get_messages(session_id):
     
     # Get admin_connected status
     admin_connected = bool(chat['admin_connected']) if chat else False
+    after_id = request.args.get('after_message_id', 0, type=int)
+    last_id = chat['last_message_id'] or 0
     
-    # Fetch messages
-    messages = conn.execute(
-        """SELECT m.*, u.name as sender_name
-           FROM live_chat_message m
-           LEFT JOIN user u ON m.sender_id = u.user_id AND m.sender_type = 'user'
-           WHERE m.session_id = ?
-           ORDER BY m.created_at ASC""",
-        (session_id,)
-    ).fetchall()
+    # The user is looking at the conversation now
+    if chat['unread_by_user']:
+        mark_chat_read(conn, session_id, 'user')
+        conn.commit()
+    
+    # Same cursor, newest message and status -> client already has this response
+    etag = f"chat-{session_id}-{after_id}-{last_id}-{chat['status']}-{int(admin_connected)}"
     
+    def build():
+        return {
+            'messages': fetch_messages(conn, session_id, after_id),
+            'last_message_id': last_id,
+            'admin_connected': admin_connected,
+            'status': chat['status']  # Add chat status (active/closed)
+        }
+    
+    response = conditional_json(request, etag, build)
     conn.close()
+    return response
+
+@support_bp.route('/chat-stream/<int:session_id>')
+def chat_stream(session_id):
+    """Server-Sent Events stream of new messages and status changes for a chat session"""
+    user_id = session.get('user_id')
+    
+    if not user_id:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    conn = get_db_connection()
+    chat = conn.execute(
+        "SELECT session_id FROM live_chat_session WHERE session_id = ? AND user_id = ?",
+        (session_id, user_id)
+    ).fetchone()
+    conn.close()
+    
+    if not chat:
+        return jsonify({'error': 'Unauthorized'}), 403
     
-    return jsonify({
-        'messages': [dict(m) for m in messages],
-        'admin_connected': admin_connected,
-        'status': chat['status']  # Add chat status (active/closed)
-    })
+    return stream_response(session_id, stream_cursor(request), reader='user')
 
 @support_bp.route('/get-active-chat')
 def get_active_chat():
@@ -416,8 +420,7 @@ def get_chat_history():
     
     chats = conn.execute(
         """SELECT cs.session_id, cs.status, cs.created_at, cs.last_message_at,
-                  (SELECT message_text FROM live_chat_message WHERE session_id = cs.session_id ORDER BY created_at DESC LIMIT 1) as last_message,
-                  (SELECT COUNT(*) FROM live_chat_message WHERE session_id = cs.session_id) as message_count
+                  cs.last_message_text as last_message, cs.message_count, cs.unread_by_user as unread_count
            FROM live_chat_session cs
            WHERE cs.user_id = ?
            ORDER BY cs.last_message_at DESC""",
@@ -462,5 +465,6 @@ def end_chat():
     
     conn.commit()
     conn.close()
+    notify_chat(session_id)
     
     return jsonify({'status': 'closed', 'message': 'Chat ended successfully'})
\ No newline at end of file
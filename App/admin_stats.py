@@ -0,0 +1,60 @@
+"""
+Admin dashboard statistics.
+
+The dashboard cards only need totals, so they are computed with SQL aggregates
+in a single round trip and cached for STATS_TTL seconds. Every admin request
+in this process shares the cached snapshot; admin actions that change the
+numbers call invalidate_dashboard_stats() so the next read recomputes.
+"""
+import os
+import threading
+import time
+from app.db import get_db_connection
+
+STATS_TTL = float(os.getenv('ADMIN_STATS_TTL', 30))
+
+_cache = {'stats': None, 'expires_at': 0}
+_cache_lock = threading.Lock()
+
+
+def compute_dashboard_stats(conn):
+    """Dashboard KPIs straight from the database (no caching)."""
+    row = conn.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM user) AS total_users,
+            (SELECT COUNT(*) FROM user WHERE role = 'youth') AS youth_users,
+            (SELECT COUNT(*) FROM user WHERE role = 'senior') AS senior_users,
+            (SELECT COUNT(*) FROM user WHERE verification_status = 'verified') AS verified_users,
+            (SELECT COUNT(*) FROM user WHERE verification_status = 'pending') AS pending_users,
+            (SELECT COALESCE(SUM(total_points), 0) FROM user) AS total_points,
+            (SELECT COUNT(*) FROM support_ticket WHERE status = 'open') AS current_open_tickets,
+            (SELECT COUNT(*) FROM event WHERE status = 'published') AS ongoing_events
+    """).fetchone()
+    return dict(row)
+
+
+def get_dashboard_stats(force=False):
+    """Cached dashboard KPIs as a dict (with computed_at), recomputed after STATS_TTL seconds."""
+    now = time.time()
+    if not force and _cache['stats'] is not None and now < _cache['expires_at']:
+        return _cache['stats']
+
+    with _cache_lock:
+        # Another request may have refreshed it while we waited for the lock
+        if not force and _cache['stats'] is not None and time.time() < _cache['expires_at']:
+            return _cache['stats']
+
+        conn = get_db_connection()
+        try:
+            stats = compute_dashboard_stats(conn)
+        finally:
+            conn.close()
+        stats['computed_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        _cache['stats'] = stats
+        _cache['expires_at'] = time.time() + STATS_TTL
+        return stats
+
+
+def invalidate_dashboard_stats():
+    """Drop the cached snapshot; the next read recomputes it."""
+    _cache['expires_at'] = 0
@@ -0,0 +1,161 @@
+"""
+Per-user dashboard bundle.
+
+load_dashboard_bundle() fetches everything /dashboard shows in four indexed
+queries: the user row with its user_stats rollup, the next upcoming bookings,
+the unread notifications and the live challenges with this user's progress
+(one grouped aggregate over user_challenge instead of a COUNT per challenge).
+Days left on a challenge are computed in SQL.
+
+get_dashboard_bundle() keeps the bundle per user for DASHBOARD_TTL seconds.
+Writes that change a dashboard call invalidate_dashboard(user_id) after they
+commit - bookings, notification reads, profile edits, waitlist promotions.
+Admin writes (proof verification, challenge approvals, broadcasts, event
+changes) can touch many users at once, so they call invalidate_all_dashboards().
+Both go over the message bus, so the admin app (5001) refreshes the user
+app (5000) too. The TTL bounds staleness for time-based changes (an event
+starting, a challenge ending at midnight).
+"""
+import os
+import threading
+import time
+from app import message_bus
+from app.notifications import get_unread_notifications
+
+DASHBOARD_TTL = float(os.getenv('DASHBOARD_TTL', 60))
+MAX_CACHED_DASHBOARDS = 5000
+UPCOMING_LIMIT = 5
+
+ALL_CHANNEL = 'dashboard:all'
+
+_cache = {}   # user_id -> (versions, expires_at, bundle)
+_cache_lock = threading.Lock()
+
+
+def _channel(user_id):
+    return f'dashboard:{user_id}'
+
+
+# =====================================================
+# LOADER
+# =====================================================
+def load_dashboard_bundle(conn, user_id):
+    """Everything the dashboard renders for one user, or None if the user does not exist."""
+    user = conn.execute("""
+        SELECT u.user_id, u.name, u.role, u.total_points, u.profile_photo, u.created_at,
+               COALESCE(s.events_completed, 0) AS events_completed,
+               COALESCE(s.total_hours, 0) AS total_hours,
+               COALESCE(s.impact_score, 0) AS impact_score
+        FROM user u
+        LEFT JOIN user_stats s ON s.user_id = u.user_id
+        WHERE u.user_id = ?
+    """, (user_id,)).fetchone()
+    if not user:
+        return None
+
+    # Driven by the event_booking primary key (user_id, event_id)
+    upcoming_rows = conn.execute("""
+        SELECT e.event_id, e.title, e.start_datetime, e.location, e.category, eb.role_type
+        FROM event_booking eb
+        JOIN event e ON eb.event_id = e.event_id
+        WHERE eb.user_id = ?
+          AND eb.status = 'booked'
+          AND e.status NOT IN ('voided', 'cancelled')
+          AND datetime(e.start_datetime) > datetime('now')
+        ORDER BY e.start_datetime ASC
+        LIMIT ?
+    """, (user_id, UPCOMING_LIMIT)).fetchall()
+
+    upcoming_events = []
+    for event in upcoming_rows:
+        date_part, _, time_part = event['start_datetime'].partition(' ')
+        upcoming_events.append({
+            'id': event['event_id'],
+            'title': event['title'],
+            'date': date_part,
+            'time': time_part[:5],
+            'location': event['location'],
+            'category': event['category'],
+            'role': event['role_type']  # 'teacher' or 'participant'
+        })
+
+    notifications = get_unread_notifications(conn, user_id, user['role'], user['created_at'])
+
+    # days_left: whole days until end_date (-1 once it has passed, NULL if unparseable)
+    challenge_rows = conn.execute("""
+        SELECT c.challenge_id, c.title, c.description, c.end_date, c.bonus_points,
+               COALESCE(NULLIF(c.target_count, 0), 1) AS target_count,
+               COALESCE(p.progress, 0) AS progress,
+               CASE
+                   WHEN julianday(c.end_date) IS NULL THEN NULL
+                   WHEN julianday(c.end_date) < julianday('now', 'localtime') THEN -1
+                   ELSE CAST(julianday(c.end_date) - julianday('now', 'localtime') AS INTEGER)
+               END AS days_left
+        FROM challenge c
+        LEFT JOIN (
+            SELECT challenge_id, COUNT(*) AS progress
+            FROM user_challenge
+            WHERE user_id = ? AND status = 'approved'
+            GROUP BY challenge_id
+        ) p ON p.challenge_id = c.challenge_id
+        WHERE c.status IN ('active', 'published')
+        ORDER BY c.end_date ASC
+    """, (user_id,)).fetchall()
+
+    challenges = []
+    for c in challenge_rows:
+        if c['days_left'] is None:
+            time_str = c['end_date']
+        elif c['days_left'] < 0:
+            time_str = "Ended"
+        else:
+            time_str = f"Ends in {c['days_left']} days"
+        challenges.append({
+            'id': c['challenge_id'],
+            'title': c['title'],
+            'description': c['description'],
+            'bonus_points': c['bonus_points'],
+            'target_count': c['target_count'],
+            'progress': c['progress'],
+            'time_left': time_str,
+            'status': 'Completed' if c['progress'] >= c['target_count'] else 'In Progress'
+        })
+
+    return {
+        'user': dict(user),
+        'upcoming_events': upcoming_events,
+        'notifications': notifications,
+        'challenges': challenges,
+    }
+
+
+# =====================================================
+# CACHE
+# =====================================================
+def get_dashboard_bundle(conn, user_id):
+    """The cached bundle for `user_id`, reloaded when it expired or was invalidated."""
+    # Read the versions before loading so a write that lands mid-load invalidates the result
+    versions = (message_bus.version(ALL_CHANNEL), message_bus.version(_channel(user_id)))
+    entry = _cache.get(user_id)
+    if entry and entry[0] == versions and time.time() < entry[1]:
+        return entry[2]
+
+    bundle = load_dashboard_bundle(conn, user_id)
+    with _cache_lock:
+        _cache.pop(user_id, None)
+        if bundle is not None:
+            if len(_cache) >= MAX_CACHED_DASHBOARDS:
+                # Oldest entry first (dicts keep insertion order)
+                _cache.pop(next(iter(_cache)))
+            _cache[user_id] = (versions, time.time() + DASHBOARD_TTL, bundle)
+    return bundle
+
+
+def invalidate_dashboard(user_id):
+    """Drop one user's cached dashboard in every app process (call after the write commits)."""
+    message_bus.publish(_channel(user_id))
+
+
+def invalidate_all_dashboards():
+    """Drop every cached dashboard in every app process (call after the write commits)."""
+    message_bus.publish(ALL_CHANNEL)
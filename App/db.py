@@ -1,232 +1,546 @@
 import sqlite3
 import os
-from flask import g
+import sys
+import threading
+import time
+import weakref
+import itertools
+from contextlib import contextmanager
+from flask import g, has_app_context
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # Validated absolute path to the database file in 'Class db' folder
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATABASE = os.path.join(BASE_DIR, 'Class db', 'skillswap.db')
+MIGRATION_LOCK_FILE = DATABASE + '.migrate.lock'
 
-def get_db_connection():
-    """Create and return a SQLite connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Connection profiles (select with DB_PROFILE). The user app (5000) and admin app (5001)
+# run as separate processes on the same file, so WAL + busy_timeout lets readers and
+# the single writer overlap instead of failing with "database is locked".
+# foreign_keys stays OFF by default: existing flows (create_event storing admin_id in
+# created_by_user_id, deleting users that still have notifications/tickets) rely on it.
+DB_PROFILES = {
+    'default': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,       # negative = KiB, i.e. ~16 MB page cache
+        'mmap_size': 134217728,     # 128 MB
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'OFF',
+    },
+    'strict': {
+        'busy_timeout': 10000,
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'mmap_size': 134217728,
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+    },
+    'legacy': {
+        'busy_timeout': 5000,
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'foreign_keys': 'OFF',
+    },
+}
 
-def close_db(e=None):
-    """Close the database connection if it exists."""
-    db = g.pop('db', None)
+# busy_timeout goes first so the journal_mode switch can wait out the other process
+PRAGMA_ORDER = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size',
+                'mmap_size', 'temp_store', 'foreign_keys')
 
-    if db is not None:
-        db.close()
+# What PRAGMA <name> reports back for the symbolic values above
+PRAGMA_READBACK = {
+    'synchronous': {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3},
+    'temp_store': {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2},
+    'foreign_keys': {'OFF': 0, 'ON': 1},
+}
 
-def migrate_database():
-    """Run database migrations to add missing columns."""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if published_at column exists
-        cursor.execute("PRAGMA table_info(event)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        if 'published_at' not in columns:
-            print("🔄 Adding 'published_at' column to event table...")
-            cursor.execute("ALTER TABLE event ADD COLUMN published_at TEXT")
-            conn.commit()
-            print("✅ Database migration complete for event table!")
-            
-        # Check if reply column exists in support_ticket table
-        cursor.execute("PRAGMA table_info(support_ticket)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        if 'reply' not in columns:
-            print("🔄 Adding 'reply' column to support_ticket table...")
-            cursor.execute("ALTER TABLE support_ticket ADD COLUMN reply TEXT")
-            conn.commit()
-            print("✅ Database migration complete for support_ticket table!")
-        
-        # Migrate challenge table to support 'pending' status
-        # Check if the challenge table needs migration by trying to insert a pending row
+
+def get_db_profile():
+    """Return (name, pragmas) for the active profile, with per-setting env overrides."""
+    name = os.getenv('DB_PROFILE', 'default').lower()
+    if name not in DB_PROFILES:
+        print(f"⚠️ Unknown DB_PROFILE '{name}', using 'default'")
+        name = 'default'
+    pragmas = dict(DB_PROFILES[name])
+
+    # e.g. DB_BUSY_TIMEOUT=15000, DB_JOURNAL_MODE=DELETE
+    for key in PRAGMA_ORDER:
+        override = os.getenv(f"DB_{key.upper()}")
+        if override:
+            pragmas[key] = override
+    return name, pragmas
+
+
+def apply_pragmas(conn, pragmas):
+    """Apply a connection profile to a freshly opened connection."""
+    for key in PRAGMA_ORDER:
+        if key not in pragmas:
+            continue
+        if key == 'journal_mode':
+            # Persistent per file; only switch (which needs an exclusive lock) when it differs
+            current = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if str(current).lower() == str(pragmas[key]).lower():
+                continue
         try:
-            cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='challenge'")
-            table_sql = cursor.fetchone()
-            if table_sql and "'pending'" not in table_sql[0]:
-                print("🔄 Migrating 'challenge' table to support 'pending' status...")
-                # Create new table with updated constraint
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS challenge_new (
-                        challenge_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL,
-                        description TEXT,
-                        start_date TEXT NOT NULL,
-                        end_date TEXT NOT NULL,
-                        status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'active', 'inactive', 'published', 'voided', 'ended')),
-                        void_reason TEXT,
-                        created_by INTEGER,
-                        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                        published_at TEXT,
-                        voided_at TEXT,
-                        ended_at TEXT,
-                        FOREIGN KEY (created_by) REFERENCES admin(admin_id) ON DELETE SET NULL
-                    )
-                """)
-                # Copy data from old table
-                cursor.execute("INSERT INTO challenge_new SELECT * FROM challenge")
-                # Drop old table
-                cursor.execute("DROP TABLE challenge")
-                # Rename new table
-                cursor.execute("ALTER TABLE challenge_new RENAME TO challenge")
-                conn.commit()
-                print("✅ Challenge table migration complete!")
-        except Exception as migration_error:
-            print(f"⚠️ Challenge migration note: {migration_error}")
-        # Challenge Table Migration for target_count
-        cursor.execute("PRAGMA table_info(challenge)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        if 'target_count' not in columns:
-            print("🔄 Adding 'target_count' column to challenge table...")
-            cursor.execute("ALTER TABLE challenge ADD COLUMN target_count INTEGER DEFAULT 1")
-            conn.commit()
-            print("✅ Database migration complete for challenge table (target_count)!")
-        
-        # Add admin_connected column to live_chat_session if it doesn't exist
+            conn.execute(f"PRAGMA {key} = {pragmas[key]}").fetchall()
+        except sqlite3.OperationalError as e:
+            # e.g. switching journal_mode while the other process holds a lock
+            print(f"⚠️ Could not apply PRAGMA {key}={pragmas[key]}: {e}")
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+
+class PooledConnection:
+    """
+    Wrapper around a pooled sqlite3 connection.
+
+    Behaves like a normal sqlite3.Connection so route code can keep calling
+    execute/commit/close. Every helper in a request shares the request-scoped
+    connection, so close() on it does nothing - a helper closing mid-route must not
+    discard the caller's uncommitted writes. close_db() rolls back whatever is still
+    open and returns it to the pool at teardown.
+    """
+
+    def __init__(self, pool, raw, request_scoped=False, checkout_site=None):
+        self._pool = pool
+        self._raw = raw
+        self.request_scoped = request_scoped
+        self.checkout_site = checkout_site
+        self.checked_out_at = time.monotonic()
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(raw, name)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+    def __del__(self):
+        # Last line of defence: a connection dropped without close() is a leak
         try:
-            cursor.execute("PRAGMA table_info(live_chat_session)")
-            columns = [column[1] for column in cursor.fetchall()]
-            if 'admin_connected' not in columns:
-                print("🔄 Adding admin_connected column to live_chat_session...")
-                cursor.execute("ALTER TABLE live_chat_session ADD COLUMN admin_connected INTEGER DEFAULT 0")
-                conn.commit()
-                print("✅ admin_connected column added!")
-        except Exception as admin_conn_error:
-            print(f"⚠️ Admin connection migration note: {admin_conn_error}")
-        
-        # Add connected_admin_id column to live_chat_session if it doesn't exist
+            if self.__dict__.get('_raw') is not None:
+                self._pool.report_leak(self, "garbage collected without close()")
+                self._pool.release(self)
+        except Exception:
+            pass
+
+    @property
+    def released(self):
+        return self.__dict__.get('_raw') is None
+
+    def close(self):
+        """Hand the connection back, rolling back pending work (no-op for the request's connection)."""
+        if self.released or self.request_scoped:
+            return
+        self._pool.release(self)
+
+
+class ConnectionPool:
+    """Bounded per-process pool of SQLite connections with health checks and metrics."""
+
+    def __init__(self, database, max_size=10, timeout=30.0, pragmas=None):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self._idle = []
+        self._size = 0
+        # Weak refs so a wrapper dropped without close() can still be collected (see __del__)
+        self._checked_out = weakref.WeakValueDictionary()
+        self._keys = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {
+            'created': 0,
+            'checkouts': 0,
+            'returns': 0,
+            'discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'leaks': 0,
+            'peak_in_use': 0,
+        }
+
+    def _connect(self):
+        busy_seconds = int(self.pragmas.get('busy_timeout', 5000)) / 1000.0
+        conn = sqlite3.connect(self.database, timeout=busy_seconds, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def _is_healthy(self, raw):
         try:
-            cursor.execute("PRAGMA table_info(live_chat_session)")
-            columns = [column[1] for column in cursor.fetchall()]
-            if 'connected_admin_id' not in columns:
-                print("🔄 Adding connected_admin_id column to live_chat_session...")
-                cursor.execute("ALTER TABLE live_chat_session ADD COLUMN connected_admin_id INTEGER")
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_chat_session_admin 
-                    ON live_chat_session(connected_admin_id)
-                """)
-                conn.commit()
-                print("✅ connected_admin_id column added!")
-        except Exception as connected_admin_error:
-            print(f"⚠️ Connected admin migration note: {connected_admin_error}")
-        
-        # Create live chat tables if they don't exist
+            raw.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, raw):
         try:
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='live_chat_session'")
-            if not cursor.fetchone():
-                print("🔄 Creating live chat tables...")
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS live_chat_session (
-                        session_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        status TEXT DEFAULT 'active' CHECK (status IN ('active', 'closed')),
-                        admin_connected INTEGER DEFAULT 0,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        last_message_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES user (user_id) ON DELETE CASCADE
-                    )
-                """)
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS live_chat_message (
-                        message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        session_id INTEGER NOT NULL,
-                        sender_type TEXT NOT NULL CHECK (sender_type IN ('user', 'admin', 'system')),
-                        sender_id INTEGER,
-                        message_text TEXT NOT NULL,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (session_id) REFERENCES live_chat_session (session_id) ON DELETE CASCADE
+            raw.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self, request_scoped=False, checkout_site=None):
+        """Check a connection out of the pool, opening a new one if below max_size."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    raw = None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s "
+                        f"({self.max_size} in use)"
                     )
-                """)
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_session_user ON live_chat_session(user_id)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_session_status ON live_chat_session(status)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_message_session ON live_chat_message(session_id)")
-                conn.commit()
-                print("✅ Live chat tables created!")
-        except Exception as chat_error:
-            print(f"⚠️ Chat migration note: {chat_error}")
-        
-        # Create user_challenge table for proof submissions
+                self.stats['waits'] += 1
+                self._cond.wait(remaining)
+
+        # Open / health-check outside the lock so slow I/O doesn't block other threads
         try:
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_challenge'")
-            if not cursor.fetchone():
-                print("🔄 Creating user_challenge table...")
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS user_challenge (
-                        user_challenge_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        challenge_id INTEGER NOT NULL,
-                        status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
-                        proof_file TEXT,
-                        proof_description TEXT,
-                        admin_comment TEXT,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES user(user_id) ON DELETE CASCADE,
-                        FOREIGN KEY (challenge_id) REFERENCES challenge(challenge_id) ON DELETE CASCADE
-                    )
-                """)
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_challenge_user ON user_challenge(user_id)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_challenge_challenge ON user_challenge(challenge_id)")
-                conn.commit()
-                print("✅ user_challenge table created!")
-        except Exception as uc_error:
-            print(f"⚠️ User challenge migration note: {uc_error}")
-        
-        # Add proof_description column to event_booking table
-        cursor.execute("PRAGMA table_info(event_booking)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        if 'proof_description' not in columns:
-            print("🔄 Adding 'proof_description' column to event_booking table...")
-            cursor.execute("ALTER TABLE event_booking ADD COLUMN proof_description TEXT")
-            conn.commit()
-            print("✅ Database migration complete for event_booking table!")
-        
-        # Create challenge_completion table for challenge proof verification
+            if raw is not None and not self._is_healthy(raw):
+                self._discard(raw)
+                with self._cond:
+                    self.stats['discarded'] += 1
+                raw = None
+            if raw is None:
+                raw = self._connect()
+                with self._cond:
+                    self.stats['created'] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        conn = PooledConnection(self, raw, request_scoped, checkout_site)
+        with self._cond:
+            conn.pool_key = next(self._keys)
+            self._checked_out[conn.pool_key] = conn
+            self.stats['checkouts'] += 1
+            self.stats['peak_in_use'] = max(self.stats['peak_in_use'], len(self._checked_out))
+        return conn
+
+    def release(self, conn):
+        """Return a checked-out connection to the pool."""
+        raw = conn.__dict__.get('_raw')
+        if raw is None:
+            return
+        conn.__dict__['_raw'] = None
+
+        healthy = True
         try:
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='challenge_completion'")
-            if not cursor.fetchone():
-                print("🔄 Creating challenge_completion table...")
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS challenge_completion (
-                        completion_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        challenge_id INTEGER NOT NULL,
-                        proof_photo TEXT,
-                        submitted_at TEXT NOT NULL DEFAULT (datetime('now')),
-                        status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
-                        verified_at TEXT,
-                        verified_by_admin_id INTEGER,
-                        rejection_reason TEXT,
-                        FOREIGN KEY (user_id) REFERENCES user(user_id) ON DELETE CASCADE,
-                        FOREIGN KEY (challenge_id) REFERENCES challenge(challenge_id) ON DELETE CASCADE,
-                        FOREIGN KEY (verified_by_admin_id) REFERENCES admin(admin_id) ON DELETE SET NULL,
-                        UNIQUE(user_id, challenge_id)
-                    )
-                """)
-                conn.commit()
-                print("✅ challenge_completion table created!")
-        except Exception as cc_error:
-            print(f"⚠️ Challenge completion migration note: {cc_error}")
-        
-        # Add expiry_date column to reward_redemption table
-        cursor.execute("PRAGMA table_info(reward_redemption)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        if 'expiry_date' not in columns:
-            print("🔄 Adding 'expiry_date' column to reward_redemption table...")
-            cursor.execute("ALTER TABLE reward_redemption ADD COLUMN expiry_date TEXT")
-            conn.commit()
-            print("✅ Database migration complete for reward_redemption table!")
+            if raw.in_transaction:
+                raw.rollback()
+        except sqlite3.Error:
+            healthy = False
+        healthy = healthy and self._is_healthy(raw)
+        if not healthy:
+            self._discard(raw)
+
+        with self._cond:
+            self._checked_out.pop(conn.__dict__.get('pool_key'), None)
+            self.stats['returns'] += 1
+            if healthy:
+                self._idle.append(raw)
+            else:
+                self._size -= 1
+                self.stats['discarded'] += 1
+            self._cond.notify()
+
+    def report_leak(self, conn, reason):
+        """Log a connection that was not returned properly."""
+        with self._cond:
+            self.stats['leaks'] += 1
+        held_for = time.monotonic() - conn.checked_out_at
+        print(f"⚠️ DB connection leak ({reason}): checked out at "
+              f"{conn.checkout_site or 'unknown'}, held {held_for:.2f}s")
+
+    def get_stats(self):
+        """Snapshot of pool metrics."""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = len(self._checked_out)
+            stats['max_size'] = self.max_size
+        return stats
+
+
+# One pool per process: Main.py forks the user and admin apps into separate processes
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's connection pool, creating it on first use."""
+    pid = os.getpid()
+    pool = _pools.get(pid)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(pid)
+            if pool is None:
+                pool = ConnectionPool(
+                    DATABASE,
+                    max_size=int(os.getenv('DB_POOL_SIZE', '10')),
+                    timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+                    pragmas=get_db_profile()[1],
+                )
+                _pools.clear()
+                _pools[pid] = pool
+    return pool
+
 
+def get_pool_stats():
+    """Checkout/return metrics for this process's pool."""
+    return get_pool().get_stats()
+
+
+def _caller_site():
+    frame = sys._getframe(2)
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def get_db_connection():
+    """
+    Return a pooled SQLite connection.
+
+    Inside a Flask app context every call shares one connection stored on flask.g,
+    returned to the pool by close_db() at teardown. Outside an app context
+    (scripts, migrations) the caller owns the connection and must close() it.
+    """
+    if has_app_context():
+        if 'db' not in g:
+            g.db = get_pool().acquire(request_scoped=True, checkout_site=_caller_site())
+        return g.db
+    return get_pool().acquire(checkout_site=_caller_site())
+
+
+def close_db(e=None):
+    """
+    Return the request's connection to the pool, rolling back anything left
+    uncommitted.
+    """
+    db = g.pop('db', None)
+
+    if db is not None:
+        if not db.released and db.in_transaction:
+            db._pool.report_leak(db, "uncommitted transaction at end of request")
+        get_pool().release(db)
+
+def check_db_settings():
+    """
+    Startup self-check: print the SQLite settings actually in effect.
+
+    Reads every PRAGMA back from a pooled connection and flags values that differ
+    from the selected profile (e.g. WAL refused on a network drive).
+    """
+    name, pragmas = get_db_profile()
+    conn = get_db_connection()
+    active = {}
+    try:
+        print(f"🔧 SQLite profile '{name}' (SQLite {sqlite3.sqlite_version})")
+        for key in PRAGMA_ORDER:
+            actual = conn.execute(f"PRAGMA {key}").fetchone()[0]
+            active[key] = actual
+
+            expected = pragmas.get(key)
+            if expected is None:
+                ok = True
+            elif key in PRAGMA_READBACK:
+                ok = PRAGMA_READBACK[key].get(str(expected).upper(), expected) == actual
+            elif key == 'journal_mode':
+                ok = str(actual).lower() == str(expected).lower()
+            else:
+                ok = str(actual) == str(expected)
+            marker = "✅" if ok else "⚠️"
+            suffix = "" if ok else f" (expected {expected})"
+            print(f"   {marker} {key} = {actual}{suffix}")
+    finally:
+        conn.close()
+    return active
+
+# =====================================================
+# SCHEMA CAPABILITIES
+# =====================================================
+# Process-wide {table: frozenset(columns)}, loaded once after migrations so
+# optional features (the FTS5 search tables) can be checked with has_table()
+# instead of running PRAGMA table_info per request.
+_schema_columns = None
+_schema_lock = threading.Lock()
+
+
+def load_schema_capabilities():
+    """Read every table's column list in a single query and cache it."""
+    global _schema_columns
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT m.name AS table_name, p.name AS column_name
+            FROM sqlite_master m
+            JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table'
+        """).fetchall()
+    finally:
         conn.close()
+
+    columns = {}
+    for row in rows:
+        columns.setdefault(row['table_name'], set()).add(row['column_name'])
+    with _schema_lock:
+        _schema_columns = {table: frozenset(cols) for table, cols in columns.items()}
+    return _schema_columns
+
+
+def invalidate_schema_capabilities():
+    """Drop the cached schema; the next lookup reloads it."""
+    global _schema_columns
+    with _schema_lock:
+        _schema_columns = None
+
+
+def get_schema_capabilities():
+    """Cached {table: frozenset(columns)}, loading it on first use."""
+    columns = _schema_columns
+    if columns is None:
+        columns = load_schema_capabilities()
+    return columns
+
+
+def has_table(table):
+    return table in get_schema_capabilities()
+
+
+@contextmanager
+def _migration_lock(timeout=60):
+    """Cross-process file lock so the user and admin processes never migrate at the same time."""
+    handle = open(MIGRATION_LOCK_FILE, 'a+')
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for {MIGRATION_LOCK_FILE}")
+                time.sleep(0.1)
+        yield
+    finally:
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        handle.close()
+
+
+def get_schema_version(conn):
+    """Last applied migration version (PRAGMA user_version)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate_database():
+    """
+    Apply pending schema migrations from migrations.py.
+
+    A current database costs a single PRAGMA user_version read. Otherwise the
+    pending migrations run under a cross-process file lock, all inside one
+    BEGIN IMMEDIATE transaction, and are recorded in schema_migrations.
+    Returns True if anything was applied.
+    """
+    from .migrations import MIGRATIONS, latest_version
+
+    target = latest_version()
+    try:
+        conn = get_db_connection()
+        try:
+            current = get_schema_version(conn)
+        finally:
+            conn.close()
+        if current >= target:
+            if _schema_columns is None:
+                load_schema_capabilities()
+            return False
+
+        with _migration_lock():
+            # Dedicated autocommit connection so BEGIN/COMMIT are fully under our control
+            conn = sqlite3.connect(DATABASE, isolation_level=None)
+            try:
+                apply_pragmas(conn, get_db_profile()[1])
+                # Table rebuilds (create new, copy, drop, rename) must not fire ON DELETE
+                # actions in other tables when the old table is dropped, so foreign keys
+                # stay off on this connection whatever the profile says
+                conn.execute("PRAGMA foreign_keys = OFF")
+                conn.execute("BEGIN IMMEDIATE")
+
+                # The other process may have finished while we waited for the lock
+                current = get_schema_version(conn)
+                pending = [m for m in MIGRATIONS if m[0] > current]
+                if not pending:
+                    conn.execute("ROLLBACK")
+                    return False
+
+                try:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS schema_migrations (
+                            version INTEGER PRIMARY KEY,
+                            name TEXT NOT NULL,
+                            applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+                        )
+                    """)
+                    for version, name, fn in pending:
+                        print(f"🔄 Applying migration {version}: {name}...")
+                        fn(cursor)
+                        cursor.execute(
+                            "INSERT OR REPLACE INTO schema_migrations (version, name) VALUES (?, ?)",
+                            (version, name)
+                        )
+                    cursor.execute(f"PRAGMA user_version = {int(pending[-1][0])}")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.close()
+
+        print(f"✅ Database migrated to schema version {pending[-1][0]}!")
+        invalidate_schema_capabilities()
+        load_schema_capabilities()
+        return True
     except Exception as e:
         print(f"⚠️ Migration warning: {e}")
-
+        return False
@@ -0,0 +1,312 @@
+"""
+Event capacity summary.
+
+event_capacity_summary keeps one row per event with the required and filled
+slot counts for each sign-up role, so the admin event list, the event details
+slot panel and the sign-up full-check read a single row instead of counting
+event_booking and event_role_requirement every time.
+
+Sign-up and withdrawal move the filled counters by one; creating or editing
+an event (or any bulk change to its bookings) recomputes the row from source.
+
+claim_slot() / release_slot() are the sign-up and withdrawal paths: the
+capacity check and the booking write happen in one BEGIN IMMEDIATE
+transaction, with the seat taken by a conditional UPDATE (filled < required),
+so concurrent sign-ups can never overbook a role.
+
+When a role is full users can join its FIFO waitlist; a freed seat is handed
+to the head of the queue inside the same transaction that freed it, and the
+promoted user gets a notification - nobody has to keep refreshing the page.
+"""
+from app.dashboard_data import invalidate_dashboard
+
+ROLE_TYPES = ('teacher', 'participant')
+DEFAULT_REQUIRED = {'teacher': 5, 'participant': 15}
+
+
+def _columns(role_type):
+    if role_type not in ROLE_TYPES:
+        raise ValueError(f"Unknown sign-up role '{role_type}'")
+    return f"{role_type}_required", f"{role_type}_filled"
+
+
+def refresh_event_capacity(conn, event_id):
+    """Recompute an event's summary row from its requirements and bookings. Caller commits."""
+    conn.execute("""
+        INSERT OR REPLACE INTO event_capacity_summary
+            (event_id, teacher_required, teacher_filled, participant_required, participant_filled, updated_at)
+        SELECT :event_id,
+               COALESCE((SELECT required_count FROM event_role_requirement
+                         WHERE event_id = :event_id AND role_type = 'teacher'), :teacher_default),
+               (SELECT COUNT(*) FROM event_booking
+                WHERE event_id = :event_id AND role_type = 'teacher' AND status = 'booked'),
+               COALESCE((SELECT required_count FROM event_role_requirement
+                         WHERE event_id = :event_id AND role_type = 'participant'), :participant_default),
+               (SELECT COUNT(*) FROM event_booking
+                WHERE event_id = :event_id AND role_type = 'participant' AND status = 'booked'),
+               datetime('now')
+    """, {'event_id': event_id,
+          'teacher_default': DEFAULT_REQUIRED['teacher'],
+          'participant_default': DEFAULT_REQUIRED['participant']})
+
+
+def adjust_filled(conn, event_id, role_type, delta):
+    """Add `delta` (+1 sign-up, -1 withdrawal) to a role's filled count. Caller commits."""
+    _, filled_col = _columns(role_type)
+    cursor = conn.execute(f"""
+        UPDATE event_capacity_summary
+        SET {filled_col} = MAX({filled_col} + ?, 0), updated_at = datetime('now')
+        WHERE event_id = ?
+    """, (delta, event_id))
+    if cursor.rowcount == 0:
+        # No summary yet (event inserted outside the app, e.g. seed data) - build it from source
+        refresh_event_capacity(conn, event_id)
+
+
+def get_event_capacity(conn, event_id):
+    """
+    Required/filled counts per role for one event:
+    {'teacher': {'required': 5, 'filled': 2}, 'participant': {...}}
+    Backfills a missing summary row inside the caller's transaction (caller commits).
+    """
+    row = conn.execute(
+        "SELECT * FROM event_capacity_summary WHERE event_id = ?", (event_id,)
+    ).fetchone()
+    if row is None:
+        refresh_event_capacity(conn, event_id)
+        row = conn.execute(
+            "SELECT * FROM event_capacity_summary WHERE event_id = ?", (event_id,)
+        ).fetchone()
+
+    return {role: {'required': row[f"{role}_required"], 'filled': row[f"{role}_filled"]}
+            for role in ROLE_TYPES}
+
+
+# =====================================================
+# SIGN-UP / WITHDRAWAL
+# =====================================================
+def _take_seat(conn, event_id, role_type):
+    """Conditional increment: 1 if a seat was left and is now ours, else 0."""
+    required_col, filled_col = _columns(role_type)
+    return conn.execute(f"""
+        UPDATE event_capacity_summary
+        SET {filled_col} = {filled_col} + 1, updated_at = datetime('now')
+        WHERE event_id = ? AND {filled_col} < {required_col}
+    """, (event_id,)).rowcount
+
+
+def _write_booking(conn, event_id, user_id, role_type):
+    """Book the user (a re-signup after withdrawal reuses the booking row)."""
+    conn.execute("""
+        INSERT INTO event_booking (user_id, event_id, role_type, status, booked_at)
+        VALUES (?, ?, ?, 'booked', datetime('now'))
+        ON CONFLICT(user_id, event_id) DO UPDATE
+        SET role_type = excluded.role_type, status = 'booked', booked_at = excluded.booked_at
+    """, (user_id, event_id, role_type))
+
+
+def claim_slot(conn, event_id, user_id, role_type):
+    """
+    Atomically book `user_id` into `role_type` of an event.
+
+    Returns (result, role): ('booked', role_type), ('already_booked', existing_role)
+    or ('full', role_type). Runs its own BEGIN IMMEDIATE transaction and commits,
+    so call it with no uncommitted writes on `conn`.
+    """
+    _columns(role_type)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        existing = conn.execute(
+            "SELECT status, role_type FROM event_booking WHERE user_id = ? AND event_id = ?",
+            (user_id, event_id)
+        ).fetchone()
+        if existing and existing['status'] == 'booked':
+            conn.rollback()
+            return 'already_booked', existing['role_type']
+
+        # The write lock makes "check a seat is left" and "take it" one step
+        claimed = _take_seat(conn, event_id, role_type)
+        if not claimed and not conn.execute(
+                "SELECT 1 FROM event_capacity_summary WHERE event_id = ?", (event_id,)).fetchone():
+            # First sign-up for an event seeded outside the app: build its row, then retry
+            refresh_event_capacity(conn, event_id)
+            claimed = _take_seat(conn, event_id, role_type)
+        if not claimed:
+            conn.rollback()
+            return 'full', role_type
+
+        _write_booking(conn, event_id, user_id, role_type)
+        conn.commit()
+        return 'booked', role_type
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def release_slot(conn, event_id, user_id):
+    """
+    Cancel a user's booking and free its seat in one transaction; if anyone is
+    waiting for that role, the seat goes to them in the same transaction.
+    Returns the role that was released, or None if the user was not booked. Commits.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        booking = conn.execute(
+            "SELECT role_type FROM event_booking WHERE event_id = ? AND user_id = ? AND status = 'booked'",
+            (event_id, user_id)
+        ).fetchone()
+        if not booking:
+            conn.rollback()
+            return None
+
+        conn.execute(
+            "UPDATE event_booking SET status = 'cancelled' WHERE event_id = ? AND user_id = ?",
+            (event_id, user_id)
+        )
+        if booking['role_type'] in ROLE_TYPES:
+            adjust_filled(conn, event_id, booking['role_type'], -1)
+            # Hand the freed seat straight to the next person waiting for it
+            promoted = promote_from_waitlist(conn, event_id, booking['role_type'])
+        else:
+            promoted = []
+
+        conn.commit()
+        for promoted_id in promoted:
+            invalidate_dashboard(promoted_id)
+        return booking['role_type']
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# =====================================================
+# WAITLIST
+# =====================================================
+def join_waitlist(conn, event_id, user_id, role_type):
+    """
+    Queue the user for a full role. If a seat is free by now they are booked instead.
+
+    Returns (result, detail): ('booked', role_type), ('already_booked', role),
+    ('waitlisted', position) or ('already_waiting', position). Commits.
+    """
+    # claim_slot takes the seat if one is left; otherwise queue in a fresh write
+    # transaction and re-check, so a seat freed in between is not missed
+    result, detail = claim_slot(conn, event_id, user_id, role_type)
+    if result != 'full':
+        return result, detail
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if _take_seat(conn, event_id, role_type):
+            _write_booking(conn, event_id, user_id, role_type)
+            conn.commit()
+            return 'booked', role_type
+
+        added = conn.execute("""
+            INSERT INTO event_waitlist (event_id, user_id, role_type)
+            VALUES (?, ?, ?)
+            ON CONFLICT(event_id, user_id) WHERE status = 'waiting' DO NOTHING
+        """, (event_id, user_id, role_type)).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    entry = get_waitlist_entry(conn, event_id, user_id)
+    return ('waitlisted' if added else 'already_waiting'), entry['position'] if entry else None
+
+
+def leave_waitlist(conn, event_id, user_id):
+    """Take the user off the event's waitlist. Returns True if they were waiting. Commits."""
+    cursor = conn.execute("""
+        UPDATE event_waitlist SET status = 'left'
+        WHERE event_id = ? AND user_id = ? AND status = 'waiting'
+    """, (event_id, user_id))
+    conn.commit()
+    return cursor.rowcount > 0
+
+
+def get_waitlist_entry(conn, event_id, user_id):
+    """The user's place in the queue: {'role_type', 'position', 'waiting'} or None."""
+    entry = conn.execute("""
+        SELECT waitlist_id, role_type FROM event_waitlist
+        WHERE event_id = ? AND user_id = ? AND status = 'waiting'
+    """, (event_id, user_id)).fetchone()
+    if not entry:
+        return None
+
+    counts = conn.execute("""
+        SELECT SUM(waitlist_id <= ?), COUNT(*) FROM event_waitlist
+        WHERE event_id = ? AND role_type = ? AND status = 'waiting'
+    """, (entry['waitlist_id'], event_id, entry['role_type'])).fetchone()
+    return {'role_type': entry['role_type'], 'position': counts[0], 'waiting': counts[1]}
+
+
+def promote_from_waitlist(conn, event_id, role_type, limit=1):
+    """
+    Fill free seats of `role_type` from the head of its queue and notify each
+    promoted user. Runs inside the caller's write transaction (caller commits).
+    Returns the promoted user_ids.
+    """
+    promoted = []
+    title = None
+    while len(promoted) < limit:
+        head = conn.execute("""
+            SELECT waitlist_id, user_id FROM event_waitlist
+            WHERE event_id = ? AND role_type = ? AND status = 'waiting'
+            ORDER BY waitlist_id LIMIT 1
+        """, (event_id, role_type)).fetchone()
+        if not head:
+            break
+
+        booked = conn.execute(
+            "SELECT 1 FROM event_booking WHERE event_id = ? AND user_id = ? AND status = 'booked'",
+            (event_id, head['user_id'])
+        ).fetchone()
+        if booked:
+            # Signed up for the other role in the meantime - drop them from this queue
+            conn.execute("UPDATE event_waitlist SET status = 'expired' WHERE waitlist_id = ?",
+                         (head['waitlist_id'],))
+            continue
+
+        if not _take_seat(conn, event_id, role_type):
+            break
+
+        _write_booking(conn, event_id, head['user_id'], role_type)
+        conn.execute("""
+            UPDATE event_waitlist SET status = 'promoted', promoted_at = datetime('now')
+            WHERE waitlist_id = ?
+        """, (head['waitlist_id'],))
+
+        if title is None:
+            row = conn.execute("SELECT title FROM event WHERE event_id = ?", (event_id,)).fetchone()
+            title = row['title'] if row else 'an event'
+        role_name = 'Mentor' if role_type == 'teacher' else 'Participant'
+        conn.execute(
+            "INSERT INTO notification (user_id, message, event_id) VALUES (?, ?, ?)",
+            (head['user_id'],
+             f"Good news! A {role_name} slot opened up for '{title}' and you have been signed up from the waitlist.",
+             event_id)
+        )
+        promoted.append(head['user_id'])
+    return promoted
+
+
+def fill_from_waitlist(conn, event_id):
+    """Promote waiting users into every free seat (e.g. after capacity was raised). Caller commits."""
+    capacity = get_event_capacity(conn, event_id)
+    promoted = []
+    for role in ROLE_TYPES:
+        free = capacity[role]['required'] - capacity[role]['filled']
+        if free > 0:
+            promoted += promote_from_waitlist(conn, event_id, role, limit=free)
+    return promoted
+
+
+def expire_waitlist(conn, event_id):
+    """Close the waitlist of a voided/ended event. Caller commits."""
+    conn.execute(
+        "UPDATE event_waitlist SET status = 'expired' WHERE event_id = ? AND status = 'waiting'",
+        (event_id,)
+    )
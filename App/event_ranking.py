@@ -0,0 +1,172 @@
+"""
+Interest-based event ranking for the /events page.
+
+    score(event, user) = affinity(user, event.category)
+                       + GRC_MATCH if event.grc_id == user.grc_id
+                       + base_score(event)
+
+affinity combines the user's interested and offered skills, the categories
+of events they booked before and how they rated them. base_score rewards
+events starting soon, newly published events and participation points, and
+is the same for every user.
+
+The user-dependent part is constant within a (category, GRC) bucket, so
+build_ranking_index() sorts every bucket by base_score once, when the events
+catalogue is (re)built. rank_events() then only adds each bucket's bonus and
+merges the bucket heads with a heap: it touches O(buckets + K log buckets)
+events per request instead of scoring the whole catalogue.
+"""
+import heapq
+from datetime import datetime
+
+# Skill categories (skill.category) -> event categories (event.category)
+SKILL_TO_EVENT_CATEGORY = {
+    'Tech and Digital': 'tech_digital',
+    'Life Skills': 'life_skills',
+    'Health and Wellness': 'health_wellness',
+    'Culture and Creative': 'culture_creative',
+}
+
+# Weights
+INTEREST_WEIGHT = 3.0      # wants to learn skills of this category
+OFFERED_WEIGHT = 1.5       # can teach skills of this category
+BOOKING_WEIGHT = 0.5       # per earlier booking in this category...
+BOOKING_CAP = 4            # ...counting at most this many
+RATING_WEIGHT = 0.75       # per star above/below a neutral 3-star review average
+GRC_MATCH = 1.0            # event is in the user's own GRC
+SOON_WEIGHT = 1.0          # starts now ... SOON_DAYS from now, linearly less
+SOON_DAYS = 14
+NEW_WEIGHT = 0.5           # published in the last 7 days
+POINTS_WEIGHT = 0.5        # scaled by participation points, capped at 100
+
+
+# =====================================================
+# INDEX (built with the events catalogue)
+# =====================================================
+def base_score(event, now=None):
+    """User-independent part of an event's score."""
+    now = now or datetime.now()
+    score = 0.0
+    try:
+        start = datetime.fromisoformat(f"{event['date']} {event['time']}".strip())
+        days_away = (start - now).total_seconds() / 86400
+        if 0 <= days_away < SOON_DAYS:
+            score += SOON_WEIGHT * (1 - days_away / SOON_DAYS)
+    except (ValueError, TypeError, KeyError):
+        pass
+    if event.get('is_new'):
+        score += NEW_WEIGHT
+    score += POINTS_WEIGHT * min(event.get('points') or 0, 100) / 100
+    return score
+
+
+def build_ranking_index(events, now=None):
+    """
+    Bucket events by (category, grc_id), each bucket sorted best-first by base_score.
+    Returns {(category, grc_id): (scores, events)}.
+    """
+    now = now or datetime.now()
+    grouped = {}
+    for event in events:
+        key = (event['category'], event.get('grc_id'))
+        grouped.setdefault(key, []).append((base_score(event, now), event))
+
+    index = {}
+    for key, scored in grouped.items():
+        scored.sort(key=lambda item: item[0], reverse=True)
+        index[key] = ([score for score, _ in scored], [event for _, event in scored])
+    return index
+
+
+# =====================================================
+# USER PROFILE
+# =====================================================
+def load_user_profile(conn, user_id):
+    """
+    The signals used to rank events for one user:
+    {'grc_id', 'affinity': {event_category: weight}, 'booked': {event_id, ...}}
+    """
+    rows = conn.execute("""
+        SELECT 'interest' AS source, s.category AS key, COUNT(*) AS value
+        FROM user_skill_interest usi JOIN skill s ON usi.skill_id = s.skill_id
+        WHERE usi.user_id = :user_id GROUP BY s.category
+
+        UNION ALL
+        SELECT 'offered', s.category, COUNT(*)
+        FROM user_skill_offered uso JOIN skill s ON uso.skill_id = s.skill_id
+        WHERE uso.user_id = :user_id GROUP BY s.category
+
+        UNION ALL
+        SELECT 'booked', e.category, COUNT(*)
+        FROM event_booking eb JOIN event e ON eb.event_id = e.event_id
+        WHERE eb.user_id = :user_id AND eb.status IN ('booked', 'completed') GROUP BY e.category
+
+        UNION ALL
+        SELECT 'rating', e.category, AVG(r.rating)
+        FROM review r JOIN event e ON r.event_id = e.event_id
+        WHERE r.user_id = :user_id GROUP BY e.category
+
+        UNION ALL
+        SELECT 'grc', grc_id, NULL FROM user WHERE user_id = :user_id
+    """, {'user_id': user_id}).fetchall()
+
+    affinity = {}
+    grc_id = None
+    for source, key, value in rows:
+        if source == 'grc':
+            grc_id = key
+            continue
+        if source in ('interest', 'offered'):
+            key = SKILL_TO_EVENT_CATEGORY.get(key)
+            if not key:
+                continue
+        if source == 'interest':
+            weight = INTEREST_WEIGHT
+        elif source == 'offered':
+            weight = OFFERED_WEIGHT
+        elif source == 'booked':
+            weight = BOOKING_WEIGHT * min(value, BOOKING_CAP)
+        else:
+            weight = RATING_WEIGHT * (value - 3)
+        affinity[key] = affinity.get(key, 0.0) + weight
+
+    booked = {row[0] for row in conn.execute(
+        "SELECT event_id FROM event_booking WHERE user_id = ? AND status = 'booked'", (user_id,)
+    )}
+    return {'grc_id': grc_id, 'affinity': affinity, 'booked': booked}
+
+
+# =====================================================
+# RANKING
+# =====================================================
+def rank_events(index, profile, k=8, exclude_ids=(), categories=None):
+    """
+    Top `k` events for a user, best first.
+    `categories` restricts the ranking to those event categories (e.g. a section).
+    """
+    affinity = profile.get('affinity', {})
+    grc_id = profile.get('grc_id')
+
+    # One heap entry per bucket: its best remaining event plus the user's bonus for the bucket
+    heap = []
+    buckets = []
+    for (category, event_grc), (scores, events) in index.items():
+        if categories is not None and category not in categories:
+            continue
+        bonus = affinity.get(category, 0.0)
+        if grc_id is not None and event_grc == grc_id:
+            bonus += GRC_MATCH
+        buckets.append((bonus, scores, events))
+        heap.append((-(bonus + scores[0]), len(buckets) - 1, 0))
+    heapq.heapify(heap)
+
+    ranked = []
+    while heap and len(ranked) < k:
+        _, b, pos = heapq.heappop(heap)
+        bonus, scores, events = buckets[b]
+        event = events[pos]
+        if event['id'] not in exclude_ids:
+            ranked.append(event)
+        if pos + 1 < len(events):
+            heapq.heappush(heap, (-(bonus + scores[pos + 1]), b, pos + 1))
+    return ranked
@@ -0,0 +1,44 @@
+"""
+Cached events catalogue for the /events page.
+
+The published events, their sections, the ranking index and the active
+challenges are the same for every user and only change when an admin publishes, unpublishes, voids,
+ends or edits something. They are built once per process and reused until
+invalidate_catalogue() is called. The invalidation goes over the message bus,
+so an admin action in the admin app (5001) also refreshes the user app (5000).
+
+CATALOGUE_TTL bounds staleness for changes made outside the admin routes
+(and for the time-based "new" badge).
+"""
+import os
+import threading
+import time
+from app import message_bus
+
+CHANNEL = 'catalogue:events'
+CATALOGUE_TTL = float(os.getenv('CATALOGUE_TTL', 300))
+
+_cache = {'version': None, 'expires_at': 0, 'data': None}
+_cache_lock = threading.Lock()
+
+
+def get_catalogue(build):
+    """Return the cached catalogue, calling build() to rebuild it when it is stale."""
+    version = message_bus.version(CHANNEL)
+    if _cache['version'] == version and time.time() < _cache['expires_at']:
+        return _cache['data']
+
+    with _cache_lock:
+        # Another request may have rebuilt it while we waited for the lock
+        version = message_bus.version(CHANNEL)
+        if _cache['version'] == version and time.time() < _cache['expires_at']:
+            return _cache['data']
+
+        data = build()
+        _cache.update(version=version, expires_at=time.time() + CATALOGUE_TTL, data=data)
+        return data
+
+
+def invalidate_catalogue():
+    """Drop the catalogue in every app process (call after the change is committed)."""
+    message_bus.publish(CHANNEL)
@@ -0,0 +1,163 @@
+"""
+Streaming CSV / NDJSON exports for the admin app.
+
+Rows go straight from a SQLite cursor to the response in batches of
+EXPORT_BATCH, so an export holds one batch in memory no matter how large
+the table is. Like chat_event_stream(), the generator runs after the view
+has returned and checks out its own pooled connection for the duration of
+the download.
+
+Queries walk each table in primary key order, so SQLite streams them
+without building a sorted copy first.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from flask import Response
+from app.db import get_db_connection
+
+EXPORT_BATCH = 500
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# Spreadsheet apps run cells starting with these as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+EXPORTS = {
+    'participants': {
+        'sql': """
+            SELECT eb.event_id, e.title AS event_title, eb.role_type, eb.status AS booking_status,
+                   eb.booked_at, u.user_id, u.name, u.email, u.role AS user_role, u.phone
+            FROM event_booking eb
+            JOIN user u ON eb.user_id = u.user_id
+            JOIN event e ON eb.event_id = e.event_id
+            WHERE eb.event_id = :event_id
+            ORDER BY eb.role_type, eb.booked_at
+        """,
+        'filters': {'status': "eb.status = :status"},
+        'required': ('event_id',),
+    },
+    'redemptions': {
+        'sql': """
+            SELECT rr.redemption_id, rr.created_at, rr.status, rr.voucher_code,
+                   u.user_id, u.name AS user_name, u.email AS user_email,
+                   r.reward_id, r.name AS reward_name, r.points_required
+            FROM reward_redemption rr
+            JOIN user u ON rr.user_id = u.user_id
+            JOIN reward r ON rr.reward_id = r.reward_id
+            WHERE 1 = 1
+            ORDER BY rr.redemption_id
+        """,
+        'filters': {'status': "rr.status = :status"},
+    },
+    'points': {
+        'sql': """
+            SELECT pt.transaction_id, pt.created_at, pt.user_id, u.name AS user_name,
+                   pt.points_change, pt.event_id, pt.redemption_id, pt.remarks
+            FROM points_transaction pt
+            JOIN user u ON pt.user_id = u.user_id
+            WHERE 1 = 1
+            ORDER BY pt.transaction_id
+        """,
+        'filters': {'user_id': "pt.user_id = :user_id"},
+    },
+    'tickets': {
+        'sql': """
+            SELECT st.ticket_id, st.created_at, st.status, st.subject, st.description, st.reply,
+                   u.user_id, u.name AS user_name, u.email AS user_email
+            FROM support_ticket st
+            JOIN user u ON st.user_id = u.user_id
+            WHERE 1 = 1
+            ORDER BY st.ticket_id
+        """,
+        'filters': {'status': "st.status = :status"},
+    },
+}
+
+
+def build_export_query(dataset, args):
+    """
+    (sql, params) for an export, with the optional filters present in `args`
+    (e.g. request.args) applied. Raises KeyError for an unknown dataset and
+    ValueError for a missing required argument.
+    """
+    spec = EXPORTS[dataset]
+    params = {}
+    for name in spec.get('required', ()):
+        if not args.get(name):
+            raise ValueError(f"'{name}' is required")
+        params[name] = args.get(name)
+
+    clauses = []
+    for name, clause in spec['filters'].items():
+        if args.get(name):
+            clauses.append(clause)
+            params[name] = args.get(name)
+
+    sql = spec['sql']
+    if clauses:
+        sql = sql.replace("ORDER BY", "AND " + " AND ".join(clauses) + "\n            ORDER BY", 1)
+    return sql, params
+
+
+def stream_rows(sql, params):
+    """Yield the column names, then every row, fetched EXPORT_BATCH at a time."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(sql, params)
+        yield [col[0] for col in cursor.description]
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(rows):
+    """CSV text for a header + rows iterator, one chunk per EXPORT_BATCH rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM so Excel opens the file as UTF-8
+    writer.writerow(next(rows))
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_cell(value) for value in row])
+        if count % EXPORT_BATCH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(rows):
+    """One JSON object per line for a header + rows iterator, one chunk per EXPORT_BATCH rows."""
+    columns = next(rows)
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str))
+        if len(lines) == EXPORT_BATCH:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_response(dataset, fmt, sql, params):
+    """Streaming download of the query result as `fmt` ('csv' or 'ndjson')."""
+    chunks = csv_chunks if fmt == 'csv' else ndjson_chunks
+    filename = f"skillswap-{dataset}-{datetime.now().strftime('%Y%m%d-%H%M')}.{fmt}"
+    return Response(chunks(stream_rows(sql, params)),
+                    content_type=FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'Cache-Control': 'no-store',
+                             'X-Accel-Buffering': 'no'})
@@ -0,0 +1,179 @@
+"""
+Live chat helpers shared by the user (Support.py) and admin (Admin.py) routes.
+
+Clients open a Server-Sent Events stream per chat session. The stream reads the
+database only when the session's message bus channel changes, then pushes the
+new messages and any status change (admin connected, chat closed).
+
+The JSON message endpoints take an after_message_id cursor and answer with
+only the newer messages, or 304 Not Modified when the client's ETag is current.
+
+live_chat_session carries a summary of its messages (last message, count and
+unread counters for each side), kept current by record_message() so the chat
+inboxes never have to aggregate live_chat_message.
+"""
+import json
+import time
+from flask import Response, jsonify
+from app.db import get_db_connection
+from app import message_bus
+
+STREAM_HEARTBEAT = 15      # seconds between keep-alive comments
+STREAM_LIFETIME = 300      # seconds before the server ends a stream (EventSource reconnects)
+
+
+def chat_channel(session_id):
+    return f"chat:{session_id}"
+
+
+def notify_chat(session_id):
+    """Tell every open stream for this session (in any app process) to refresh."""
+    message_bus.publish(chat_channel(session_id))
+
+
+def fetch_messages(conn, session_id, after_id=0):
+    """Messages of a session with message_id > after_id, oldest first."""
+    rows = conn.execute(
+        """SELECT m.*, u.name as sender_name
+           FROM live_chat_message m
+           LEFT JOIN user u ON m.sender_id = u.user_id AND m.sender_type = 'user'
+           WHERE m.session_id = ? AND m.message_id > ?
+           ORDER BY m.message_id ASC""",
+        (session_id, after_id or 0)
+    ).fetchall()
+    return [dict(m) for m in rows]
+
+
+def latest_message_id(conn, session_id):
+    row = conn.execute(
+        "SELECT last_message_id FROM live_chat_session WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    return (row[0] or 0) if row else 0
+
+
+def record_message(conn, session_id, sender_type, sender_id, message_text):
+    """
+    Insert a chat message and update the session summary in the same transaction.
+    The sender has obviously read the conversation, so their unread counter resets.
+    Caller commits (then calls notify_chat).
+    """
+    cursor = conn.execute(
+        "INSERT INTO live_chat_message (session_id, sender_type, sender_id, message_text) VALUES (?, ?, ?, ?)",
+        (session_id, sender_type, sender_id, message_text)
+    )
+    message_id = cursor.lastrowid
+    conn.execute(
+        """UPDATE live_chat_session
+           SET last_message_at = CURRENT_TIMESTAMP,
+               last_message_id = ?,
+               last_message_text = ?,
+               message_count = message_count + 1,
+               unread_by_admin = CASE WHEN ? = 'admin' THEN 0 ELSE unread_by_admin + 1 END,
+               unread_by_user = CASE WHEN ? = 'user' THEN 0 ELSE unread_by_user + 1 END
+           WHERE session_id = ?""",
+        (message_id, message_text, sender_type, sender_type, session_id)
+    )
+    return message_id
+
+
+def mark_chat_read(conn, session_id, reader):
+    """Reset the unread counter of `reader` ('user' or 'admin'). Caller commits."""
+    column = 'unread_by_admin' if reader == 'admin' else 'unread_by_user'
+    conn.execute(f"UPDATE live_chat_session SET {column} = 0 WHERE session_id = ? AND {column} > 0",
+                 (session_id,))
+
+
+def conditional_json(request, etag, build):
+    """
+    JSON response tagged with `etag`; 304 Not Modified if the client already has it.
+    `build` is only called when the body is actually needed.
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def chat_event_stream(session_id, after_id=0, reader='user'):
+    """
+    Generator for a chat session's SSE stream, watched by `reader` ('user' or 'admin').
+
+    Runs after the request has finished, so each refresh borrows a pooled
+    connection only for the duration of its queries. Pushed messages count as
+    read, so the reader's unread counter is reset whenever it is non-zero.
+    """
+    unread_column = 'unread_by_admin' if reader == 'admin' else 'unread_by_user'
+    channel = chat_channel(session_id)
+    deadline = time.monotonic() + STREAM_LIFETIME
+    seen = message_bus.version(channel)
+    state = None
+
+    yield "retry: 2000\n\n"
+    while True:
+        conn = get_db_connection()
+        try:
+            chat = conn.execute(
+                f"""SELECT status, admin_connected, last_message_id, {unread_column} AS unread
+                    FROM live_chat_session WHERE session_id = ?""",
+                (session_id,)
+            ).fetchone()
+            messages = []
+            if chat and (chat['last_message_id'] or 0) > after_id:
+                messages = fetch_messages(conn, session_id, after_id)
+            if chat and chat['unread']:
+                mark_chat_read(conn, session_id, reader)
+                conn.commit()
+        finally:
+            conn.close()
+
+        if not chat:
+            yield _sse('status', {'status': 'closed', 'admin_connected': False})
+            return
+
+        new_state = {'status': chat['status'], 'admin_connected': bool(chat['admin_connected'])}
+        if new_state != state:
+            yield _sse('status', new_state)
+            state = new_state
+
+        for msg in messages:
+            yield _sse('message', msg, event_id=msg['message_id'])
+            after_id = msg['message_id']
+
+        # Sleep until someone publishes to this session (no DB work while idle)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            current = message_bus.wait(channel, seen, min(STREAM_HEARTBEAT, remaining))
+            if current != seen:
+                seen = current
+                break
+            yield ": keep-alive\n\n"
+
+
+def stream_response(session_id, after_id=0, reader='user'):
+    """text/event-stream response for chat_event_stream()."""
+    return Response(chat_event_stream(session_id, after_id, reader),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def stream_cursor(request):
+    """Resume point: EventSource's Last-Event-ID header, else ?after=<message_id>."""
+    value = request.headers.get('Last-Event-ID') or request.args.get('after') or 0
+    try:
+        return int(value)
+    except ValueError:
+        return 0
@@ -0,0 +1,157 @@
+"""
+Lightweight publish/subscribe bus for push updates (live chat) and cache
+invalidation (events catalogue, user dashboards).
+
+Inside a process, subscribers block on a condition variable until a channel's
+version changes, so an idle listener costs no database queries. The user app
+(5000) and admin app (5001) are separate processes, so every publish is also
+sent as a UDP datagram on 127.0.0.1 to the other processes on this machine.
+Each process registers its listening port as a small file in BUS_DIR.
+"""
+import atexit
+import glob
+import os
+import socket
+import threading
+import time
+from app.db import DATABASE
+
+BUS_DIR = DATABASE + '.bus'
+HEARTBEAT = 10       # seconds between registration refreshes
+PEER_TTL = 60        # ignore registrations not refreshed for this long
+PEER_CACHE = 2       # seconds to reuse the peer list between publishes
+
+_versions = {}
+_cond = threading.Condition()
+
+_state_lock = threading.Lock()
+_started_pid = None
+_port_file = None
+_send_sock = None
+_peers = []
+_peers_loaded_at = 0
+
+
+# =====================================================
+# LOCAL CHANNELS
+# =====================================================
+def _bump(channel):
+    with _cond:
+        _versions[channel] = _versions.get(channel, 0) + 1
+        _cond.notify_all()
+
+
+def version(channel):
+    """Current version of a channel in this process (0 if never published)."""
+    _ensure_started()
+    with _cond:
+        return _versions.get(channel, 0)
+
+
+def wait(channel, since, timeout):
+    """Block until `channel` moves past version `since` or `timeout` expires; return its version."""
+    _ensure_started()
+    with _cond:
+        _cond.wait_for(lambda: _versions.get(channel, 0) != since, timeout)
+        return _versions.get(channel, 0)
+
+
+def publish(channel):
+    """Wake every subscriber of `channel` in this and the other app processes."""
+    _ensure_started()
+    _bump(channel)
+
+    payload = f"{os.getpid()}:{channel}".encode('utf-8')
+    for port in _get_peers():
+        try:
+            _send_sock.sendto(payload, ('127.0.0.1', port))
+        except OSError:
+            pass  # Peer went away; its registration expires on its own
+
+
+# =====================================================
+# CROSS-PROCESS TRANSPORT
+# =====================================================
+def _get_peers():
+    """Ports of the other live processes, refreshed at most every PEER_CACHE seconds."""
+    global _peers, _peers_loaded_at
+    now = time.time()
+    if now - _peers_loaded_at < PEER_CACHE:
+        return _peers
+
+    peers = []
+    for path in glob.glob(os.path.join(BUS_DIR, '*.port')):
+        if path == _port_file:
+            continue
+        try:
+            if now - os.path.getmtime(path) > PEER_TTL:
+                os.remove(path)
+                continue
+            with open(path) as f:
+                peers.append(int(f.read().strip()))
+        except (OSError, ValueError):
+            continue
+    _peers, _peers_loaded_at = peers, now
+    return peers
+
+
+def _register(port):
+    with open(_port_file, 'w') as f:
+        f.write(str(port))
+
+
+def _listen(sock, port):
+    own_pid = str(os.getpid())
+    last_refresh = time.time()
+    while True:
+        try:
+            data, _ = sock.recvfrom(1024)
+            pid, _, channel = data.decode('utf-8').partition(':')
+            if pid != own_pid and channel:
+                _bump(channel)
+        except socket.timeout:
+            pass
+        except OSError:
+            # Windows reports ICMP "port unreachable" from earlier sends here; keep listening
+            time.sleep(0.1)
+
+        if time.time() - last_refresh >= HEARTBEAT:
+            try:
+                _register(port)
+            except OSError:
+                pass
+            last_refresh = time.time()
+
+
+def _unregister():
+    try:
+        if _port_file:
+            os.remove(_port_file)
+    except OSError:
+        pass
+
+
+def _ensure_started():
+    """Start this process's listener thread (once per process, also after fork)."""
+    global _started_pid, _port_file, _send_sock, _peers, _peers_loaded_at
+    if _started_pid == os.getpid():
+        return
+    with _state_lock:
+        if _started_pid == os.getpid():
+            return
+
+        os.makedirs(BUS_DIR, exist_ok=True)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.settimeout(HEARTBEAT)
+        port = sock.getsockname()[1]
+
+        _port_file = os.path.join(BUS_DIR, f"{os.getpid()}.port")
+        _register(port)
+        atexit.register(_unregister)
+
+        _send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _peers, _peers_loaded_at = [], 0
+
+        threading.Thread(target=_listen, args=(sock, port), name='message-bus', daemon=True).start()
+        _started_pid = os.getpid()
@@ -0,0 +1,622 @@
+"""
+Ordered schema migrations for the SkillSwap database.
+
+Each migration runs exactly once, in version order, inside the single
+transaction opened by migrate_database() in db.py. PRAGMA user_version stores
+the last applied version, so a database that is already current skips all of this.
+
+Migrations receive a cursor and must not commit - the engine does that.
+foreign_keys is OFF on the migration connection, so a table can be rebuilt
+(create new, copy, drop, rename) without firing other tables' ON DELETE actions.
+"""
+import sqlite3
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register the decorated function as schema migration `version`."""
+    def register(fn):
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def latest_version():
+    """Highest registered migration version."""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+def table_exists(cursor, table):
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def table_columns(cursor, table):
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def add_column(cursor, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN, skipped if the column is already there."""
+    if column not in table_columns(cursor, table):
+        print(f"🔄 Adding '{column}' column to {table} table...")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# =====================================================
+# MIGRATIONS
+# =====================================================
+@migration(1, "legacy columns and tables")
+def _legacy_schema(cursor):
+    """Everything the old per-boot migrate_database() used to check for."""
+    add_column(cursor, 'event', 'published_at', 'TEXT')
+    add_column(cursor, 'support_ticket', 'reply', 'TEXT')
+
+    # Rebuild challenge table so its CHECK constraint allows 'pending'
+    row = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='challenge'"
+    ).fetchone()
+    if row and "'pending'" not in row[0]:
+        print("🔄 Migrating 'challenge' table to support 'pending' status...")
+        cursor.execute("""
+            CREATE TABLE challenge_new (
+                challenge_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                bonus_points INTEGER DEFAULT 0,
+                target_count INTEGER DEFAULT 1,
+                status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'active', 'inactive', 'published', 'voided', 'ended')),
+                void_reason TEXT,
+                created_by INTEGER,
+                created_at TEXT NOT NULL DEFAULT (datetime('now')),
+                published_at TEXT,
+                voided_at TEXT,
+                ended_at TEXT,
+                FOREIGN KEY (created_by) REFERENCES admin(admin_id) ON DELETE SET NULL
+            )
+        """)
+        # Copy by column name - older tables may not have every column
+        shared = [c for c in table_columns(cursor, 'challenge') if c in table_columns(cursor, 'challenge_new')]
+        column_list = ', '.join(shared)
+        cursor.execute(f"INSERT INTO challenge_new ({column_list}) SELECT {column_list} FROM challenge")
+        cursor.execute("DROP TABLE challenge")
+        cursor.execute("ALTER TABLE challenge_new RENAME TO challenge")
+
+    add_column(cursor, 'challenge', 'target_count', 'INTEGER DEFAULT 1')
+
+    # Live chat tables
+    if not table_exists(cursor, 'live_chat_session'):
+        print("🔄 Creating live chat tables...")
+        cursor.execute("""
+            CREATE TABLE live_chat_session (
+                session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                status TEXT DEFAULT 'active' CHECK (status IN ('active', 'closed')),
+                admin_connected INTEGER DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_message_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES user (user_id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS live_chat_message (
+                message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NOT NULL,
+                sender_type TEXT NOT NULL CHECK (sender_type IN ('user', 'admin', 'system')),
+                sender_id INTEGER,
+                message_text TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (session_id) REFERENCES live_chat_session (session_id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_session_user ON live_chat_session(user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_session_status ON live_chat_session(status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_message_session ON live_chat_message(session_id)")
+
+    add_column(cursor, 'live_chat_session', 'admin_connected', 'INTEGER DEFAULT 0')
+    add_column(cursor, 'live_chat_session', 'connected_admin_id', 'INTEGER')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_session_admin ON live_chat_session(connected_admin_id)")
+
+    # Proof submissions for challenges
+    if not table_exists(cursor, 'user_challenge'):
+        print("🔄 Creating user_challenge table...")
+        cursor.execute("""
+            CREATE TABLE user_challenge (
+                user_challenge_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                challenge_id INTEGER NOT NULL,
+                status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+                proof_file TEXT,
+                proof_description TEXT,
+                admin_comment TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES user(user_id) ON DELETE CASCADE,
+                FOREIGN KEY (challenge_id) REFERENCES challenge(challenge_id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_challenge_user ON user_challenge(user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_challenge_challenge ON user_challenge(challenge_id)")
+
+    add_column(cursor, 'event_booking', 'proof_description', 'TEXT')
+
+    if not table_exists(cursor, 'challenge_completion'):
+        print("🔄 Creating challenge_completion table...")
+        cursor.execute("""
+            CREATE TABLE challenge_completion (
+                completion_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                challenge_id INTEGER NOT NULL,
+                proof_photo TEXT,
+                submitted_at TEXT NOT NULL DEFAULT (datetime('now')),
+                status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+                verified_at TEXT,
+                verified_by_admin_id INTEGER,
+                rejection_reason TEXT,
+                FOREIGN KEY (user_id) REFERENCES user(user_id) ON DELETE CASCADE,
+                FOREIGN KEY (challenge_id) REFERENCES challenge(challenge_id) ON DELETE CASCADE,
+                FOREIGN KEY (verified_by_admin_id) REFERENCES admin(admin_id) ON DELETE SET NULL,
+                UNIQUE(user_id, challenge_id)
+            )
+        """)
+
+    add_column(cursor, 'reward_redemption', 'expiry_date', 'TEXT')
+
+
+@migration(2, "support ticket attachments")
+def _support_ticket_attachments(cursor):
+    """Columns Support.submit_ticket and admin_support_tickets used to ALTER in on every request."""
+    add_column(cursor, 'support_ticket', 'screenshot_path', 'TEXT')
+    add_column(cursor, 'support_ticket', 'event_name', 'TEXT')
+
+
+@migration(3, "hot query index pack")
+def _hot_query_indexes(cursor):
+    """Composite/partial indexes for the dashboard, events, rewards and support queries."""
+    print("🔄 Creating hot query indexes...")
+    statements = [
+        # Dashboard unread notifications: WHERE user_id = ? AND is_read = 0 ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_notification_user_unread ON notification(user_id, created_at DESC) WHERE is_read = 0",
+        # Published catalogue / guest view / admin status tabs: WHERE status = ? ORDER BY start_datetime
+        "CREATE INDEX IF NOT EXISTS idx_event_status_start ON event(status, start_datetime)",
+        # Slot counts and participant lists: WHERE event_id = ? AND status = 'booked'
+        "CREATE INDEX IF NOT EXISTS idx_event_booking_event_status ON event_booking(event_id, status, role_type)",
+        # Admin proof verification queue
+        "CREATE INDEX IF NOT EXISTS idx_event_booking_proof_pending ON event_booking(event_id) WHERE proof_media_url IS NOT NULL AND status != 'completed'",
+        # Redemption queues (admin) and per-user reward tabs
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemption_status ON reward_redemption(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_reward_redemption_user ON reward_redemption(user_id, status)",
+        # Challenge proofs: pending queue and per-user progress counts
+        "CREATE INDEX IF NOT EXISTS idx_user_challenge_pending ON user_challenge(created_at) WHERE status = 'pending'",
+        "CREATE INDEX IF NOT EXISTS idx_user_challenge_progress ON user_challenge(user_id, challenge_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_challenge_status_end ON challenge(status, end_date)",
+        # Support tickets by status (admin filter/counters) and by owner
+        "CREATE INDEX IF NOT EXISTS idx_support_ticket_status ON support_ticket(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_support_ticket_user ON support_ticket(user_id, created_at)",
+        # Admin pending verifications
+        "CREATE INDEX IF NOT EXISTS idx_user_pending_verification ON user(created_at) WHERE verification_status = 'pending'",
+        # Reviews looked up per user / per booking
+        "CREATE INDEX IF NOT EXISTS idx_review_user_event ON review(user_id, event_id)",
+        "CREATE INDEX IF NOT EXISTS idx_points_transaction_user ON points_transaction(user_id, created_at)",
+        # Chat history in order without a temp b-tree
+        "CREATE INDEX IF NOT EXISTS idx_chat_message_session_time ON live_chat_message(session_id, created_at)",
+    ]
+    for sql in statements:
+        cursor.execute(sql)
+
+
+@migration(4, "notification fan-out jobs")
+def _notification_jobs(cursor):
+    """Queue for bulk notification fan-out (see notifications.py)."""
+    print("🔄 Creating notification_job table...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notification_job (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            audience TEXT NOT NULL CHECK (audience IN ('all', 'booked')),
+            message TEXT NOT NULL,
+            event_id INTEGER,
+            challenge_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+            total INTEGER,
+            processed INTEGER NOT NULL DEFAULT 0,
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_by_admin_id INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            started_at TEXT,
+            heartbeat_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notification_job_status ON notification_job(status, job_id)")
+
+
+@migration(5, "broadcast notifications")
+def _broadcast_notifications(cursor):
+    """One row per announcement plus sparse per-user read state (see notifications.py)."""
+    print("🔄 Creating broadcast notification tables...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notification_broadcast (
+            broadcast_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            audience TEXT NOT NULL CHECK (audience IN ('all', 'youth', 'senior', 'booked')),
+            message TEXT NOT NULL,
+            event_id INTEGER,
+            challenge_id INTEGER,
+            created_by_admin_id INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (event_id) REFERENCES event(event_id) ON DELETE CASCADE,
+            FOREIGN KEY (challenge_id) REFERENCES challenge(challenge_id) ON DELETE CASCADE
+        )
+    """)
+    # Only users who have read/dismissed a broadcast get a row here
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notification_broadcast_read (
+            broadcast_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            read_at TEXT NOT NULL DEFAULT (datetime('now')),
+            PRIMARY KEY (broadcast_id, user_id),
+            FOREIGN KEY (broadcast_id) REFERENCES notification_broadcast(broadcast_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notification_broadcast_created ON notification_broadcast(created_at)")
+
+
+@migration(6, "live chat session summaries")
+def _chat_session_summaries(cursor):
+    """Denormalised last message / counters on live_chat_session, backfilled from existing messages."""
+    add_column(cursor, 'live_chat_session', 'last_message_id', 'INTEGER')
+    add_column(cursor, 'live_chat_session', 'last_message_text', 'TEXT')
+    add_column(cursor, 'live_chat_session', 'message_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, 'live_chat_session', 'unread_by_admin', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, 'live_chat_session', 'unread_by_user', 'INTEGER NOT NULL DEFAULT 0')
+
+    print("🔄 Backfilling live chat session summaries...")
+    cursor.execute("""
+        UPDATE live_chat_session SET
+            message_count = (SELECT COUNT(*) FROM live_chat_message m
+                             WHERE m.session_id = live_chat_session.session_id),
+            last_message_id = (SELECT MAX(message_id) FROM live_chat_message m
+                               WHERE m.session_id = live_chat_session.session_id),
+            last_message_text = (SELECT message_text FROM live_chat_message m
+                                 WHERE m.session_id = live_chat_session.session_id
+                                 ORDER BY m.message_id DESC LIMIT 1)
+    """)
+    # Active chats: user messages after the last admin reply are still waiting for an admin
+    cursor.execute("""
+        UPDATE live_chat_session SET unread_by_admin = (
+            SELECT COUNT(*) FROM live_chat_message m
+            WHERE m.session_id = live_chat_session.session_id
+              AND m.sender_type = 'user'
+              AND m.message_id > COALESCE((SELECT MAX(a.message_id) FROM live_chat_message a
+                                           WHERE a.session_id = live_chat_session.session_id
+                                             AND a.sender_type = 'admin'), 0)
+        )
+        WHERE status = 'active'
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_session_last_message ON live_chat_session(last_message_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_session_user_last ON live_chat_session(user_id, last_message_at)")
+
+
+@migration(7, "user listing indexes")
+def _user_listing_indexes(cursor):
+    """Keyset pagination for /admin/manage-users: newest first, optionally within a role."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_created ON user(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_role_created ON user(role, created_at)")
+
+
+@migration(8, "event capacity summary")
+def _event_capacity_summary(cursor):
+    """One row per event with required/filled slots per role (see event_capacity.py), backfilled."""
+    print("🔄 Creating event_capacity_summary table...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS event_capacity_summary (
+            event_id INTEGER PRIMARY KEY,
+            teacher_required INTEGER NOT NULL DEFAULT 5,
+            teacher_filled INTEGER NOT NULL DEFAULT 0,
+            participant_required INTEGER NOT NULL DEFAULT 15,
+            participant_filled INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (event_id) REFERENCES event(event_id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO event_capacity_summary
+            (event_id, teacher_required, teacher_filled, participant_required, participant_filled)
+        SELECT e.event_id,
+               COALESCE((SELECT required_count FROM event_role_requirement r
+                         WHERE r.event_id = e.event_id AND r.role_type = 'teacher'), 5),
+               (SELECT COUNT(*) FROM event_booking b
+                WHERE b.event_id = e.event_id AND b.role_type = 'teacher' AND b.status = 'booked'),
+               COALESCE((SELECT required_count FROM event_role_requirement r
+                         WHERE r.event_id = e.event_id AND r.role_type = 'participant'), 15),
+               (SELECT COUNT(*) FROM event_booking b
+                WHERE b.event_id = e.event_id AND b.role_type = 'participant' AND b.status = 'booked')
+        FROM event e
+    """)
+
+
+@migration(9, "event waitlist")
+def _event_waitlist(cursor):
+    """Per-role FIFO waitlist for full events (see event_capacity.py)."""
+    print("🔄 Creating event_waitlist table...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS event_waitlist (
+            waitlist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            role_type TEXT NOT NULL CHECK (role_type IN ('teacher', 'participant')),
+            status TEXT NOT NULL DEFAULT 'waiting' CHECK (status IN ('waiting', 'promoted', 'left', 'expired')),
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            promoted_at TEXT,
+            FOREIGN KEY (event_id) REFERENCES event(event_id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES user(user_id) ON DELETE CASCADE
+        )
+    """)
+    # Head of each role's queue is the first entry of this partial index
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_event_waitlist_queue
+        ON event_waitlist(event_id, role_type, waitlist_id) WHERE status = 'waiting'
+    """)
+    # A user waits at most once per event
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_event_waitlist_user
+        ON event_waitlist(event_id, user_id) WHERE status = 'waiting'
+    """)
+
+
+@migration(10, "skill matching indexes")
+def _skill_matching_indexes(cursor):
+    """Inverted skill -> user lookups and per-user match lookups (see skill_matching.py)."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_skill_offered_skill ON user_skill_offered(skill_id, user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_skill_interest_skill ON user_skill_interest(skill_id, user_id)")
+    # youth_id lookups use the primary key
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_match_senior ON match(senior_id, status)")
+
+
+# (fts table, source table, key column, indexed columns)
+FTS_TABLES = [
+    ('event_fts', 'event', 'event_id', ('title', 'description', 'location')),
+    ('challenge_fts', 'challenge', 'challenge_id', ('title', 'description')),
+    ('faq_fts', 'faq_article', 'faq_id', ('question', 'answer', 'category')),
+]
+
+
+@migration(11, "full-text search")
+def _full_text_search(cursor):
+    """FTS5 indexes over events, challenges and FAQs, kept in sync by triggers (see search.py)."""
+    print("🔄 Creating full-text search indexes...")
+    for fts, source, key, columns in FTS_TABLES:
+        cols = ', '.join(columns)
+        new_values = ', '.join(f"new.{c}" for c in columns)
+        old_values = ', '.join(f"old.{c}" for c in columns)
+        try:
+            # External content: the index stores terms only, rows are read from the source table
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    {cols}, content='{source}', content_rowid='{key}',
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5 - search.py falls back to LIKE
+            print(f"⚠️ Full-text search unavailable ({e}), skipping {fts}")
+            return
+
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.{key}, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{key}, {old_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {source} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.{key}, {old_values});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.{key}, {new_values});
+            END
+        """)
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+@migration(12, "user stats rollup")
+def _user_stats(cursor):
+    """
+    Per-user impact counters for the dashboard (see user_stats.py), backfilled.
+    The formulas are frozen here as they were at version 12; changing the weights
+    in user_stats.py needs a new migration to redefine impact_score.
+    """
+    print("🔄 Creating user_stats table...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            events_completed INTEGER NOT NULL DEFAULT 0,
+            teaching_sessions INTEGER NOT NULL DEFAULT 0,
+            total_hours REAL NOT NULL DEFAULT 0,
+            reviews_written INTEGER NOT NULL DEFAULT 0,
+            impact_score INTEGER GENERATED ALWAYS AS (
+                events_completed * 10 + teaching_sessions * 5
+                + CAST(total_hours AS INTEGER) * 2 + reviews_written * 3
+            ) VIRTUAL,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES user(user_id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO user_stats
+            (user_id, events_completed, teaching_sessions, total_hours, reviews_written)
+        SELECT u.user_id,
+               COALESCE(b.events_completed, 0),
+               COALESCE(b.teaching_sessions, 0),
+               COALESCE(b.total_hours, 0),
+               COALESCE(r.reviews_written, 0)
+        FROM user u
+        LEFT JOIN (
+            SELECT eb.user_id, COUNT(*) AS events_completed,
+                   SUM(eb.role_type = 'teacher') AS teaching_sessions,
+                   SUM(COALESCE(
+                       eb.hours_earned,
+                       ROUND(MAX(0, (julianday(e.end_datetime) - julianday(e.start_datetime)) * 24) * 2) / 2,
+                       2)) AS total_hours
+            FROM event_booking eb
+            JOIN event e ON e.event_id = eb.event_id
+            WHERE eb.status = 'completed'
+            GROUP BY eb.user_id
+        ) b ON b.user_id = u.user_id
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS reviews_written FROM review GROUP BY user_id
+        ) r ON r.user_id = u.user_id
+        WHERE b.user_id IS NOT NULL OR r.user_id IS NOT NULL
+    """)
+
+
+@migration(13, "points ledger")
+def _points_ledger(cursor):
+    """Typed, idempotent points_transaction rows with balance snapshots (see points_ledger.py)."""
+    print("🔄 Upgrading points_transaction to a ledger...")
+    add_column(cursor, 'points_transaction', 'kind', "TEXT NOT NULL DEFAULT 'adjustment'")
+    add_column(cursor, 'points_transaction', 'idempotency_key', "TEXT")
+    add_column(cursor, 'points_transaction', 'challenge_id', "INTEGER")
+    add_column(cursor, 'points_transaction', 'balance_after', "INTEGER")
+
+    # Type the existing rows
+    cursor.execute("UPDATE points_transaction SET kind = 'event' WHERE event_id IS NOT NULL")
+    cursor.execute("UPDATE points_transaction SET kind = 'redemption' WHERE redemption_id IS NOT NULL")
+    cursor.execute("""
+        UPDATE points_transaction
+        SET kind = 'challenge',
+            challenge_id = (SELECT MIN(c.challenge_id) FROM challenge c
+                            WHERE points_transaction.remarks = 'Challenge completed: ' || c.title)
+        WHERE remarks LIKE 'Challenge completed: %'
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_points_transaction_key
+        ON points_transaction(idempotency_key)
+    """)
+    # Challenge awards were de-duplicated by title; give them the key the ledger checks now
+    # (OR IGNORE: a repeated legacy award keeps no key)
+    cursor.execute("""
+        UPDATE OR IGNORE points_transaction
+        SET idempotency_key = 'challenge:' || challenge_id || ':user:' || user_id
+        WHERE kind = 'challenge' AND challenge_id IS NOT NULL
+    """)
+
+    # Opening rows so every user's ledger sums to their current balance
+    cursor.execute("""
+        INSERT INTO points_transaction (user_id, points_change, kind, idempotency_key, remarks, balance_after)
+        SELECT u.user_id, u.total_points - COALESCE(l.total, 0), 'opening', 'opening:user:' || u.user_id,
+               'Opening balance', u.total_points
+        FROM user u
+        LEFT JOIN (SELECT user_id, SUM(points_change) AS total
+                   FROM points_transaction GROUP BY user_id) l ON l.user_id = u.user_id
+        WHERE u.total_points != COALESCE(l.total, 0)
+    """)
+
+
+@migration(14, "redemption reservations")
+def _redemption_reservations(cursor):
+    """Points/stock reserved per request and when the reservation lapses (see redemptions.py)."""
+    add_column(cursor, 'reward_redemption', 'points_spent', "INTEGER")
+    add_column(cursor, 'reward_redemption', 'reserved_until', "TEXT")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reward_redemption_reserved
+        ON reward_redemption(reserved_until) WHERE status = 'requested'
+    """)
+
+
+@migration(15, "scheduled jobs")
+def _scheduled_jobs(cursor):
+    """'expired' vouchers, the voucher expiry index and the scheduler's last-run table (see scheduler.py)."""
+    # Rebuild reward_redemption so its CHECK constraint allows 'expired'
+    row = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='reward_redemption'"
+    ).fetchone()
+    if row and "'expired'" not in row[0]:
+        print("🔄 Migrating 'reward_redemption' table to support 'expired' status...")
+        # Indexes and triggers go with the old table; recreate them after the swap
+        dependents = [r[0] for r in cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'reward_redemption' "
+            "AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        ).fetchall()]
+        cursor.execute("""
+            CREATE TABLE reward_redemption_new (
+                redemption_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                reward_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'requested' CHECK (status IN ('requested','approved','rejected','redeemed','cancelled','expired')),
+                voucher_code TEXT UNIQUE,
+                created_at TEXT NOT NULL DEFAULT (datetime('now')),
+                expiry_date TEXT,
+                points_spent INTEGER,
+                reserved_until TEXT,
+                FOREIGN KEY (user_id) REFERENCES user(user_id) ON DELETE CASCADE,
+                FOREIGN KEY (reward_id) REFERENCES reward(reward_id) ON DELETE RESTRICT
+            )
+        """)
+        # Copy by column name - older tables may not have every column
+        shared = [c for c in table_columns(cursor, 'reward_redemption')
+                  if c in table_columns(cursor, 'reward_redemption_new')]
+        column_list = ', '.join(shared)
+        cursor.execute(f"INSERT INTO reward_redemption_new ({column_list}) SELECT {column_list} FROM reward_redemption")
+        # Keep the AUTOINCREMENT high-water mark: redemption ids are part of ledger
+        # idempotency keys, so an id must never be handed out twice
+        seq = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reward_redemption'").fetchone()
+        cursor.execute("DROP TABLE reward_redemption")
+        cursor.execute("ALTER TABLE reward_redemption_new RENAME TO reward_redemption")
+        if seq:
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'reward_redemption'")
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('reward_redemption', ?)", (seq[0],))
+        for sql in dependents:
+            cursor.execute(sql)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reward_redemption_expiry
+        ON reward_redemption(expiry_date) WHERE status = 'approved'
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheduled_job (
+            name TEXT PRIMARY KEY,
+            last_started_at TEXT,
+            last_finished_at TEXT,
+            last_count INTEGER,
+            last_error TEXT
+        )
+    """)
+
+
+@migration(16, "skill rematch queue")
+def _rematch_queue(cursor):
+    """Users whose matches the scheduler should recompute (see skill_matching.py)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rematch_queue (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 1,
+            queued_at TEXT NOT NULL DEFAULT (datetime('now')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            FOREIGN KEY (user_id) REFERENCES user(user_id) ON DELETE CASCADE
+        )
+    """)
+
+
+@migration(17, "redemption stock holds")
+def _redemption_stock_holds(cursor):
+    """Whether each reservation holds a unit of reward stock (see redemptions.py)."""
+    add_column(cursor, 'reward_redemption', 'stock_held', "INTEGER NOT NULL DEFAULT 1")
+    # Requests on unlimited rewards took no unit, so must not give one back
+    cursor.execute("""
+        UPDATE reward_redemption SET stock_held = 0
+        WHERE status = 'requested'
+          AND reward_id IN (SELECT reward_id FROM reward WHERE total_quantity IS NULL)
+    """)
@@ -0,0 +1,269 @@
+"""
+Bulk notifications for SkillSwap.
+
+Broadcasts: announcements meant for everyone (or a whole role) are stored once
+in notification_broadcast with an audience spec and merged into each user's
+notifications at read time. Read/dismiss state is sparse - a row in
+notification_broadcast_read only exists once a user has dismissed it.
+
+Fan-out: notifications that must exist per user (e.g. for an event's booked
+participants) are queued in notification_job. A background worker drains the
+queue with set-based INSERT ... SELECT batches, keyed on user_id so each batch
+holds the write lock only briefly and a restarted worker resumes where the last
+one stopped.
+"""
+import os
+import threading
+import time
+from app.db import get_db_connection
+
+BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', 500))
+POLL_INTERVAL = float(os.getenv('NOTIFY_POLL_INTERVAL', 5))
+STALE_AFTER = int(os.getenv('NOTIFY_STALE_AFTER', 60))  # seconds without a heartbeat before a running job is retaken
+
+# Who receives a fan-out. Each query yields the target user_ids.
+AUDIENCES = {
+    'all': "SELECT user_id FROM user WHERE role IN ('youth', 'senior')",
+    'booked': "SELECT DISTINCT user_id FROM event_booking WHERE event_id = :event_id AND status = 'booked'",
+}
+
+
+# =====================================================
+# JOB QUEUE
+# =====================================================
+def enqueue_fanout(conn, message, audience='all', event_id=None, challenge_id=None, admin_id=None):
+    """
+    Queue a notification for every user in `audience` and return the job id.
+
+    Uses the caller's connection so the job commits together with the status
+    change that triggered it; call wake_fanout_worker() after committing.
+    """
+    if audience not in AUDIENCES:
+        raise ValueError(f"Unknown notification audience '{audience}'")
+    if audience == 'booked' and event_id is None:
+        raise ValueError("The 'booked' audience needs an event_id")
+
+    cursor = conn.execute("""
+        INSERT INTO notification_job (audience, message, event_id, challenge_id, created_by_admin_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, (audience, message, event_id, challenge_id, admin_id))
+    return cursor.lastrowid
+
+
+def get_fanout_job(job_id):
+    """Progress of a fan-out job as a dict, or None if it does not exist."""
+    conn = get_db_connection()
+    row = conn.execute("""
+        SELECT job_id, audience, status, total, processed, error, created_at, finished_at
+        FROM notification_job WHERE job_id = ?
+    """, (job_id,)).fetchone()
+    conn.close()
+    if not row:
+        return None
+
+    job = dict(row)
+    total = job['total'] or 0
+    job['percent'] = 100 if job['status'] == 'done' else (int(job['processed'] * 100 / total) if total else 0)
+    return job
+
+
+def _claim_next_job(conn):
+    """Mark the oldest queued (or abandoned running) job as ours and return its id."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("""
+            SELECT job_id FROM notification_job
+            WHERE status = 'queued'
+               OR (status = 'running' AND heartbeat_at < datetime('now', ?))
+            ORDER BY job_id LIMIT 1
+        """, (f'-{STALE_AFTER} seconds',)).fetchone()
+        if row:
+            conn.execute("""
+                UPDATE notification_job
+                SET status = 'running', started_at = COALESCE(started_at, datetime('now')),
+                    heartbeat_at = datetime('now')
+                WHERE job_id = ?
+            """, (row['job_id'],))
+        conn.commit()
+        return row['job_id'] if row else None
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def run_fanout_job(job_id, batch_size=None):
+    """Insert the job's notifications batch by batch. Returns the number of rows written."""
+    batch_size = batch_size or BATCH_SIZE
+    conn = get_db_connection()
+    written = 0
+    try:
+        job = conn.execute("SELECT * FROM notification_job WHERE job_id = ?", (job_id,)).fetchone()
+        if not job or job['status'] in ('done', 'failed'):
+            return 0
+
+        audience = AUDIENCES[job['audience']]
+        params = {
+            'message': job['message'],
+            'event_id': job['event_id'],
+            'challenge_id': job['challenge_id'],
+            'created_at': job['created_at'],
+            'after': job['last_user_id'],
+            'batch': batch_size,
+        }
+
+        if job['total'] is None:
+            total = conn.execute(f"SELECT COUNT(*) FROM ({audience})", params).fetchone()[0]
+            conn.execute("UPDATE notification_job SET total = ? WHERE job_id = ?", (total, job_id))
+            conn.commit()
+
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            upper = conn.execute(f"""
+                SELECT MAX(user_id) FROM (
+                    SELECT user_id FROM ({audience}) WHERE user_id > :after ORDER BY user_id LIMIT :batch
+                )
+            """, params).fetchone()[0]
+
+            if upper is None:
+                conn.execute("""
+                    UPDATE notification_job SET status = 'done', finished_at = datetime('now')
+                    WHERE job_id = ?
+                """, (job_id,))
+                conn.commit()
+                break
+
+            params['upper'] = upper
+            cursor = conn.execute(f"""
+                INSERT INTO notification (user_id, message, event_id, challenge_id, created_at)
+                SELECT user_id, :message, :event_id, :challenge_id, :created_at
+                FROM ({audience}) WHERE user_id > :after AND user_id <= :upper
+            """, params)
+            conn.execute("""
+                UPDATE notification_job
+                SET processed = processed + ?, last_user_id = ?, heartbeat_at = datetime('now')
+                WHERE job_id = ?
+            """, (cursor.rowcount, upper, job_id))
+            conn.commit()
+
+            written += cursor.rowcount
+            params['after'] = upper
+
+        # Imported here because dashboard_data imports this module
+        from app.dashboard_data import invalidate_all_dashboards
+        invalidate_all_dashboards()
+        print(f"✅ Notification job {job_id}: {written} notifications sent")
+        return written
+    except Exception as e:
+        conn.rollback()
+        conn.execute("""
+            UPDATE notification_job SET status = 'failed', error = ?, finished_at = datetime('now')
+            WHERE job_id = ?
+        """, (str(e), job_id))
+        conn.commit()
+        print(f"⚠️ Notification job {job_id} failed: {e}")
+        return written
+    finally:
+        conn.close()
+
+
+# =====================================================
+# BACKGROUND WORKER
+# =====================================================
+_worker = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def _worker_loop():
+    while True:
+        try:
+            conn = get_db_connection()
+            try:
+                job_id = _claim_next_job(conn)
+            finally:
+                conn.close()
+
+            if job_id is None:
+                _wakeup.wait(POLL_INTERVAL)
+                _wakeup.clear()
+                continue
+            run_fanout_job(job_id)
+        except Exception as e:
+            print(f"⚠️ Notification worker error: {e}")
+            time.sleep(POLL_INTERVAL)
+
+
+def start_fanout_worker():
+    """Start this process's fan-out worker thread (idempotent)."""
+    global _worker, _worker_pid
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive() and _worker_pid == os.getpid():
+            return
+        _worker = threading.Thread(target=_worker_loop, name='notification-fanout', daemon=True)
+        _worker_pid = os.getpid()
+        _worker.start()
+
+
+def wake_fanout_worker():
+    """Pick up newly committed jobs now instead of at the next poll."""
+    _wakeup.set()
+
+
+# =====================================================
+# BROADCASTS
+# =====================================================
+BROADCAST_AUDIENCES = ('all', 'youth', 'senior', 'booked')
+
+
+def create_broadcast(conn, message, audience='all', event_id=None, challenge_id=None, admin_id=None):
+    """Store one announcement for a whole audience and return its id. Caller commits."""
+    if audience not in BROADCAST_AUDIENCES:
+        raise ValueError(f"Unknown broadcast audience '{audience}'")
+    if audience == 'booked' and event_id is None:
+        raise ValueError("The 'booked' audience needs an event_id")
+
+    cursor = conn.execute("""
+        INSERT INTO notification_broadcast (audience, message, event_id, challenge_id, created_by_admin_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, (audience, message, event_id, challenge_id, admin_id))
+    return cursor.lastrowid
+
+
+def get_unread_notifications(conn, user_id, role, joined_at=None):
+    """
+    The user's unread personal notifications and broadcasts, newest first.
+
+    Each row has either notification_id or broadcast_id set. Broadcasts sent
+    before the user joined are not shown.
+    """
+    rows = conn.execute("""
+        SELECT notification_id, NULL AS broadcast_id, message, created_at, event_id, challenge_id
+        FROM notification
+        WHERE user_id = :user_id AND is_read = 0
+
+        UNION ALL
+
+        SELECT NULL, b.broadcast_id, b.message, b.created_at, b.event_id, b.challenge_id
+        FROM notification_broadcast b
+        WHERE b.created_at >= :joined_at
+          AND (b.audience IN ('all', :role)
+               OR (b.audience = 'booked' AND EXISTS (
+                   SELECT 1 FROM event_booking eb
+                   WHERE eb.event_id = b.event_id AND eb.user_id = :user_id
+                     AND eb.status IN ('booked', 'completed'))))
+          AND NOT EXISTS (
+              SELECT 1 FROM notification_broadcast_read r
+              WHERE r.broadcast_id = b.broadcast_id AND r.user_id = :user_id)
+
+        ORDER BY created_at DESC
+    """, {'user_id': user_id, 'role': role, 'joined_at': joined_at or ''}).fetchall()
+    return [dict(row) for row in rows]
+
+
+def mark_broadcast_read(conn, broadcast_id, user_id):
+    """Record that the user dismissed/read a broadcast. Caller commits."""
+    conn.execute("""
+        INSERT OR IGNORE INTO notification_broadcast_read (broadcast_id, user_id)
+        VALUES (?, ?)
+    """, (broadcast_id, user_id))
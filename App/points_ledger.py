@@ -0,0 +1,98 @@
+"""
+Append-only points ledger.
+
+Every change to a user's points goes through record_points(): it moves the
+cached balance (user.total_points) and appends a typed points_transaction row
+carrying the balance after the change, in the caller's write transaction.
+Rows are never updated or deleted, so SUM(points_change) per user always
+equals total_points (migration 13 wrote an 'opening' row for balances that
+predate the ledger).
+
+An idempotency key names the thing being paid for (a booking, a challenge,
+a redemption). The key has a unique index, so recording the same award twice
+- a double-clicked approve button, two admins at once - writes nothing the
+second time. The same index replaces the old remarks LIKE scan.
+"""
+
+KINDS = ('opening', 'event', 'challenge', 'redemption', 'refund', 'adjustment')
+
+
+def event_key(event_id, user_id):
+    return f"event:{event_id}:user:{user_id}"
+
+
+def challenge_key(challenge_id, user_id):
+    return f"challenge:{challenge_id}:user:{user_id}"
+
+
+def redemption_key(redemption_id):
+    return f"redemption:{redemption_id}"
+
+
+def record_points(conn, user_id, points, kind, key=None, remarks=None,
+                  event_id=None, challenge_id=None, redemption_id=None, allow_negative=False):
+    """
+    Add `points` (negative to deduct) to a user's balance and log it. Runs
+    inside the caller's transaction (caller commits).
+
+    Returns (result, balance): ('ok', new balance), ('duplicate', None) if `key`
+    was already recorded (whatever the balance is now), or ('insufficient', None)
+    if the user does not exist or a deduction would take them below zero.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown points transaction kind '{kind}'")
+
+    # Log first: the key is checked before the balance moves, so a retry of an award
+    # that already went through is 'duplicate' even if the balance has dropped since.
+    # The INSERT also takes the write lock, so the balance it reads cannot change under us.
+    inserted = conn.execute("""
+        INSERT INTO points_transaction
+            (user_id, points_change, kind, idempotency_key, remarks,
+             event_id, challenge_id, redemption_id, balance_after)
+        SELECT :user_id, :points, :kind, :key, :remarks,
+               :event_id, :challenge_id, :redemption_id, total_points + :points
+        FROM user
+        WHERE user_id = :user_id AND (:allow_negative OR total_points + :points >= 0)
+        ON CONFLICT(idempotency_key) DO NOTHING
+    """, {'user_id': user_id, 'points': points, 'kind': kind, 'key': key, 'remarks': remarks,
+          'event_id': event_id, 'challenge_id': challenge_id, 'redemption_id': redemption_id,
+          'allow_negative': int(allow_negative)}).rowcount
+    if not inserted:
+        if key is not None and is_recorded(conn, key):
+            return 'duplicate', None
+        return 'insufficient', None
+
+    conn.execute("UPDATE user SET total_points = total_points + ? WHERE user_id = ?", (points, user_id))
+    balance = conn.execute("SELECT total_points FROM user WHERE user_id = ?", (user_id,)).fetchone()[0]
+    return 'ok', balance
+
+
+def is_recorded(conn, key):
+    """True if a transaction with this idempotency key exists."""
+    return conn.execute(
+        "SELECT 1 FROM points_transaction WHERE idempotency_key = ?", (key,)
+    ).fetchone() is not None
+
+
+def get_points_history(conn, user_id, limit=50):
+    """The user's latest transactions, newest first, each with the balance after it."""
+    rows = conn.execute("""
+        SELECT transaction_id, points_change, kind, remarks, balance_after, created_at,
+               event_id, challenge_id, redemption_id
+        FROM points_transaction
+        WHERE user_id = ?
+        ORDER BY transaction_id DESC
+        LIMIT ?
+    """, (user_id, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def find_balance_mismatches(conn):
+    """(user_id, total_points, ledger_sum) for every user whose balance disagrees with the ledger."""
+    return [tuple(row) for row in conn.execute("""
+        SELECT u.user_id, u.total_points, COALESCE(l.total, 0)
+        FROM user u
+        LEFT JOIN (SELECT user_id, SUM(points_change) AS total
+                   FROM points_transaction GROUP BY user_id) l ON l.user_id = u.user_id
+        WHERE u.total_points != COALESCE(l.total, 0)
+    """)]
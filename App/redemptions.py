@@ -0,0 +1,250 @@
+"""
+Reward redemption engine.
+
+A redemption reserves its stock and points the moment the user asks for it:
+request_redemption() takes one unit of stock with a conditional UPDATE
+(total_quantity > 0), inserts the request and deducts the points through the
+ledger (refused if it would overdraw the user), all in one BEGIN IMMEDIATE
+transaction. Two users racing for the last voucher, or one user redeeming
+twice with only enough points for one, can never both succeed.
+
+reward.total_quantity is the stock still available (NULL = unlimited), so
+the rewards page only has to hide rewards at 0. Each request records whether
+it holds a unit (stock_held), so only those give one back. An admin edit
+applies the difference between the form and the stock the page was loaded
+with (set_reward_stock()), never an absolute value that would wipe out
+reservations made meanwhile.
+
+Approving a reserved request just flips its status. Rejecting it, or the
+reservation expiring (expire_reservations(), swept by the scheduler after
+RESERVATION_DAYS), puts the stock back and refunds the points. Approved
+vouchers past expiry_date are moved to 'expired' by the scheduler too.
+Every status change is a conditional UPDATE from 'requested', so two admins
+deciding the same request at once get one winner and the other a no-op.
+
+Requests made before reservations existed have no points_spent; they are
+charged (stock and points, same conditional updates) when approved.
+"""
+import os
+from app.points_ledger import record_points, redemption_key
+
+RESERVATION_DAYS = int(os.getenv('REDEMPTION_RESERVATION_DAYS', 14))
+VOUCHER_DAYS = 30          # approved vouchers expire after this many days
+EXPIRY_BATCH = 200
+
+
+def refund_key(redemption_id):
+    return f"refund:redemption:{redemption_id}"
+
+
+def _take_stock(conn, reward_id):
+    """Reserve one unit of an active reward. False if it is inactive or out of stock."""
+    return conn.execute("""
+        UPDATE reward SET total_quantity = total_quantity - 1
+        WHERE reward_id = ? AND is_active = 1 AND (total_quantity IS NULL OR total_quantity > 0)
+    """, (reward_id,)).rowcount == 1
+
+
+def _return_stock(conn, reward_id):
+    conn.execute("UPDATE reward SET total_quantity = total_quantity + 1 WHERE reward_id = ?", (reward_id,))
+
+
+def _is_limited(conn, reward_id):
+    return conn.execute(
+        "SELECT total_quantity IS NOT NULL FROM reward WHERE reward_id = ?", (reward_id,)
+    ).fetchone()[0] == 1
+
+
+def _get(conn, redemption_id):
+    return conn.execute("""
+        SELECT rr.redemption_id, rr.user_id, rr.reward_id, rr.status, rr.points_spent, rr.stock_held,
+               r.name, r.points_required
+        FROM reward_redemption rr
+        JOIN reward r ON r.reward_id = rr.reward_id
+        WHERE rr.redemption_id = ?
+    """, (redemption_id,)).fetchone()
+
+
+# =====================================================
+# STOCK
+# =====================================================
+def set_reward_stock(conn, reward_id, loaded, wanted):
+    """
+    Apply an admin's stock edit: `loaded` is the stock the edit page showed,
+    `wanted` what the admin typed (None = unlimited for both). A number-to-number
+    edit moves the stock by the difference, so reservations made since the page
+    loaded are kept (never below 0). Switching to or from unlimited only applies
+    if the reward is still the way the page showed it.
+    Returns False if it was changed meanwhile. Caller holds the write transaction.
+    """
+    if loaded is None and wanted is None:
+        return True
+    if loaded is not None and wanted is not None:
+        return conn.execute("""
+            UPDATE reward SET total_quantity = MAX(0, total_quantity + ?)
+            WHERE reward_id = ? AND total_quantity IS NOT NULL
+        """, (wanted - loaded, reward_id)).rowcount == 1
+    if wanted is None:
+        if not conn.execute(
+            "UPDATE reward SET total_quantity = NULL WHERE reward_id = ? AND total_quantity IS NOT NULL",
+            (reward_id,)
+        ).rowcount:
+            return False
+        # Their units are no longer counted anywhere, so they must not come back
+        conn.execute(
+            "UPDATE reward_redemption SET stock_held = 0 WHERE reward_id = ? AND status = 'requested'",
+            (reward_id,)
+        )
+        return True
+    return conn.execute(
+        "UPDATE reward SET total_quantity = ? WHERE reward_id = ? AND total_quantity IS NULL",
+        (max(0, wanted), reward_id)
+    ).rowcount == 1
+
+
+# =====================================================
+# REQUEST
+# =====================================================
+def request_redemption(conn, user_id, reward_id):
+    """
+    Reserve a reward for the user. Returns (result, detail):
+    ('requested', (redemption_id, new balance)), ('not_found', None),
+    ('out_of_stock', None) or ('insufficient', None). Commits.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        reward = conn.execute(
+            "SELECT name, points_required FROM reward WHERE reward_id = ?", (reward_id,)
+        ).fetchone()
+        if not reward:
+            conn.rollback()
+            return 'not_found', None
+        if not _take_stock(conn, reward_id):
+            conn.rollback()
+            return 'out_of_stock', None
+
+        redemption_id = conn.execute(f"""
+            INSERT INTO reward_redemption (user_id, reward_id, status, points_spent, reserved_until, stock_held)
+            VALUES (?, ?, 'requested', ?, datetime('now', '+{RESERVATION_DAYS} days'), ?)
+        """, (user_id, reward_id, reward['points_required'], int(_is_limited(conn, reward_id)))).lastrowid
+        result, balance = record_points(conn, user_id, -reward['points_required'], 'redemption',
+                                        key=redemption_key(redemption_id),
+                                        remarks=f"Reserved: {reward['name']}", redemption_id=redemption_id)
+        if result != 'ok':
+            conn.rollback()
+            return 'insufficient', None
+
+        conn.commit()
+        return 'requested', (redemption_id, balance)
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# =====================================================
+# DECISIONS
+# =====================================================
+def approve_redemption(conn, redemption_id):
+    """
+    Approve a pending request. Returns (result, redemption row): 'approved',
+    'not_found', 'already_decided', or for a pre-reservation request
+    'out_of_stock' / 'insufficient'. Commits.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        redemption = _get(conn, redemption_id)
+        if not redemption:
+            conn.rollback()
+            return 'not_found', None
+        if redemption['status'] != 'requested':
+            conn.rollback()
+            return 'already_decided', redemption
+
+        if redemption['points_spent'] is None:
+            # Requested before reservations: charge it now
+            if not _take_stock(conn, redemption['reward_id']):
+                conn.rollback()
+                return 'out_of_stock', redemption
+            result, _ = record_points(conn, redemption['user_id'], -redemption['points_required'], 'redemption',
+                                      key=redemption_key(redemption_id),
+                                      remarks=f"Redeemed: {redemption['name']}", redemption_id=redemption_id)
+            if result != 'ok':
+                conn.rollback()
+                return 'insufficient', redemption
+            conn.execute("UPDATE reward_redemption SET points_spent = ? WHERE redemption_id = ?",
+                         (redemption['points_required'], redemption_id))
+
+        conn.execute(f"""
+            UPDATE reward_redemption
+            SET status = 'approved', expiry_date = date('now', '+{VOUCHER_DAYS} days')
+            WHERE redemption_id = ? AND status = 'requested'
+        """, (redemption_id,))
+        conn.commit()
+        return 'approved', redemption
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _release(conn, redemption, status):
+    """Move a 'requested' redemption to `status`, returning its stock and points. Caller commits."""
+    moved = conn.execute(
+        "UPDATE reward_redemption SET status = ? WHERE redemption_id = ? AND status = 'requested'",
+        (status, redemption['redemption_id'])
+    ).rowcount
+    if not moved:
+        return False
+    if redemption['points_spent'] is not None:
+        if redemption['stock_held']:
+            _return_stock(conn, redemption['reward_id'])
+        record_points(conn, redemption['user_id'], redemption['points_spent'], 'refund',
+                      key=refund_key(redemption['redemption_id']),
+                      remarks=f"Refund ({status}): {redemption['name']}",
+                      redemption_id=redemption['redemption_id'])
+    return True
+
+
+def reject_redemption(conn, redemption_id):
+    """Reject a pending request and release its reservation. Returns (result, redemption row). Commits."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        redemption = _get(conn, redemption_id)
+        if not redemption:
+            conn.rollback()
+            return 'not_found', None
+        if not _release(conn, redemption, 'rejected'):
+            conn.rollback()
+            return 'already_decided', redemption
+        conn.commit()
+        return 'rejected', redemption
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def expire_reservations(conn, batch=EXPIRY_BATCH):
+    """
+    Cancel requests nobody decided within RESERVATION_DAYS, giving back their
+    stock and points, EXPIRY_BATCH per transaction. Returns the number cancelled.
+    """
+    expired = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("""
+                SELECT rr.redemption_id, rr.user_id, rr.reward_id, rr.status, rr.points_spent, rr.stock_held,
+                       r.name, r.points_required
+                FROM reward_redemption rr
+                JOIN reward r ON r.reward_id = rr.reward_id
+                WHERE rr.status = 'requested' AND rr.reserved_until < datetime('now')
+                ORDER BY rr.reserved_until
+                LIMIT ?
+            """, (batch,)).fetchall()
+            for redemption in rows:
+                expired += _release(conn, redemption, 'cancelled')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if len(rows) < batch:
+            return expired
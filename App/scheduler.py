@@ -0,0 +1,241 @@
+"""
+Scheduled background jobs.
+
+State that changes with the clock is moved by these jobs in bulk instead of
+being re-derived from dates on every page view:
+  - published events whose end time has passed become 'ended',
+  - active/published challenges past their end_date become 'ended',
+  - approved vouchers past their expiry_date become 'expired',
+  - undecided redemption requests past their reservation are cancelled,
+  - users queued after a skills change get their matches recomputed,
+  - the user_stats rollup is rebuilt once a night.
+
+run_scheduler() is the loop Main.py starts in its own process. Each job
+claims its slot with a conditional UPDATE on scheduled_job (last_started_at
+unchanged and the job due), so a second scheduler - or a restart - never runs
+the same job twice in one period. Transitions are conditional UPDATEs on the
+old status, JOB_BATCH rows per BEGIN IMMEDIATE transaction, so they are safe
+to race with the admin buttons that do the same thing by hand.
+"""
+import os
+import time
+from datetime import datetime
+from app.db import get_db_connection
+from app.notifications import create_broadcast
+from app.event_capacity import expire_waitlist
+from app.events_catalogue import invalidate_catalogue
+from app.dashboard_data import invalidate_all_dashboards
+from app.redemptions import expire_reservations
+from app.skill_matching import run_queued_rematches
+from app.user_stats import DEFAULT_HOURS, rebuild_user_stats
+
+SCHEDULER_TICK = int(os.getenv('SCHEDULER_TICK', 30))                  # seconds between due checks
+RECONCILE_HOUR = int(os.getenv('SCHEDULER_RECONCILE_HOUR', 3))         # local hour for nightly jobs
+JOB_BATCH = 200
+
+
+def _now():
+    """
+    Local wall-clock time, the format event and challenge dates are stored in.
+    Every scheduled_job timestamp and due check uses this clock too.
+    """
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _in_batches(conn, select_sql, params, apply, batch=JOB_BATCH):
+    """
+    Run `apply(conn, rows)` on up to `batch` rows of `select_sql` per write
+    transaction until a batch comes back short. Returns the total `apply` reported.
+    """
+    total = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(select_sql, dict(params, batch=batch)).fetchall()
+            if rows:
+                total += apply(conn, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if len(rows) < batch:
+            return total
+
+
+# =====================================================
+# JOBS - each takes (conn, now) and returns how many rows it moved
+# =====================================================
+def end_past_events(conn, now):
+    """Published/approved events that have finished -> 'ended', closing their waitlists."""
+    def apply(conn, rows):
+        ended = 0
+        for event in rows:
+            moved = conn.execute(
+                "UPDATE event SET status = 'ended' WHERE event_id = ? AND status IN ('approved', 'published')",
+                (event['event_id'],)
+            ).rowcount
+            if not moved:
+                continue
+            expire_waitlist(conn, event['event_id'])
+            create_broadcast(conn, f"The event '{event['title']}' has ended. We hope you enjoyed it!",
+                             audience='booked', event_id=event['event_id'])
+            ended += 1
+        return ended
+
+    # idx_event_status_start narrows to events that have started; events without an
+    # end time count as DEFAULT_HOURS long
+    ended = _in_batches(conn, f"""
+        SELECT event_id, title FROM event
+        WHERE status IN ('approved', 'published')
+          AND start_datetime < :now
+          AND COALESCE(datetime(end_datetime), datetime(start_datetime, '+{DEFAULT_HOURS} hours')) < :now
+        ORDER BY start_datetime
+        LIMIT :batch
+    """, {'now': now}, apply)
+    if ended:
+        invalidate_catalogue()
+        invalidate_all_dashboards()
+    return ended
+
+
+def end_past_challenges(conn, now):
+    """Active/published challenges past their end_date -> 'ended' (same as the admin End button)."""
+    def apply(conn, rows):
+        ended = 0
+        for challenge in rows:
+            moved = conn.execute("""
+                UPDATE challenge SET status = 'ended', ended_at = datetime('now')
+                WHERE challenge_id = ? AND status IN ('active', 'published')
+            """, (challenge['challenge_id'],)).rowcount
+            if not moved:
+                continue
+            create_broadcast(conn, f"The challenge '{challenge['title']}' has ended.",
+                             audience='all', challenge_id=challenge['challenge_id'])
+            ended += 1
+        return ended
+
+    # end_date is 'YYYY-MM-DD HH:MM' (or a bare date, ending at midnight), so a string
+    # comparison against now is exact and can use idx_challenge_status_end
+    ended = _in_batches(conn, """
+        SELECT challenge_id, title FROM challenge
+        WHERE status IN ('active', 'published') AND end_date < :now
+        ORDER BY end_date
+        LIMIT :batch
+    """, {'now': now}, apply)
+    if ended:
+        invalidate_catalogue()
+        invalidate_all_dashboards()
+    return ended
+
+
+def expire_vouchers(conn, now):
+    """Approved vouchers past their expiry_date -> 'expired'."""
+    def apply(conn, rows):
+        return conn.executemany(
+            "UPDATE reward_redemption SET status = 'expired' WHERE redemption_id = ? AND status = 'approved'",
+            [(row['redemption_id'],) for row in rows]
+        ).rowcount
+
+    # expiry_date is set with date('now', ...) on approval, so compare in the same (UTC) clock
+    return _in_batches(conn, """
+        SELECT redemption_id FROM reward_redemption
+        WHERE status = 'approved' AND expiry_date < date('now')
+        LIMIT :batch
+    """, {}, apply)
+
+
+def cancel_lapsed_reservations(conn, now):
+    """Undecided redemption requests past reserved_until -> 'cancelled', stock and points returned."""
+    return expire_reservations(conn, JOB_BATCH)
+
+
+def rematch_skills(conn, now):
+    """Recompute matches for users whose skills changed (rematch_queue)."""
+    return run_queued_rematches(conn)
+
+
+def reconcile_user_stats(conn, now):
+    """Rebuild user_stats from source; returns how many rows had drifted."""
+    _, corrected = rebuild_user_stats(conn)
+    if corrected:
+        invalidate_all_dashboards()
+    return corrected
+
+
+# (name, function, every N seconds, or None to run once a day at RECONCILE_HOUR)
+JOBS = [
+    ('end_past_events', end_past_events, 60),
+    ('end_past_challenges', end_past_challenges, 60),
+    ('expire_vouchers', expire_vouchers, 3600),
+    ('cancel_lapsed_reservations', cancel_lapsed_reservations, 600),
+    ('rematch_skills', rematch_skills, 30),
+    ('reconcile_user_stats', reconcile_user_stats, None),
+]
+
+
+# =====================================================
+# RUNNER
+# =====================================================
+def _claim(conn, name, every, now):
+    """Mark the job started if it is due. False if it is not due or another scheduler got it."""
+    conn.execute("INSERT OR IGNORE INTO scheduled_job (name) VALUES (?)", (name,))
+    if every is None:
+        due = "(last_started_at IS NULL OR date(last_started_at) < date(:now)) AND CAST(strftime('%H', :now) AS INTEGER) >= :hour"
+    else:
+        due = "(last_started_at IS NULL OR last_started_at <= datetime(:now, :every))"
+    claimed = conn.execute(f"UPDATE scheduled_job SET last_started_at = :now WHERE name = :name AND {due}", {
+        'now': now, 'name': name, 'hour': RECONCILE_HOUR, 'every': f"-{every or 0} seconds"
+    }).rowcount == 1
+    conn.commit()
+    return claimed
+
+
+def run_job(name, fn, now=None):
+    """Run one job now (no due check) and record the outcome. Returns its count, or None if it failed."""
+    now = now or _now()
+    conn = get_db_connection()
+    try:
+        try:
+            count, error = fn(conn, now), None
+        except Exception as e:
+            count, error = None, str(e)
+            print(f"⚠️ Scheduled job {name} failed: {e}")
+        conn.execute("""
+            UPDATE scheduled_job SET last_finished_at = ?, last_count = ?, last_error = ?
+            WHERE name = ?
+        """, (_now(), count, error, name))
+        conn.commit()
+        if count:
+            print(f"✅ {name}: {count}")
+        return count
+    finally:
+        conn.close()
+
+
+def run_due_jobs():
+    """Run every job whose period has come round. Returns the names that ran."""
+    ran = []
+    for name, fn, every in JOBS:
+        now = _now()
+        conn = get_db_connection()
+        try:
+            claimed = _claim(conn, name, every, now)
+        finally:
+            conn.close()
+        if claimed:
+            run_job(name, fn, now)
+            ran.append(name)
+    return ran
+
+
+def run_scheduler():
+    """Check for due jobs every SCHEDULER_TICK seconds, forever."""
+    from app.db import migrate_database
+    migrate_database()
+    print(f"🔄 Scheduler started ({len(JOBS)} jobs, checking every {SCHEDULER_TICK}s)")
+    while True:
+        try:
+            run_due_jobs()
+        except Exception as e:
+            print(f"⚠️ Scheduler error: {e}")
+        time.sleep(SCHEDULER_TICK)
@@ -0,0 +1,164 @@
+"""
+Full-text search over events, challenges and FAQs.
+
+event_fts, challenge_fts and faq_fts (migration 11) are FTS5 indexes kept in
+sync with their tables by triggers, so nothing here has to maintain them.
+Every word the user types is matched as a prefix ("pyth" finds "Python")
+and results are ranked by bm25 with the title weighted above the body text.
+
+If the SQLite build has no FTS5 the indexes do not exist and the same
+functions fall back to a LIKE scan.
+"""
+import re
+from app.db import has_table
+
+SEARCH_LIMIT = 20
+MAX_TERMS = 8
+
+# bm25 column weights, in the order the columns were indexed
+EVENT_WEIGHTS = (10.0, 1.0, 4.0)      # title, description, location
+CHALLENGE_WEIGHTS = (10.0, 1.0)       # title, description
+FAQ_WEIGHTS = (10.0, 2.0, 1.0)        # question, answer, category
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def match_query(text):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must appear,
+    each as a prefix. Quoting the words keeps FTS5 syntax (AND, NEAR, *, ")
+    in user input from being interpreted. Returns None for empty input.
+    """
+    words = _WORD.findall(text or '')[:MAX_TERMS]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _bm25(weights):
+    """FTS5 rank function with per-column weights (bound as the `rank MATCH ?` parameter)."""
+    return f"bm25({', '.join(str(w) for w in weights)})"
+
+
+def _like_terms(text):
+    return [f"%{word}%" for word in _WORD.findall(text or '')[:MAX_TERMS]]
+
+
+def _status_filter(alias, statuses, params):
+    if not statuses:
+        return ''
+    params.extend(statuses)
+    return f" AND {alias}.status IN ({','.join('?' * len(statuses))})"
+
+
+# =====================================================
+# EVENTS
+# =====================================================
+def event_match_ids(text):
+    """
+    SQL fragment + params selecting the event_ids that match `text`, for use
+    inside a larger query (e.g. `e.event_id IN (...)`). None for empty input.
+    """
+    query = match_query(text)
+    if query is None:
+        return None
+    if has_table('event_fts'):
+        return "SELECT rowid FROM event_fts WHERE event_fts MATCH ?", [query]
+    terms = _like_terms(text)
+    clause = ' AND '.join("(title LIKE ? OR description LIKE ? OR location LIKE ?)" for _ in terms)
+    return f"SELECT event_id FROM event WHERE {clause}", [t for term in terms for t in (term, term, term)]
+
+
+def search_events(conn, text, statuses=('published',), limit=SEARCH_LIMIT):
+    """Events matching `text`, best match first."""
+    query = match_query(text)
+    if query is None:
+        return []
+    params = []
+    if has_table('event_fts'):
+        params = [query, _bm25(EVENT_WEIGHTS)]
+        sql = """
+            SELECT e.event_id, e.title, e.location, e.category, e.status, e.start_datetime,
+                   substr(e.description, 1, 160) AS snippet, m.rank
+            FROM (SELECT rowid, rank FROM event_fts WHERE event_fts MATCH ? AND rank MATCH ?) m
+            JOIN event e ON e.event_id = m.rowid
+            WHERE 1 = 1"""
+        order = "m.rank"
+    else:
+        sql = """
+            SELECT e.event_id, e.title, e.location, e.category, e.status, e.start_datetime,
+                   substr(e.description, 1, 160) AS snippet, 0 AS rank
+            FROM event e WHERE 1 = 1"""
+        for term in _like_terms(text):
+            sql += " AND (e.title LIKE ? OR e.description LIKE ? OR e.location LIKE ?)"
+            params.extend([term, term, term])
+        order = "e.start_datetime DESC"
+    sql += _status_filter('e', statuses, params)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+
+# =====================================================
+# CHALLENGES
+# =====================================================
+def search_challenges(conn, text, statuses=('published',), limit=SEARCH_LIMIT):
+    """Challenges matching `text`, best match first."""
+    query = match_query(text)
+    if query is None:
+        return []
+    params = []
+    if has_table('challenge_fts'):
+        params = [query, _bm25(CHALLENGE_WEIGHTS)]
+        sql = """
+            SELECT c.challenge_id, c.title, c.status, c.start_date, c.end_date, c.bonus_points,
+                   substr(c.description, 1, 160) AS snippet, m.rank
+            FROM (SELECT rowid, rank FROM challenge_fts WHERE challenge_fts MATCH ? AND rank MATCH ?) m
+            JOIN challenge c ON c.challenge_id = m.rowid
+            WHERE 1 = 1"""
+        order = "m.rank"
+    else:
+        sql = """
+            SELECT c.challenge_id, c.title, c.status, c.start_date, c.end_date, c.bonus_points,
+                   substr(c.description, 1, 160) AS snippet, 0 AS rank
+            FROM challenge c WHERE 1 = 1"""
+        for term in _like_terms(text):
+            sql += " AND (c.title LIKE ? OR c.description LIKE ?)"
+            params.extend([term, term])
+        order = "c.end_date"
+    sql += _status_filter('c', statuses, params)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+
+# =====================================================
+# FAQ
+# =====================================================
+def search_faqs(conn, text, active_only=True, limit=SEARCH_LIMIT):
+    """FAQ articles matching `text`, best match first."""
+    query = match_query(text)
+    if query is None:
+        return []
+    params = []
+    if has_table('faq_fts'):
+        params = [query, _bm25(FAQ_WEIGHTS)]
+        sql = """
+            SELECT f.faq_id, f.question, f.answer, f.category, f.is_active, m.rank
+            FROM (SELECT rowid, rank FROM faq_fts WHERE faq_fts MATCH ? AND rank MATCH ?) m
+            JOIN faq_article f ON f.faq_id = m.rowid
+            WHERE 1 = 1"""
+        order = "m.rank"
+    else:
+        sql = """
+            SELECT f.faq_id, f.question, f.answer, f.category, f.is_active, 0 AS rank
+            FROM faq_article f WHERE 1 = 1"""
+        for term in _like_terms(text):
+            sql += " AND (f.question LIKE ? OR f.answer LIKE ? OR f.category LIKE ?)"
+            params.extend([term, term, term])
+        order = "f.faq_id"
+    if active_only:
+        sql += " AND f.is_active = 1"
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
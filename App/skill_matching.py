@@ -0,0 +1,332 @@
+"""
+Youth-senior skill matching.
+
+A match row (youth_id, senior_id, skill_id) says one of the two can teach the
+other that skill. For every skill a user wants to learn they get up to
+MATCHES_PER_SKILL teachers from the other generation, preferring teachers who
+  - cover more of the learner's interests,
+  - want to learn something the learner offers in return (a two-way swap),
+  - are in the same GRC,
+  - have fewer learners already (spreads the load in a full rematch).
+
+Candidates come from inverted indexes (skill_id, role) -> users, and at most
+CANDIDATE_POOL teachers are scored per (learner, skill), so a full rematch is
+linear in the number of user skills instead of comparing every youth with
+every senior. rematch_user() redoes one user after their skills change and
+only loads the index entries for that user's skills. Saving skills only
+queues the user (queue_rematch()); the scheduler drains rematch_queue with
+run_queued_rematches(), so a slow or failing rematch never holds up the
+request and a failure is retried and recorded instead of lost.
+
+Only 'active' rows are managed here: 'closed' and 'blocked' rows are kept,
+and a blocked pair is never matched again.
+"""
+import heapq
+
+MATCHES_PER_SKILL = 3      # teachers suggested per skill a user wants to learn
+TEACH_LIMIT = 10           # learners a user is added to when they start offering a skill
+CANDIDATE_POOL = 24        # teachers scored per (learner, skill)
+COVERAGE_WEIGHT = 1.0      # per learner interest the teacher offers
+RECIPROCAL_WEIGHT = 2.0    # per learner skill the teacher wants to learn
+GRC_BONUS = 1.0
+LOAD_PENALTY = 0.25        # per learner the teacher already got in this rematch
+
+REMATCH_BATCH = 50         # queued users rematched per scheduler run
+REMATCH_MAX_ATTEMPTS = 5   # failed rematches are retried this many times, then left queued
+
+OPPOSITE_ROLE = {'youth': 'senior', 'senior': 'youth'}
+
+
+# =====================================================
+# INVERTED INDEX
+# =====================================================
+def _load_rows(conn, skill_ids=None):
+    """(kind, user_id, role, grc_id, skill_id) for every youth/senior skill link."""
+    skill_filter = ''
+    params = []
+    if skill_ids is not None:
+        placeholders = ','.join('?' * len(skill_ids))
+        skill_filter = f"AND l.skill_id IN ({placeholders})"
+        params = list(skill_ids) * 2
+    return conn.execute(f"""
+        SELECT 'offered', l.user_id, u.role, u.grc_id, l.skill_id
+        FROM user_skill_offered l JOIN user u ON u.user_id = l.user_id
+        WHERE u.role IN ('youth', 'senior') {skill_filter}
+        UNION ALL
+        SELECT 'wanted', l.user_id, u.role, u.grc_id, l.skill_id
+        FROM user_skill_interest l JOIN user u ON u.user_id = l.user_id
+        WHERE u.role IN ('youth', 'senior') {skill_filter}
+    """, params).fetchall()
+
+
+def build_skill_index(rows):
+    """
+    Index skill links for matching:
+      users:     user_id -> (role, grc_id)
+      offered / wanted: user_id -> {skill_id}
+      offered_mask / wanted_mask: user_id -> int with one bit per skill (sparse row as a bitset)
+      teachers:  (skill_id, role) -> [(user_id, offered_mask, wanted_mask, grc_id)]
+      local_teachers: (skill_id, role, grc_id) -> same, only that GRC
+      learners:  (skill_id, role) -> [user_id]
+    """
+    index = {'users': {}, 'offered': {}, 'wanted': {}, 'offered_mask': {}, 'wanted_mask': {},
+             'teachers': {}, 'learners': {}, 'local_teachers': {}}
+    bits = {}
+    for kind, user_id, role, grc_id, skill_id in rows:
+        index['users'][user_id] = (role, grc_id)
+        index[kind].setdefault(user_id, set()).add(skill_id)
+        bit = bits.setdefault(skill_id, 1 << len(bits))
+        masks = index[kind + '_mask']
+        masks[user_id] = masks.get(user_id, 0) | bit
+        if kind == 'offered':
+            index['teachers'].setdefault((skill_id, role), []).append(user_id)
+        else:
+            index['learners'].setdefault((skill_id, role), []).append(user_id)
+
+    # Teachers carry their masks so scoring a candidate needs no lookups
+    offered_mask, wanted_mask = index['offered_mask'], index['wanted_mask']
+    for (skill_id, role), user_ids in index['teachers'].items():
+        entries = [(u, offered_mask[u], wanted_mask.get(u, 0), index['users'][u][1]) for u in user_ids]
+        index['teachers'][(skill_id, role)] = entries
+        for entry in entries:
+            if entry[3] is not None:
+                index['local_teachers'].setdefault((skill_id, role, entry[3]), []).append(entry)
+    return index
+
+
+def _rotated(items, seed, limit):
+    """Up to `limit` of `items`, starting at a seed-dependent offset so learners don't all get the same teachers."""
+    if len(items) <= limit:
+        return list(items)
+    start = seed % len(items)
+    pool = items[start:start + limit]
+    if len(pool) < limit:
+        pool += items[:limit - len(pool)]
+    return pool
+
+
+def _candidates(index, user_id, skill_id):
+    """Up to CANDIDATE_POOL teacher entries for `skill_id` from the other generation, same GRC first."""
+    role, grc_id = index['users'][user_id]
+    teacher_role = OPPOSITE_ROLE[role]
+    pool = _rotated(index['local_teachers'].get((skill_id, teacher_role, grc_id), []), user_id, CANDIDATE_POOL)
+    if len(pool) < CANDIDATE_POOL:
+        others = [t for t in index['teachers'].get((skill_id, teacher_role), [])
+                  if grc_id is None or t[3] != grc_id]
+        pool += _rotated(others, user_id, CANDIDATE_POOL - len(pool))
+    return pool
+
+
+def _pair_score(index, learner_id, teacher_id):
+    """How well `teacher_id` suits `learner_id` (without the load penalty)."""
+    users = index['users']
+    offered_mask, wanted_mask = index['offered_mask'], index['wanted_mask']
+    score = (COVERAGE_WEIGHT * (offered_mask.get(teacher_id, 0) & wanted_mask.get(learner_id, 0)).bit_count()
+             + RECIPROCAL_WEIGHT * (wanted_mask.get(teacher_id, 0) & offered_mask.get(learner_id, 0)).bit_count())
+    grc_id = users[learner_id][1]
+    if grc_id is not None and users[teacher_id][1] == grc_id:
+        score += GRC_BONUS
+    return score
+
+
+def _best_teachers(index, learner_id, candidates, load, limit):
+    """
+    The `limit` best-scoring teacher ids among `candidates` for one learner.
+    Same formula as _pair_score, inlined: this is the inner loop of a full rematch.
+    """
+    wants = index['wanted_mask'].get(learner_id, 0)
+    offers = index['offered_mask'].get(learner_id, 0)
+    grc_id = index['users'][learner_id][1]
+    load_of = load.get
+
+    scored = []
+    for teacher_id, teacher_offers, teacher_wants, teacher_grc in candidates:
+        score = (COVERAGE_WEIGHT * (teacher_offers & wants).bit_count()
+                 + RECIPROCAL_WEIGHT * (teacher_wants & offers).bit_count()
+                 - LOAD_PENALTY * load_of(teacher_id, 0))
+        if teacher_grc == grc_id and grc_id is not None:
+            score += GRC_BONUS
+        scored.append((score, teacher_id))
+    scored.sort(reverse=True)  # pools are small: a C sort beats heapq.nlargest here
+    return [teacher_id for _, teacher_id in scored[:limit]]
+
+
+def _match_row(index, user_a, user_b, skill_id):
+    """(youth_id, senior_id, skill_id) for a pair in either order."""
+    if index['users'][user_a][0] == 'youth':
+        return user_a, user_b, skill_id
+    return user_b, user_a, skill_id
+
+
+def _match_learner(index, user_id, blocked, load):
+    """Best teachers for each skill `user_id` wants. Returns match rows and updates `load`."""
+    rows = []
+    for skill_id in index['wanted'].get(user_id, ()):
+        candidates = _candidates(index, user_id, skill_id)
+        if blocked:
+            candidates = [t for t in candidates
+                          if _match_row(index, user_id, t[0], skill_id)[:2] not in blocked]
+        for teacher_id in _best_teachers(index, user_id, candidates, load, MATCHES_PER_SKILL):
+            load[teacher_id] = load.get(teacher_id, 0) + 1
+            rows.append(_match_row(index, user_id, teacher_id, skill_id))
+    return rows
+
+
+# =====================================================
+# REMATCH
+# =====================================================
+def rematch_all(conn):
+    """Recompute every active match from scratch. Returns the number of matches. Commits."""
+    print("🔄 Rematching all users...")
+    index = build_skill_index(_load_rows(conn))
+    blocked = {tuple(row) for row in conn.execute(
+        "SELECT youth_id, senior_id FROM match WHERE status = 'blocked'"
+    )}
+
+    load = {}
+    rows = []
+    for user_id in index['wanted']:
+        rows.extend(_match_learner(index, user_id, blocked, load))
+
+    rows.sort()  # primary key order keeps the bulk insert sequential
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM match WHERE status = 'active'")
+        conn.executemany(
+            "INSERT OR IGNORE INTO match (youth_id, senior_id, skill_id) VALUES (?, ?, ?)", rows
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    print(f"✅ {len(rows)} matches for {len(index['users'])} users")
+    return len(rows)
+
+
+def rematch_user(conn, user_id):
+    """
+    Recompute one user's active matches after their skills changed: new teachers
+    for what they want to learn, and they are offered to learners of their skills
+    who have fewer than MATCHES_PER_SKILL teachers. Returns the number of matches. Commits.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "DELETE FROM match WHERE status = 'active' AND (youth_id = ? OR senior_id = ?)",
+            (user_id, user_id)
+        )
+        skill_ids = [row[0] for row in conn.execute("""
+            SELECT skill_id FROM user_skill_offered WHERE user_id = ?
+            UNION SELECT skill_id FROM user_skill_interest WHERE user_id = ?
+        """, (user_id, user_id))]
+        index = build_skill_index(_load_rows(conn, skill_ids)) if skill_ids else None
+        if not index or user_id not in index['users']:
+            conn.commit()
+            return 0
+
+        blocked = {tuple(row) for row in conn.execute("""
+            SELECT youth_id, senior_id FROM match
+            WHERE status = 'blocked' AND (youth_id = ? OR senior_id = ?)
+        """, (user_id, user_id))}
+        rows = _match_learner(index, user_id, blocked, {})
+
+        # As a teacher: top up the best-suited learners of each offered skill who are short of teachers
+        role = index['users'][user_id][0]
+        learner_col = 'senior_id' if role == 'youth' else 'youth_id'
+        for skill_id in index['offered'].get(user_id, ()):
+            learners = sorted(((_pair_score(index, l, user_id), l)
+                               for l in index['learners'].get((skill_id, OPPOSITE_ROLE[role]), [])),
+                              reverse=True)
+            added = 0
+            for _, learner_id in learners:
+                if added == TEACH_LIMIT:
+                    break
+                row = _match_row(index, learner_id, user_id, skill_id)
+                if row[:2] in blocked:
+                    continue
+                served = conn.execute(f"""
+                    SELECT COUNT(*) FROM match
+                    WHERE {learner_col} = ? AND skill_id = ? AND status = 'active'
+                """, (learner_id, skill_id)).fetchone()[0]
+                if served < MATCHES_PER_SKILL:
+                    rows.append(row)
+                    added += 1
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO match (youth_id, senior_id, skill_id) VALUES (?, ?, ?)", rows
+        )
+        conn.commit()
+        return len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# =====================================================
+# REMATCH QUEUE
+# =====================================================
+def queue_rematch(conn, user_id):
+    """Ask the scheduler to rematch the user (their skills changed). Caller commits."""
+    conn.execute("""
+        INSERT INTO rematch_queue (user_id) VALUES (?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            version = version + 1, queued_at = datetime('now'), attempts = 0, last_error = NULL
+    """, (user_id,))
+
+
+def run_queued_rematches(conn, batch=REMATCH_BATCH):
+    """
+    Rematch up to `batch` queued users, oldest first. A failed rematch stays
+    queued with its error and is retried, up to REMATCH_MAX_ATTEMPTS times.
+    Returns the number rematched; raises after the batch if any failed, so the
+    failure is recorded on the scheduled job.
+    """
+    queued = conn.execute("""
+        SELECT user_id, version FROM rematch_queue
+        WHERE attempts < ?
+        ORDER BY queued_at
+        LIMIT ?
+    """, (REMATCH_MAX_ATTEMPTS, batch)).fetchall()
+
+    done = 0
+    failed = []
+    for user_id, version in queued:
+        try:
+            rematch_user(conn, user_id)
+        except Exception as e:
+            conn.execute(
+                "UPDATE rematch_queue SET attempts = attempts + 1, last_error = ? WHERE user_id = ?",
+                (str(e), user_id)
+            )
+            conn.commit()
+            failed.append(user_id)
+            continue
+        # Saved again while we were rematching: leave the newer request queued
+        conn.execute("DELETE FROM rematch_queue WHERE user_id = ? AND version = ?", (user_id, version))
+        conn.commit()
+        done += 1
+
+    if failed:
+        raise RuntimeError(f"rematch failed for user(s) {', '.join(map(str, failed))} ({done} done)")
+    return done
+
+
+def get_user_matches(conn, user_id):
+    """
+    A user's active matches with partner and skill details. `direction` is
+    'learn' when the partner teaches the user, 'teach' the other way round.
+    """
+    rows = conn.execute("""
+        SELECT m.skill_id, s.name AS skill_name, s.category AS skill_category,
+               p.user_id AS partner_id, p.name AS partner_name, p.role AS partner_role,
+               CASE WHEN EXISTS (SELECT 1 FROM user_skill_interest
+                                 WHERE user_id = :user_id AND skill_id = m.skill_id)
+                    THEN 'learn' ELSE 'teach' END AS direction,
+               m.created_at
+        FROM match m
+        JOIN user p ON p.user_id = CASE WHEN m.youth_id = :user_id THEN m.senior_id ELSE m.youth_id END
+        JOIN skill s ON s.skill_id = m.skill_id
+        WHERE m.status = 'active' AND (m.youth_id = :user_id OR m.senior_id = :user_id)
+        ORDER BY direction, s.name, p.name
+    """, {'user_id': user_id}).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,139 @@
+"""
+Per-user impact stats rollup.
+
+user_stats keeps one row per member with their completed events, teaching
+sessions, volunteered hours and reviews written, so the dashboard reads one
+row instead of aggregating event_booking and review on every hit. Members
+with no activity yet have no row (read them as zeros).
+
+The row moves incrementally in the same transaction as the write it counts:
+  - record_completion() when an admin verifies a booking's proof,
+  - record_review() when a reflection is submitted or rejected.
+rebuild_user_stats() recomputes the whole table from source in bulk; the
+scheduler runs it nightly (and "Class db/reconcile_user_stats.py" on demand)
+to correct any drift.
+
+impact_score is a generated column, so it can never disagree with the counters.
+Its formula lives only in the table definition (migration 12 in migrations.py);
+changing it means a new migration that redefines the column.
+"""
+
+DEFAULT_HOURS = 2          # hours credited when an event has no (valid) end time
+
+# Hours for a booking (eb) of event (e): the stored value, else the event's
+# length rounded to the half hour, else DEFAULT_HOURS
+HOURS_SQL = f"""COALESCE(
+    eb.hours_earned,
+    ROUND(MAX(0, (julianday(e.end_datetime) - julianday(e.start_datetime)) * 24) * 2) / 2,
+    {DEFAULT_HOURS})"""
+
+STATS_COLUMNS = ('user_id', 'events_completed', 'teaching_sessions', 'total_hours', 'reviews_written')
+
+# Every member's stats from source, only members with some activity
+STATS_SELECT = f"""
+    SELECT u.user_id,
+           COALESCE(b.events_completed, 0) AS events_completed,
+           COALESCE(b.teaching_sessions, 0) AS teaching_sessions,
+           COALESCE(b.total_hours, 0) AS total_hours,
+           COALESCE(r.reviews_written, 0) AS reviews_written
+    FROM user u
+    LEFT JOIN (
+        SELECT eb.user_id, COUNT(*) AS events_completed,
+               SUM(eb.role_type = 'teacher') AS teaching_sessions,
+               SUM({HOURS_SQL}) AS total_hours
+        FROM event_booking eb
+        JOIN event e ON e.event_id = eb.event_id
+        WHERE eb.status = 'completed'
+        GROUP BY eb.user_id
+    ) b ON b.user_id = u.user_id
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS reviews_written FROM review GROUP BY user_id
+    ) r ON r.user_id = u.user_id
+    WHERE b.user_id IS NOT NULL OR r.user_id IS NOT NULL
+"""
+
+
+# =====================================================
+# INCREMENTAL UPDATES (caller commits)
+# =====================================================
+def _add(conn, user_id, events=0, teaching=0, hours=0, reviews=0):
+    conn.execute("""
+        INSERT INTO user_stats (user_id, events_completed, teaching_sessions, total_hours, reviews_written)
+        VALUES (?, MAX(0, ?), MAX(0, ?), MAX(0, ?), MAX(0, ?))
+        ON CONFLICT(user_id) DO UPDATE SET
+            events_completed = MAX(0, events_completed + ?),
+            teaching_sessions = MAX(0, teaching_sessions + ?),
+            total_hours = MAX(0, total_hours + ?),
+            reviews_written = MAX(0, reviews_written + ?),
+            updated_at = datetime('now')
+    """, (user_id, events, teaching, hours, reviews, events, teaching, hours, reviews))
+
+
+def record_completion(conn, user_id, event_id):
+    """
+    Count a booking that just became 'completed': stores its hours_earned if
+    not set yet and adds it to the user's stats. Returns the hours credited.
+    """
+    booking = conn.execute(f"""
+        SELECT eb.role_type, {HOURS_SQL} AS hours
+        FROM event_booking eb
+        JOIN event e ON e.event_id = eb.event_id
+        WHERE eb.user_id = ? AND eb.event_id = ?
+    """, (user_id, event_id)).fetchone()
+    if not booking:
+        return 0
+
+    conn.execute(
+        "UPDATE event_booking SET hours_earned = ? WHERE user_id = ? AND event_id = ? AND hours_earned IS NULL",
+        (booking['hours'], user_id, event_id)
+    )
+    _add(conn, user_id, events=1, teaching=int(booking['role_type'] == 'teacher'), hours=booking['hours'])
+    return booking['hours']
+
+
+def record_review(conn, user_id, delta=1):
+    """Count a review written (delta=1) or deleted (delta=-1)."""
+    _add(conn, user_id, reviews=delta)
+
+
+def get_user_stats(conn, user_id):
+    """The user's stats as a dict (zeros if they have no activity yet)."""
+    row = conn.execute("""
+        SELECT events_completed, teaching_sessions, total_hours, reviews_written, impact_score
+        FROM user_stats WHERE user_id = ?
+    """, (user_id,)).fetchone()
+    if not row:
+        return {'events_completed': 0, 'teaching_sessions': 0, 'total_hours': 0,
+                'reviews_written': 0, 'impact_score': 0}
+    return dict(row)
+
+
+# =====================================================
+# RECONCILIATION
+# =====================================================
+def rebuild_user_stats(conn):
+    """
+    Recompute user_stats from source in one transaction.
+    Returns (rows, corrected): the table size and how many rows had drifted. Commits.
+    """
+    cols = ', '.join(STATS_COLUMNS)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DROP TABLE IF EXISTS temp.user_stats_fresh")
+        conn.execute(f"CREATE TEMP TABLE user_stats_fresh AS {STATS_SELECT}")
+        corrected = conn.execute(f"""
+            SELECT (SELECT COUNT(*) FROM (SELECT {cols} FROM user_stats_fresh
+                                          EXCEPT SELECT {cols} FROM main.user_stats))
+                 + (SELECT COUNT(*) FROM (SELECT user_id FROM main.user_stats
+                                          EXCEPT SELECT user_id FROM user_stats_fresh))
+        """).fetchone()[0]
+        if corrected:
+            conn.execute("DELETE FROM main.user_stats")
+            conn.execute(f"INSERT INTO main.user_stats ({cols}) SELECT {cols} FROM user_stats_fresh")
+        rows = conn.execute("SELECT COUNT(*) FROM user_stats_fresh").fetchone()[0]
+        conn.execute("DROP TABLE temp.user_stats_fresh")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return rows, corrected
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Query Plan Audit
+Runs EXPLAIN QUERY PLAN on every SQL statement found in app/Python_Files and
+fails (exit code 1) if a hot query still does a full table SCAN.
+
+A query is "hot" when it filters (WHERE / JOIN ... ON) a table in HOT_TABLES.
+Unfiltered listings (e.g. every reward for the admin page) always scan and are
+reported but not failed.
+
+Usage:
+    venv\\Scripts\\python.exe "Class db/audit_query_plans.py"
+    venv\\Scripts\\python.exe "Class db/audit_query_plans.py" --verbose
+"""
+import argparse
+import ast
+import os
+import re
+import sqlite3
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Tables that grow with users/activity - a SCAN on these is a failure
+HOT_TABLES = {
+    'notification', 'event', 'event_booking', 'reward_redemption', 'user_challenge',
+    'support_ticket', 'live_chat_message', 'live_chat_session', 'points_transaction',
+    'review', 'user',
+}
+
+# Deliberate full scans: (table, SQL fragment, reason)
+ALLOWED_SCANS = [
+    ('user', "WHERE role IN ('youth', 'senior')", "notification fan-out targets every member"),
+]
+
+SQL_KEYWORDS = {'WHERE', 'ON', 'JOIN', 'LEFT', 'INNER', 'SET', 'ORDER', 'GROUP', 'VALUES', 'SELECT', 'LIMIT'}
+SQL_START = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT|WITH)\b', re.IGNORECASE)
+SCAN_LINE = re.compile(r'\bSCAN (\w+)')
+
+
+def find_python_files():
+    """Blueprint modules (app/ and App/ are the same folder on Windows)."""
+    files = []
+    for pkg in ('app', 'App'):
+        folder = os.path.join(ROOT_DIR, pkg, 'Python_Files')
+        if os.path.isdir(folder):
+            for name in sorted(os.listdir(folder)):
+                path = os.path.join(folder, name)
+                if name.endswith('.py') and path not in files:
+                    files.append(path)
+    return files
+
+
+def extract_statements(path):
+    """Yield (lineno, sql) for every execute()/executemany() call with a literal SQL string."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    # Local `query = """..."""` assignments so execute(query, ...) can be resolved
+    literals = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) \
+                and isinstance(node.value.value, str):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    literals[target.id] = node.value.value
+
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ('execute', 'executemany') and node.args):
+            continue
+        arg = node.args[0]
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            yield node.lineno, arg.value
+        elif isinstance(arg, ast.Name) and arg.id in literals:
+            yield node.lineno, literals[arg.id]
+
+
+def top_level(sql):
+    """Statement text with every parenthesised sub-expression (subqueries, IN lists) removed."""
+    previous = None
+    while previous != sql:
+        previous, sql = sql, re.sub(r'\([^()]*\)', '', sql)
+    return sql
+
+
+def filtered_tables(sql):
+    """{name or alias: table} for statements with a top-level WHERE clause."""
+    if not re.search(r'\bWHERE\b', top_level(sql), re.IGNORECASE):
+        return {}
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def is_allowed(sql, table):
+    return any(t == table and fragment in " ".join(sql.split()) for t, fragment, _ in ALLOWED_SCANS)
+
+
+def explain(conn, sql):
+    params = [None] * sql.count('?')
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[3] for row in rows]
+
+
+def audit(verbose=False):
+    from app.db import DATABASE, migrate_database
+
+    # Make sure the index pack is present before judging plans
+    migrate_database()
+    conn = sqlite3.connect(f"file:{DATABASE}?mode=ro", uri=True)
+
+    # Scanning a partial index only touches the rows it was built for (e.g. pending items)
+    partial_indexes = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'"
+    )}
+
+    failures = []
+    checked = 0
+    for path in find_python_files():
+        rel = os.path.relpath(path, ROOT_DIR)
+        for lineno, sql in extract_statements(path):
+            if not SQL_START.match(sql):
+                continue
+            checked += 1
+            try:
+                plan = explain(conn, sql)
+            except sqlite3.Error as e:
+                print(f"⚠ {rel}:{lineno} could not be explained: {e}")
+                continue
+
+            tables = filtered_tables(sql)
+            scans = []
+            for line in plan:
+                match = SCAN_LINE.search(line)
+                if not match:
+                    continue
+                table = tables.get(match.group(1).lower())
+                index = re.search(r'USING (?:COVERING )?INDEX (\w+)', line)
+                if index and index.group(1) in partial_indexes:
+                    continue
+                if table in HOT_TABLES and not is_allowed(sql, table):
+                    scans.append(line)
+
+            if scans:
+                failures.append((rel, lineno))
+                print(f"❌ {rel}:{lineno}")
+            elif verbose:
+                print(f"✓ {rel}:{lineno}")
+            if scans or verbose:
+                print("   " + " ".join(sql.split())[:160])
+                for line in plan:
+                    print(f"     {line}")
+
+    conn.close()
+    print(f"\nChecked {checked} statements, {len(failures)} hot full-table scans.")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Audit query plans of blueprint SQL.')
+    parser.add_argument('--verbose', action='store_true', help='Print the plan of every statement')
+    args = parser.parse_args()
+
+    sys.exit(1 if audit(args.verbose) else 0)
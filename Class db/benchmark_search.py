@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Search Benchmark
+Compares the old LIKE '%q%' event search with the FTS5 index (search.py) on
+a throwaway copy of skillswap.db filled with synthetic events.
+
+Usage:
+    venv\\Scripts\\python.exe "Class db/benchmark_search.py"
+    venv\\Scripts\\python.exe "Class db/benchmark_search.py" --events 200000 --runs 50
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+WORDS = ['python', 'cooking', 'gardening', 'yoga', 'painting', 'calligraphy', 'chess', 'mahjong',
+         'smartphone', 'baking', 'tai', 'chi', 'photography', 'knitting', 'dance', 'history',
+         'heritage', 'walk', 'workshop', 'beginner', 'advanced', 'community', 'garden', 'repair']
+PLACES = ['Toa Payoh', 'Bishan', 'Jurong', 'Tampines', 'Woodlands', 'Bedok', 'Yishun', 'Queenstown']
+QUERIES = ['python', 'calli', 'tampines', 'yoga beginner', 'heritage walk', 'xylophone']
+
+
+def use_database(path):
+    """Point app.db (and its connection pool) at `path`."""
+    import app.db as db
+    db.DATABASE = path
+    db._pools.clear()
+    db.invalidate_schema_capabilities()
+
+
+def add_events(conn, count, seed=42):
+    """`count` events: a themed word or two in each title, descriptions mostly from a large filler vocabulary."""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    filler = [''.join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(20000)]
+    rows = []
+    for _ in range(count):
+        title = ' '.join(rng.sample(WORDS, 2) + rng.sample(filler, 2)).title()
+        description = ' '.join([rng.choice(WORDS)] + rng.sample(filler, 40))
+        rows.append((title, description, rng.choice(PLACES), rng.choice(['published', 'ended', 'pending'])))
+    conn.executemany("""
+        INSERT INTO event (created_by_user_id, title, description, location, start_datetime, status)
+        VALUES (1, ?, ?, ?, datetime('now', '+7 days'), ?)
+    """, rows)
+    conn.commit()
+
+
+def timed(conn, sql, params, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        rows = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) * 1000 / runs, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LIKE vs FTS5 event search benchmark.')
+    parser.add_argument('--events', type=int, default=100000, help='Synthetic events to add')
+    parser.add_argument('--runs', type=int, default=20, help='Repetitions per query')
+    args = parser.parse_args()
+
+    from app.db import DATABASE
+    tmp_dir = tempfile.mkdtemp(prefix='skillswap-search-')
+    db_path = os.path.join(tmp_dir, 'skillswap.db')
+    if os.path.exists(DATABASE):
+        shutil.copy(DATABASE, db_path)
+
+    try:
+        use_database(db_path)
+        from app.db import get_db_connection, migrate_database, has_table
+        from app.search import match_query, search_events
+
+        migrate_database()
+        if not has_table('event_fts'):
+            print("❌ This SQLite build has no FTS5")
+            return 1
+
+        conn = get_db_connection()
+        start = time.perf_counter()
+        add_events(conn, args.events)
+        print(f"🔄 Added {args.events} events in {time.perf_counter() - start:.1f}s (FTS kept in sync by triggers)")
+
+        print(f"   {'query':<16}{'LIKE ms':>10}{'hits':>8}{'FTS ms':>10}{'hits':>8}")
+        like_total = fts_total = 0
+        for text in QUERIES:
+            like_ms, like_hits = timed(conn, """
+                SELECT event_id FROM event
+                WHERE (title LIKE ? OR location LIKE ?) ORDER BY start_datetime DESC LIMIT 20
+            """, (f'%{text}%', f'%{text}%'), args.runs)
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                hits = search_events(conn, text, statuses=None)
+            fts_ms = (time.perf_counter() - start) * 1000 / args.runs
+            like_total += like_ms
+            fts_total += fts_ms
+            print(f"   {text:<16}{like_ms:>10.2f}{like_hits:>8}{fts_ms:>10.2f}{len(hits):>8}")
+
+        count_ms, _ = timed(conn, "SELECT COUNT(*) FROM event_fts WHERE event_fts MATCH ?",
+                            (match_query('python'),), args.runs)
+        conn.close()
+        print(f"   full match count for 'python': {count_ms:.2f} ms")
+        print(f"✅ FTS {like_total / fts_total:.1f}x faster than LIKE on average "
+              f"({fts_total / len(QUERIES):.2f} ms vs {like_total / len(QUERIES):.2f} ms)")
+        return 0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
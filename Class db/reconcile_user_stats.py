@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+User Stats Reconciliation
+Rebuilds the user_stats rollup (events completed, hours, reviews, impact
+score) from event_booking and review in one bulk pass and reports how many
+rows had drifted from the incremental updates.
+
+The scheduler (app/scheduler.py) runs the same rebuild nightly; run this by
+hand after editing bookings or reviews directly.
+
+Usage:
+    venv\\Scripts\\python.exe "Class db/reconcile_user_stats.py"
+"""
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def main():
+    from app.db import get_db_connection, migrate_database
+    from app.user_stats import rebuild_user_stats
+    from app.dashboard_data import invalidate_all_dashboards
+
+    migrate_database()
+    conn = get_db_connection()
+    try:
+        print("🔄 Reconciling user_stats...")
+        start = time.perf_counter()
+        rows, corrected = rebuild_user_stats(conn)
+    finally:
+        conn.close()
+
+    if corrected:
+        invalidate_all_dashboards()
+        print(f"⚠️ {corrected} user_stats rows had drifted and were corrected")
+    print(f"✅ user_stats rebuilt: {rows} users in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Skill Rematch
+Recomputes every active youth/senior match in the match table.
+
+With --synthetic N it instead runs on a throwaway copy of skillswap.db with
+N generated users (half youth, half senior, a few offered/wanted skills
+each) and reports how long the full rematch and a single-user rematch take.
+
+Usage:
+    venv\\Scripts\\python.exe "Class db/rematch_skills.py"
+    venv\\Scripts\\python.exe "Class db/rematch_skills.py" --synthetic 100000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def use_database(path):
+    """Point app.db (and its connection pool) at `path`."""
+    import app.db as db
+    db.DATABASE = path
+    db._pools.clear()
+
+
+def add_synthetic_users(conn, users, skills=60, grcs=30, seed=42):
+    """Insert `users` youths/seniors with 1-4 offered and 1-4 wanted skills each."""
+    rng = random.Random(seed)
+    first_skill = conn.execute("SELECT COALESCE(MAX(skill_id), 0) + 1 FROM skill").fetchone()[0]
+    skill_ids = list(range(first_skill, first_skill + skills))
+    conn.executemany("INSERT INTO skill (skill_id, name, category) VALUES (?, ?, 'General')",
+                     [(sid, f"Synthetic skill {sid}") for sid in skill_ids])
+
+    first = conn.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM user").fetchone()[0]
+    user_rows, offered, wanted = [], [], []
+    for user_id in range(first, first + users):
+        role = 'youth' if user_id % 2 else 'senior'
+        user_rows.append((user_id, f"Synthetic {user_id}", f"synthetic{user_id}@test.local",
+                          role, rng.randint(1, grcs)))
+        offered += [(user_id, sid) for sid in rng.sample(skill_ids, rng.randint(1, 4))]
+        wanted += [(user_id, sid) for sid in rng.sample(skill_ids, rng.randint(1, 4))]
+
+    conn.executemany("""INSERT INTO user (user_id, name, email, password_hash, role, grc_id, verification_status)
+                        VALUES (?, ?, ?, 'x', ?, ?, 'verified')""", user_rows)
+    conn.executemany("INSERT OR IGNORE INTO user_skill_offered (user_id, skill_id) VALUES (?, ?)", offered)
+    conn.executemany("INSERT OR IGNORE INTO user_skill_interest (user_id, skill_id) VALUES (?, ?)", wanted)
+    conn.commit()
+    return first
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute youth/senior skill matches.')
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help='Benchmark on a temporary copy with N generated users')
+    args = parser.parse_args()
+
+    from app.db import DATABASE, get_db_connection, migrate_database
+    from app.skill_matching import rematch_all, rematch_user
+
+    tmp_dir = None
+    if args.synthetic:
+        tmp_dir = tempfile.mkdtemp(prefix='skillswap-match-')
+        db_path = os.path.join(tmp_dir, 'skillswap.db')
+        if os.path.exists(DATABASE):
+            shutil.copy(DATABASE, db_path)
+        use_database(db_path)
+
+    try:
+        migrate_database()
+        conn = get_db_connection()
+        sample_user = None
+        if args.synthetic:
+            print(f"🔄 Generating {args.synthetic} users...")
+            sample_user = add_synthetic_users(conn, args.synthetic)
+
+        start = time.perf_counter()
+        rematch_all(conn)
+        print(f"   full rematch: {time.perf_counter() - start:.2f}s")
+
+        if sample_user:
+            start = time.perf_counter()
+            rematch_user(conn, sample_user)
+            print(f"   single-user rematch: {(time.perf_counter() - start) * 1000:.1f} ms")
+            matched = conn.execute("""
+                SELECT COUNT(*) FROM (SELECT youth_id FROM match WHERE status = 'active'
+                                      UNION SELECT senior_id FROM match WHERE status = 'active')
+            """).fetchone()[0]
+            print(f"   {matched} of {args.synthetic} users have at least one match")
+        conn.close()
+        return 0
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -51,6 +51,9 @@ def reset_events(cursor):
     cursor.execute("DELETE FROM review")
     cursor.execute("DELETE FROM notification") # Notifications are often event-related or personal, best to clear for a 'reset'
     cursor.execute("DELETE FROM points_transaction WHERE event_id IS NOT NULL")
+    # Capacity summaries are rebuilt from the seeded rows the first time each event is read
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='event_capacity_summary'").fetchone():
+        cursor.execute("DELETE FROM event_capacity_summary")
     
     # Delete all events and reset auto-increment counter
     cursor.execute("DELETE FROM event")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Event Sign-up Stress Test
+Fires many concurrent sign-ups at one event and checks that no role is
+overbooked and every contender gets exactly one answer.
+
+Runs on a throwaway copy of skillswap.db, so the real database is untouched.
+Contenders are threads (--mode threads) or separate processes like the user
+and admin apps (--mode processes), each with its own connection.
+
+Usage:
+    venv\\Scripts\\python.exe "Class db/stress_event_signup.py"
+    venv\\Scripts\\python.exe "Class db/stress_event_signup.py" --users 1000 --slots 50 --workers 32 --mode processes
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def use_database(path):
+    """Point app.db (and its connection pool) at `path`."""
+    import app.db as db
+    db.DATABASE = path
+    db._pools.clear()
+
+
+def setup(users, mentor_slots, participant_slots):
+    """Create one published event and `users` verified youths. Returns (event_id, user_ids)."""
+    from app.db import get_db_connection, migrate_database
+    from app.event_capacity import refresh_event_capacity
+
+    migrate_database()
+    conn = get_db_connection()
+    cursor = conn.execute("""
+        INSERT INTO event (created_by_user_id, title, start_datetime, location, category, led_by, status)
+        VALUES (1, 'Stress test event', datetime('now', '+7 days'), 'Test', 'social_games', 'youth', 'published')
+    """)
+    event_id = cursor.lastrowid
+    conn.executemany(
+        "INSERT INTO event_role_requirement (event_id, role_type, required_count) VALUES (?, ?, ?)",
+        [(event_id, 'teacher', mentor_slots), (event_id, 'participant', participant_slots)]
+    )
+    first = conn.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM user").fetchone()[0]
+    conn.executemany(
+        """INSERT INTO user (user_id, name, email, password_hash, role, verification_status)
+           VALUES (?, ?, ?, 'x', 'youth', 'verified')""",
+        [(first + i, f"Stress {i}", f"stress{first + i}@test.local") for i in range(users)]
+    )
+    refresh_event_capacity(conn, event_id)
+    conn.commit()
+    conn.close()
+    return event_id, list(range(first, first + users))
+
+
+def contend(args):
+    """One contender: sign up (every 4th user as mentor); with churn, some withdraw and re-sign."""
+    db_path, event_id, user_id, churn = args
+    if _worker_db != db_path:
+        _init_worker(db_path)
+    from app.db import get_db_connection
+    from app.event_capacity import claim_slot, release_slot
+
+    role = 'teacher' if user_id % 4 == 0 else 'participant'
+    conn = get_db_connection()
+    try:
+        start = time.perf_counter()
+        result, _ = claim_slot(conn, event_id, user_id, role)
+        if churn and result == 'booked' and user_id % 5 == 0:
+            release_slot(conn, event_id, user_id)
+            result, _ = claim_slot(conn, event_id, user_id, role)
+        return result, time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+_worker_db = None
+
+
+def _init_worker(db_path):
+    global _worker_db
+    use_database(db_path)
+    _worker_db = db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent event sign-up stress test.')
+    parser.add_argument('--users', type=int, default=500, help='Number of contenders')
+    parser.add_argument('--slots', type=int, default=40, help='Participant slots (mentor slots = slots / 4)')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent workers')
+    parser.add_argument('--mode', choices=['threads', 'processes'], default='threads')
+    parser.add_argument('--churn', action='store_true', help='Every 5th winner withdraws and signs up again')
+    args = parser.parse_args()
+
+    from app.db import DATABASE
+    tmp_dir = tempfile.mkdtemp(prefix='skillswap-stress-')
+    db_path = os.path.join(tmp_dir, 'skillswap.db')
+    if os.path.exists(DATABASE):
+        shutil.copy(DATABASE, db_path)
+    os.environ['DB_POOL_SIZE'] = str(args.workers + 2)
+
+    try:
+        _init_worker(db_path)
+        mentor_slots = max(1, args.slots // 4)
+        event_id, user_ids = setup(args.users, mentor_slots, args.slots)
+        print(f"🔄 {args.users} contenders -> event {event_id} "
+              f"({mentor_slots} mentor / {args.slots} participant slots), {args.workers} {args.mode}")
+
+        jobs = [(db_path, event_id, uid, args.churn) for uid in user_ids]
+        if args.mode == 'processes':
+            executor = ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(db_path,))
+        else:
+            executor = ThreadPoolExecutor(args.workers)
+
+        start = time.perf_counter()
+        with executor:
+            results = list(executor.map(contend, jobs))
+        elapsed = time.perf_counter() - start
+
+        outcomes = Counter(result for result, _ in results)
+        latencies = sorted(latency for _, latency in results)
+
+        from app.db import get_db_connection
+        conn = get_db_connection()
+        booked = dict(conn.execute("""
+            SELECT role_type, COUNT(*) FROM event_booking
+            WHERE event_id = ? AND status = 'booked' GROUP BY role_type
+        """, (event_id,)).fetchall())
+        summary = conn.execute(
+            "SELECT teacher_filled, participant_filled FROM event_capacity_summary WHERE event_id = ?",
+            (event_id,)
+        ).fetchone()
+        conn.close()
+
+        print(f"   {dict(outcomes)} in {elapsed:.2f}s ({len(results) / elapsed:.0f} sign-ups/s)")
+        print(f"   latency p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+        print(f"   booked: {booked}, summary: teacher {summary[0]} / participant {summary[1]}")
+
+        errors = []
+        if booked.get('teacher', 0) > mentor_slots or booked.get('participant', 0) > args.slots:
+            errors.append("overbooked")
+        if (summary[0], summary[1]) != (booked.get('teacher', 0), booked.get('participant', 0)):
+            errors.append("summary out of sync with bookings")
+        if len(results) != args.users:
+            errors.append("missing results")
+        mentor_contenders = sum(1 for uid in user_ids if uid % 4 == 0)
+        expected = min(mentor_contenders, mentor_slots) + min(args.users - mentor_contenders, args.slots)
+        if outcomes['booked'] != expected:
+            errors.append(f"expected {expected} seats filled, got {outcomes['booked']}")
+
+        if errors:
+            print(f"❌ {', '.join(errors)}")
+            return 1
+        print("✅ No overbooking")
+        return 0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Reward Redemption Stress Test
+Many users redeem a limited reward at once while several "admins" approve
+and reject the same requests concurrently, reservations expire and another
+admin keeps editing the reward's stock from a page loaded a moment earlier.
+Checks that stock is never oversold or inflated, nobody's points go negative,
+every balance matches the points ledger and every request is decided at most once.
+
+Runs on a throwaway copy of skillswap.db, so the real database is untouched.
+Every worker thread has its own connection to the SQLite file.
+
+Usage:
+    venv\\Scripts\\python.exe "Class db/stress_redemption.py"
+    venv\\Scripts\\python.exe "Class db/stress_redemption.py" --users 400 --stock 100 --workers 32
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+PRICE = 100
+
+
+def use_database(path):
+    """Point app.db (and its connection pool) at `path`."""
+    import app.db as db
+    db.DATABASE = path
+    db._pools.clear()
+
+
+def setup(users, stock, attempts):
+    """One reward with `stock` units and `users` youths who can afford all but one of their attempts."""
+    from app.db import get_db_connection, migrate_database
+    from app.points_ledger import record_points
+
+    migrate_database()
+    conn = get_db_connection()
+    reward_id = conn.execute(
+        "INSERT INTO reward (name, points_required, total_quantity) VALUES ('Stress voucher', ?, ?)",
+        (PRICE, stock)
+    ).lastrowid
+    first = conn.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM user").fetchone()[0]
+    user_ids = list(range(first, first + users))
+    conn.executemany(
+        """INSERT INTO user (user_id, name, email, password_hash, role, verification_status)
+           VALUES (?, ?, ?, 'x', 'youth', 'verified')""",
+        [(uid, f"Stress {uid}", f"redeem{uid}@test.local") for uid in user_ids]
+    )
+    for uid in user_ids:
+        record_points(conn, uid, PRICE * max(1, attempts - 1), 'adjustment', remarks='Stress test budget')
+    conn.commit()
+    conn.close()
+    return reward_id, user_ids
+
+
+def redeem(args):
+    """One user hammering the redeem button `attempts` times."""
+    reward_id, user_id, attempts = args
+    from app.db import get_db_connection
+    from app.redemptions import request_redemption
+
+    conn = get_db_connection()
+    try:
+        return [request_redemption(conn, user_id, reward_id)[0] for _ in range(attempts)]
+    finally:
+        conn.close()
+
+
+def decide(stop, seed):
+    """An admin approving/rejecting random pending requests (often the same ones as other admins)."""
+    from app.db import get_db_connection
+    from app.redemptions import approve_redemption, reject_redemption, expire_reservations
+
+    rng = random.Random(seed)
+    outcomes = Counter()
+    conn = get_db_connection()
+    try:
+        while not stop.is_set():
+            pending = [row[0] for row in conn.execute(
+                "SELECT redemption_id FROM reward_redemption WHERE status = 'requested' ORDER BY redemption_id LIMIT 10"
+            )]
+            if not pending:
+                time.sleep(0.005)
+                continue
+            redemption_id = rng.choice(pending)
+            roll = rng.random()
+            if roll < 0.6:
+                outcomes[approve_redemption(conn, redemption_id)[0]] += 1
+            elif roll < 0.9:
+                outcomes[reject_redemption(conn, redemption_id)[0]] += 1
+            else:
+                # Make a few reservations lapse and run the expiry sweep
+                conn.execute("UPDATE reward_redemption SET reserved_until = datetime('now', '-1 minute') "
+                             "WHERE redemption_id = ? AND status = 'requested'", (redemption_id,))
+                conn.commit()
+                outcomes['expired'] += expire_reservations(conn)
+    finally:
+        conn.close()
+    return outcomes
+
+
+def edit_stock(stop, seed, reward_id):
+    """
+    An admin restocking/destocking through the edit form. Returns (stock change
+    applied, edits whose change was lost to reservations made after the page loaded).
+    """
+    from app.db import get_db_connection
+    from app.redemptions import set_reward_stock
+
+    rng = random.Random(seed)
+    applied = 0
+    lost = 0
+    conn = get_db_connection()
+    try:
+        while not stop.is_set():
+            # The edit page is loaded, then submitted a moment later
+            loaded = conn.execute("SELECT total_quantity FROM reward WHERE reward_id = ?", (reward_id,)).fetchone()[0]
+            time.sleep(0.002)
+            wanted = max(0, loaded + rng.randint(-4, 4))
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.execute("SELECT total_quantity FROM reward WHERE reward_id = ?", (reward_id,)).fetchone()[0]
+            set_reward_stock(conn, reward_id, loaded, wanted)
+            after = conn.execute("SELECT total_quantity FROM reward WHERE reward_id = ?", (reward_id,)).fetchone()[0]
+            conn.commit()
+            applied += after - before
+            # The admin's change must land as typed (unless it would take the stock below 0)
+            if after != 0 and after - before != wanted - loaded:
+                lost += 1
+    finally:
+        conn.close()
+    return applied, lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent reward redemption stress test.')
+    parser.add_argument('--users', type=int, default=200, help='Number of redeeming users')
+    parser.add_argument('--stock', type=int, default=60, help='Units of the reward')
+    parser.add_argument('--attempts', type=int, default=3, help='Redeem clicks per user (budget covers attempts - 1)')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent redeeming threads')
+    parser.add_argument('--admins', type=int, default=4, help='Concurrent approving/rejecting threads')
+    parser.add_argument('--editors', type=int, default=1, help='Concurrent admins editing the stock')
+    args = parser.parse_args()
+
+    from app.db import DATABASE
+    tmp_dir = tempfile.mkdtemp(prefix='skillswap-redeem-')
+    db_path = os.path.join(tmp_dir, 'skillswap.db')
+    if os.path.exists(DATABASE):
+        shutil.copy(DATABASE, db_path)
+    os.environ['DB_POOL_SIZE'] = str(args.workers + args.admins + args.editors + 2)
+
+    try:
+        use_database(db_path)
+        reward_id, user_ids = setup(args.users, args.stock, args.attempts)
+        print(f"🔄 {args.users} users x {args.attempts} clicks -> {args.stock} units, "
+              f"{args.workers} workers, {args.admins} admins, {args.editors} stock editors")
+
+        stop = threading.Event()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.admins + args.editors) as admins:
+            decisions = [admins.submit(decide, stop, seed) for seed in range(args.admins)]
+            edits = [admins.submit(edit_stock, stop, seed, reward_id) for seed in range(args.editors)]
+            with ThreadPoolExecutor(args.workers) as workers:
+                results = list(workers.map(redeem, [(reward_id, uid, args.attempts) for uid in user_ids]))
+            time.sleep(0.2)
+            stop.set()
+            admin_outcomes = sum((d.result() for d in decisions), Counter())
+            edit_results = [e.result() for e in edits]
+            restocked = sum(applied for applied, _ in edit_results)
+            lost_edits = sum(lost for _, lost in edit_results)
+        elapsed = time.perf_counter() - start
+
+        outcomes = Counter(r for user_results in results for r in user_results)
+        print(f"   requests: {dict(outcomes)} in {elapsed:.2f}s")
+        print(f"   admins:   {dict(admin_outcomes)}, stock edits applied {restocked:+d}")
+
+        from app.db import get_db_connection
+        from app.points_ledger import find_balance_mismatches
+        conn = get_db_connection()
+        stock_left = conn.execute("SELECT total_quantity FROM reward WHERE reward_id = ?", (reward_id,)).fetchone()[0]
+        statuses = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM reward_redemption WHERE reward_id = ? GROUP BY status", (reward_id,)
+        ).fetchall())
+        negative = conn.execute(
+            f"SELECT COUNT(*) FROM user WHERE total_points < 0 AND user_id BETWEEN ? AND ?",
+            (user_ids[0], user_ids[-1])
+        ).fetchone()[0]
+        double_decided = conn.execute("""
+            SELECT COUNT(*) FROM reward_redemption rr
+            WHERE rr.reward_id = ? AND (
+                (rr.status IN ('requested', 'approved') AND EXISTS (
+                    SELECT 1 FROM points_transaction WHERE idempotency_key = 'refund:redemption:' || rr.redemption_id))
+                OR (rr.status IN ('rejected', 'cancelled') AND NOT EXISTS (
+                    SELECT 1 FROM points_transaction WHERE idempotency_key = 'refund:redemption:' || rr.redemption_id)))
+        """, (reward_id,)).fetchone()[0]
+        mismatches = find_balance_mismatches(conn)
+        conn.close()
+
+        held = statuses.get('requested', 0) + statuses.get('approved', 0)
+        print(f"   redemptions: {statuses}, stock left {stock_left}")
+
+        errors = []
+        if stock_left < 0:
+            errors.append(f"stock went negative ({stock_left})")
+        if held + stock_left != args.stock + restocked:
+            errors.append(f"stock leaked: {held} held + {stock_left} left != {args.stock} {restocked:+d} edited")
+        if lost_edits:
+            errors.append(f"{lost_edits} stock edits overwrote reservations made meanwhile")
+        if outcomes['requested'] != sum(statuses.values()):
+            errors.append("request results disagree with redemption rows")
+        if negative:
+            errors.append(f"{negative} users overdrawn")
+        if mismatches:
+            errors.append(f"{len(mismatches)} balances disagree with the ledger")
+        if double_decided:
+            errors.append(f"{double_decided} redemptions refunded wrongly or twice")
+
+        if errors:
+            print(f"❌ {', '.join(errors)}")
+            return 1
+        print("✅ No overselling, no overdrawn points, ledger consistent")
+        return 0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,7 @@ SkillSwap Main Entry Point
 Runs both domains concurrently:
   - Youth/Senior on port 5000
   - Admin on port 5001
+plus the background job scheduler (app/scheduler.py).
 """
 import multiprocessing
 from app import create_app, create_admin_app
@@ -26,26 +27,37 @@ def run_admin():
     app.run(debug=False, port=5001, threaded=True)
 
 
+def run_jobs():
+    """Run the background job scheduler (expiries, challenge/event endings)"""
+    from app.scheduler import run_scheduler
+    run_scheduler()
+
+
 if __name__ == "__main__":  
     print("=" * 55)
     print("SKILLSWAP - Starting Both Domains")
     print("=" * 55)
     print("  Youth/Senior: http://localhost:5000")
     print("  Admin:        http://localhost:5001")
+    print("  Scheduler:    background jobs")
     print("=" * 55)
     
     # Run both apps in separate processes
     main_process = multiprocessing.Process(target=run_main)
     admin_process = multiprocessing.Process(target=run_admin)
+    scheduler_process = multiprocessing.Process(target=run_jobs)
     
     main_process.start()
     admin_process.start()
+    scheduler_process.start()
     
     try:
         main_process.join()
         admin_process.join()
+        scheduler_process.join()
     except KeyboardInterrupt:
         pass
         # Terminate processes silently
         main_process.terminate()
-        admin_process.terminate()
\ No newline at end of file
+        admin_process.terminate()
+        scheduler_process.terminate()
\ No newline at end of file
@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request, current_app
 from app.db import get_db_connection
+from app.user_stats import record_review
+from app.dashboard_data import invalidate_dashboard
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
@@ -275,7 +277,9 @@ def submit_reflection():
     if not existing:
         conn.execute("INSERT INTO review (user_id, event_id, rating, comment) VALUES (?, ?, ?, ?)",
                      (user_id, event_id, rating, comment))
+        record_review(conn, user_id)
         conn.commit()
+        invalidate_dashboard(user_id)
     else:
         flash("You have already submitted feedback for this event.", "info")
         conn.close()
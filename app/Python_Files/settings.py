@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify, current_app
 from app.db import get_db_connection
+from app.skill_matching import queue_rematch, get_user_matches
+from app.dashboard_data import invalidate_dashboard
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
 import os
@@ -166,6 +168,7 @@ def update_settings():
             
         conn.commit()
         conn.close()
+        invalidate_dashboard(user_id)
         
         # Update Session Name if changed
         session['user_name'] = name
@@ -293,6 +296,8 @@ def update_skills():
             except:
                 pass
                 
+        # Skills changed - the scheduler refreshes this user's youth/senior matches
+        queue_rematch(conn, user_id)
         conn.commit()
         conn.close()
         
@@ -301,6 +306,22 @@ def update_skills():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@settings_bp.route('/settings/matches')
+def skill_matches():
+    """
+    API Endpoint: The user's current youth/senior skill matches.
+    
+    Each match names the partner, the skill and whether the user learns it
+    from the partner ('learn') or teaches it to them ('teach').
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    
+    conn = get_db_connection()
+    matches = get_user_matches(conn, session['user_id'])
+    conn.close()
+    return jsonify({'success': True, 'matches': matches})
+
 @settings_bp.route('/settings/upload_verification', methods=['POST'])
 def upload_verification():
     """
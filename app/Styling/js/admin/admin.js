@@ -221,6 +221,36 @@ function closeModal(modalId) {
     }
 }
 
+// =====================================================
+// DASHBOARD STATS
+// =====================================================
+const DASHBOARD_STATS_REFRESH = 30000; // matches the server-side cache TTL
+
+/**
+ * Refresh the dashboard cards from /admin/api/dashboard-stats without reloading the page
+ */
+function refreshDashboardStats() {
+    const container = document.getElementById('dashboardStats');
+    if (!container || document.hidden) return;
+
+    fetch(container.dataset.statsUrl)
+        .then(res => res.json())
+        .then(stats => {
+            container.querySelectorAll('[data-stat]').forEach(el => {
+                const value = stats[el.dataset.stat];
+                if (value !== undefined) el.textContent = value;
+            });
+        })
+        .catch(err => console.error('Error refreshing dashboard stats:', err));
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    if (document.getElementById('dashboardStats')) {
+        setInterval(refreshDashboardStats, DASHBOARD_STATS_REFRESH);
+        document.addEventListener('visibilitychange', refreshDashboardStats);
+    }
+});
+
 // =====================================================
 // UTILITY FUNCTIONS
 // =====================================================
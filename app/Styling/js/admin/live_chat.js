@@ -5,16 +5,15 @@
 let currentChatSessionId = null;
 let currentChatUserName = null;
 let currentChatStatus = null;
-let chatRefreshInterval = null;
+let currentChatLocked = false;
+let chatEventSource = null;
+let lastMessageId = 0;
 
 // Close chat modal function
 function closeChatModal() {
     const modal = document.getElementById('chatModal');
     modal.style.display = 'none';
-    if (chatRefreshInterval) {
-        clearInterval(chatRefreshInterval);
-        chatRefreshInterval = null;
-    }
+    closeChatStream();
     currentChatSessionId = null;
 }
 
@@ -81,6 +80,7 @@ async function openChatModal(sessionId) {
         document.getElementById('chatSessionId').textContent = sessionId;
         currentChatUserName = data.user_name;
         currentChatStatus = data.status;
+        currentChatLocked = data.is_locked;
 
         // Check if chat is locked by another admin
         if (data.is_locked) {
@@ -113,21 +113,14 @@ async function openChatModal(sessionId) {
         }
 
         // Load messages
-        await loadChatMessages(sessionId);
+        await loadChatMessages(sessionId, true);
 
         // Show modal with flex display for centering
         document.getElementById('chatModal').style.display = 'flex';
 
 
-        // Start auto-refresh
-        if (chatRefreshInterval) {
-            clearInterval(chatRefreshInterval);
-        }
-        chatRefreshInterval = setInterval(() => {
-            if (currentChatSessionId) {
-                loadChatMessages(currentChatSessionId);
-            }
-        }, 3000); // Refresh every 3 seconds
+        // Listen for new messages pushed by the server
+        openChatStream(sessionId);
 
     } catch (error) {
 
@@ -135,10 +128,16 @@ async function openChatModal(sessionId) {
     }
 }
 
-// Load chat messages
-async function loadChatMessages(sessionId) {
+// Load chat messages after the last one shown (everything when reset is true)
+async function loadChatMessages(sessionId, reset = false) {
     try {
-        const response = await fetch(`/admin/get-chat-messages/${sessionId}`);
+        const container = document.getElementById('chatMessagesContent');
+        if (reset) {
+            container.innerHTML = '';
+            lastMessageId = 0;
+        }
+
+        const response = await fetch(`/admin/get-chat-messages/${sessionId}?after_message_id=${lastMessageId}`);
         const data = await response.json();
 
         if (data.error) {
@@ -146,37 +145,72 @@ async function loadChatMessages(sessionId) {
             return;
         }
 
-        const container = document.getElementById('chatMessagesContent');
-        container.innerHTML = '';
-
-        if (data.messages.length === 0) {
-            container.innerHTML = '<p style="text-align: center; color: #9ca3af;">No messages yet.</p>';
+        if (reset && data.messages.length === 0) {
+            container.innerHTML = '<p class="no-messages" style="text-align: center; color: #9ca3af;">No messages yet.</p>';
             return;
         }
 
-        data.messages.forEach(msg => {
-            const bubble = document.createElement('div');
-            bubble.className = `message-bubble message-${msg.sender_type}`;
+        data.messages.forEach(appendChatMessage);
+    } catch (error) {
 
-            let senderName = 'System';
-            if (msg.sender_type === 'user') {
-                senderName = currentChatUserName || 'User';
-            } else if (msg.sender_type === 'admin') {
-                senderName = 'You (Admin)';
-            }
+    }
+}
 
-            bubble.innerHTML = `
-                <div class="message-sender">${escapeHtml(senderName)}</div>
-                <div class="message-text">${escapeHtml(msg.message_text)}</div>
-                <div class="message-time">${formatChatTime(msg.created_at)}</div>
-            `;
-            container.appendChild(bubble);
-        });
+// Append one message bubble (skips messages already shown)
+function appendChatMessage(msg) {
+    if (msg.message_id <= lastMessageId) return;
+    lastMessageId = msg.message_id;
 
-        // Scroll to bottom
-        container.scrollTop = container.scrollHeight;
-    } catch (error) {
+    const container = document.getElementById('chatMessagesContent');
+    const placeholder = container.querySelector('.no-messages');
+    if (placeholder) placeholder.remove();
 
+    const bubble = document.createElement('div');
+    bubble.className = `message-bubble message-${msg.sender_type}`;
+
+    let senderName = 'System';
+    if (msg.sender_type === 'user') {
+        senderName = currentChatUserName || 'User';
+    } else if (msg.sender_type === 'admin') {
+        senderName = 'You (Admin)';
+    }
+
+    bubble.innerHTML = `
+        <div class="message-sender">${escapeHtml(senderName)}</div>
+        <div class="message-text">${escapeHtml(msg.message_text)}</div>
+        <div class="message-time">${formatChatTime(msg.created_at)}</div>
+    `;
+    container.appendChild(bubble);
+
+    // Scroll to bottom
+    container.scrollTop = container.scrollHeight;
+}
+
+// Server push: new messages and status changes arrive over Server-Sent Events
+function openChatStream(sessionId) {
+    closeChatStream();
+    chatEventSource = new EventSource(`/admin/chat-stream/${sessionId}?after=${lastMessageId}`);
+
+    chatEventSource.addEventListener('message', (e) => {
+        appendChatMessage(JSON.parse(e.data));
+    });
+    // After a dropped connection, pick up anything sent in between
+    chatEventSource.addEventListener('error', () => {
+        if (currentChatSessionId) loadChatMessages(currentChatSessionId);
+    });
+    chatEventSource.addEventListener('status', (e) => {
+        const state = JSON.parse(e.data);
+        if (!currentChatLocked && state.status !== currentChatStatus) {
+            currentChatStatus = state.status;
+            updateChatInputState();
+        }
+    });
+}
+
+function closeChatStream() {
+    if (chatEventSource) {
+        chatEventSource.close();
+        chatEventSource = null;
     }
 }
 
@@ -200,8 +234,8 @@ async function sendAdminMessage() {
         const data = await response.json();
 
         if (data.status === 'sent') {
+            // The message comes back over the chat stream
             input.value = '';
-            await loadChatMessages(currentChatSessionId);
         } else {
             alert('Failed to send message: ' + (data.error || 'Unknown error'));
         }
@@ -313,11 +347,8 @@ function closeChatModal() {
     currentChatUserName = null;
     currentChatStatus = null;
 
-    // Stop auto-refresh
-    if (chatRefreshInterval) {
-        clearInterval(chatRefreshInterval);
-        chatRefreshInterval = null;
-    }
+    // Stop listening for new messages
+    closeChatStream();
 }
 
 // Close modal when clicking outside
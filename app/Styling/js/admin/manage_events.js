@@ -102,3 +102,35 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     });
 });
+
+// =====================================================
+// NOTIFICATION FAN-OUT PROGRESS
+// =====================================================
+document.addEventListener('DOMContentLoaded', function () {
+    const banner = document.getElementById('fanoutProgress');
+    if (!banner) return;
+
+    const text = document.getElementById('fanoutProgressText');
+
+    function poll() {
+        fetch(banner.dataset.statusUrl)
+            .then(response => response.json())
+            .then(job => {
+                if (job.error && !job.status) return;
+                const total = job.total === null ? '…' : job.total;
+                text.textContent = `${job.processed} / ${total} (${job.status}, ${job.percent}%)`;
+
+                if (job.status === 'done') {
+                    banner.className = 'alert alert-success';
+                } else if (job.status === 'failed') {
+                    banner.className = 'alert alert-error';
+                    text.textContent += ` - ${job.error}`;
+                } else {
+                    setTimeout(poll, 1000);
+                }
+            })
+            .catch(() => setTimeout(poll, 3000));
+    }
+
+    poll();
+});
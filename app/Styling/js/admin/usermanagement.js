@@ -1,6 +1,6 @@
 /**
  * User Management Page JavaScript
- * Handles filtering, user actions, and modals for the admin user management page
+ * Handles server-side filtering/pagination, user actions, and modals for the admin user management page
  */
 
 document.addEventListener('DOMContentLoaded', function () {
@@ -10,16 +10,87 @@ document.addEventListener('DOMContentLoaded', function () {
     // Initialize name search functionality
     initializeNameSearch();
 
-    // Initialize all button handlers
-    initializeVerificationButtons();
-    initializeEditButtons();
-    initializeDeleteButtons();
+    // Initialize "Load more" / infinite scroll
+    initializeLoadMore();
+
+    // Initialize all button handlers (delegated, so rows loaded later work too)
+    initializeRowActions();
 });
 
 // =====================================================
-// FILTER FUNCTIONALITY
+// FILTER & PAGINATION
 // =====================================================
 
+const USERS_API = '/admin/api/users';
+let usersRequestId = 0;   // ignore responses that arrive after a newer filter/search
+let usersLoading = false;
+
+/**
+ * Current filter tab and search term
+ */
+function getUserQuery() {
+    const activeTab = document.querySelector('.filter-tab.active');
+    const searchInput = document.getElementById('nameSearchInput');
+    return {
+        filter: activeTab ? activeTab.dataset.filter : 'all',
+        search: searchInput ? searchInput.value.trim() : ''
+    };
+}
+
+/**
+ * Fetch a page of rendered user rows from the server.
+ * @param {string|null} cursor - next_cursor of the previous page, or null for the first page
+ * @param {boolean} append - append to the table instead of replacing it
+ */
+function loadUsers(cursor, append) {
+    const query = getUserQuery();
+    const params = new URLSearchParams({ filter: query.filter, search: query.search });
+    if (cursor) params.set('cursor', cursor);
+
+    const requestId = ++usersRequestId;
+    usersLoading = true;
+
+    return fetch(`${USERS_API}?${params}`)
+        .then(res => res.json())
+        .then(data => {
+            if (requestId !== usersRequestId) return;  // superseded
+
+            const tbody = document.getElementById('usersTableBody');
+            if (!append) {
+                tbody.innerHTML = data.count ? data.html : `
+                    <tr class="empty-row">
+                        <td colspan="9" style="text-align: center; color: #9ca3af; padding: 40px;">
+                            No users found.
+                        </td>
+                    </tr>`;
+            } else {
+                tbody.insertAdjacentHTML('beforeend', data.html);
+            }
+            setNextCursor(data.next_cursor);
+
+            // Keep the URL shareable / reload-safe
+            const url = new URL(window.location);
+            url.searchParams.set('filter', query.filter);
+            if (query.search) url.searchParams.set('search', query.search);
+            else url.searchParams.delete('search');
+            history.replaceState(null, '', url);
+        })
+        .catch(err => console.error('Error loading users:', err))
+        .finally(() => {
+            if (requestId === usersRequestId) usersLoading = false;
+        });
+}
+
+/**
+ * Remember where the next page starts and show/hide the Load more button
+ */
+function setNextCursor(cursor) {
+    const button = document.getElementById('loadMoreUsers');
+    if (!button) return;
+    button.dataset.nextCursor = cursor || '';
+    button.style.display = cursor ? '' : 'none';
+}
+
 /**
  * Initialize filter tab click handlers
  */
@@ -32,100 +103,79 @@ function initializeFilters() {
             filterTabs.forEach(t => t.classList.remove('active'));
             this.classList.add('active');
 
-            // Apply filter
-            const filter = this.dataset.filter;
-            filterUsers(filter);
+            // Reload the first page with the new filter
+            loadUsers(null, false);
         });
     });
 }
 
 /**
- * Filter users in the table based on role or verification status
- * @param {string} filter - 'all', 'senior', 'youth', or 'unverified'
- */
-function filterUsers(filter) {
-    const rows = document.querySelectorAll('#usersTableBody tr[data-role]');
-
-    rows.forEach(row => {
-        const role = row.dataset.role;
-        const status = row.dataset.status;
-
-        let show = false;
-
-        switch (filter) {
-            case 'all':
-                show = true;
-                break;
-            case 'senior':
-                show = role === 'senior';
-                break;
-            case 'youth':
-                show = role === 'youth';
-                break;
-            case 'unverified':
-                show = status !== 'verified';
-                break;
-            default:
-                show = true;
-        }
-
-        row.style.display = show ? '' : 'none';
-    });
-}
-
-/**
- * Initialize name search input handler
+ * Initialize name search input handler (debounced, searched server-side)
  */
 function initializeNameSearch() {
     const searchInput = document.getElementById('nameSearchInput');
+    let debounceTimer = null;
 
     if (searchInput) {
         searchInput.addEventListener('input', function () {
-            const searchTerm = this.value.toLowerCase().trim();
-            const rows = document.querySelectorAll('#usersTableBody tr[data-role]');
-
-            rows.forEach(row => {
-                const nameCell = row.querySelector('td:first-child strong');
-                if (nameCell) {
-                    const userName = nameCell.textContent.toLowerCase();
-                    const matchesSearch = userName.includes(searchTerm);
-
-                    // Only hide if doesn't match search AND current row is visible
-                    if (row.style.display !== 'none') {
-                        row.style.display = matchesSearch ? '' : 'none';
-                    } else if (matchesSearch) {
-                        // If it matches search but was hidden by role filter, check role filter
-                        const activeFilter = document.querySelector('.filter-tab.active');
-                        if (activeFilter) {
-                            filterUsers(activeFilter.dataset.filter);
-                        }
-                    }
-                }
-            });
+            clearTimeout(debounceTimer);
+            debounceTimer = setTimeout(() => loadUsers(null, false), 300);
         });
     }
 }
 
-// =====================================================
-// VERIFICATION MODAL
-// =====================================================
+/**
+ * Load the next page when "Load more" is clicked or scrolled into view
+ */
+function initializeLoadMore() {
+    const button = document.getElementById('loadMoreUsers');
+    if (!button) return;
+
+    const loadNext = () => {
+        const cursor = button.dataset.nextCursor;
+        if (cursor && !usersLoading) {
+            loadUsers(cursor, true);
+        }
+    };
+
+    button.addEventListener('click', loadNext);
+
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) loadNext();
+        }, { rootMargin: '200px' });
+        observer.observe(button);
+    }
+}
 
 /**
- * Initialize verification button handlers
+ * One click handler on the table body for the verify / edit / delete buttons
  */
-function initializeVerificationButtons() {
-    document.querySelectorAll('.verify-btn').forEach(btn => {
-        btn.addEventListener('click', function () {
-            const userId = this.dataset.userId;
-            const userName = this.dataset.userName;
-            const joinDate = this.dataset.joinDate;
-            const photo = this.dataset.photo;
-
-            openVerifyModal(userId, userName, joinDate, photo);
-        });
+function initializeRowActions() {
+    const tbody = document.getElementById('usersTableBody');
+    if (!tbody) return;
+
+    tbody.addEventListener('click', function (e) {
+        const btn = e.target.closest('button[data-user-id]');
+        if (!btn) return;
+
+        const userId = btn.dataset.userId;
+        const userName = btn.dataset.userName;
+
+        if (btn.classList.contains('verify-btn')) {
+            openVerifyModal(userId, userName, btn.dataset.joinDate, btn.dataset.photo);
+        } else if (btn.classList.contains('edit-btn')) {
+            openEditModal(userId, userName, btn.dataset.userEmail);
+        } else if (btn.classList.contains('delete-btn')) {
+            openDeleteModal(userId, userName);
+        }
     });
 }
 
+// =====================================================
+// VERIFICATION MODAL
+// =====================================================
+
 /**
  * Open the verification modal with user data
  */
@@ -179,21 +229,6 @@ function closeVerifyModal() {
 // EDIT USER MODAL
 // =====================================================
 
-/**
- * Initialize edit button handlers
- */
-function initializeEditButtons() {
-    document.querySelectorAll('.edit-btn').forEach(btn => {
-        btn.addEventListener('click', function () {
-            const userId = this.dataset.userId;
-            const userName = this.dataset.userName;
-            const userEmail = this.dataset.userEmail;
-
-            openEditModal(userId, userName, userEmail);
-        });
-    });
-}
-
 /**
  * Open the edit modal with user data
  */
@@ -228,20 +263,6 @@ function closeEditModal() {
 // DELETE USER MODAL
 // =====================================================
 
-/**
- * Initialize delete button handlers
- */
-function initializeDeleteButtons() {
-    document.querySelectorAll('.delete-btn').forEach(btn => {
-        btn.addEventListener('click', function () {
-            const userId = this.dataset.userId;
-            const userName = this.dataset.userName;
-
-            openDeleteModal(userId, userName);
-        });
-    });
-}
-
 /**
  * Open the delete confirmation modal
  */
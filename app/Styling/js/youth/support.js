@@ -83,7 +83,8 @@ function showTicketDetails(ticketId, element) {
 // =====================================================
 
 let currentChatSessionId = null;
-let chatRefreshInterval = null;
+let chatEventSource = null;
+let lastMessageId = 0;
 let previousAdminConnected = false;
 
 // Initialize live chat page when it becomes active
@@ -178,8 +179,8 @@ async function sendUserMessage() {
         });
 
         if (response.ok) {
+            // The message comes back over the chat stream
             input.value = '';
-            await loadMessages(currentChatSessionId);
         }
     } catch (error) {
 
@@ -187,91 +188,119 @@ async function sendUserMessage() {
     }
 }
 
-async function loadMessages(sessionId) {
+// Fetch messages after the last one shown (everything when reset is true) and append them
+async function loadMessages(sessionId, reset = false) {
     try {
-        const response = await fetch(`/get-messages/${sessionId}`);
+        const container = document.querySelector('.chat-messages');
+        if (reset) {
+            container.innerHTML = '';
+            lastMessageId = 0;
+        }
+
+        const response = await fetch(`/get-messages/${sessionId}?after_message_id=${lastMessageId}`);
         const data = await response.json();
 
-        const container = document.querySelector('.chat-messages');
-        container.innerHTML = '';
+        renderChatStatus(data.admin_connected, data.status);
+        data.messages.forEach(appendMessage);
+    } catch (error) {
 
-        // Check if admin is connected
-        const adminConnected = data.admin_connected;
-        const chatStatus = data.status;
+    }
+}
 
-        // Show notification if admin just connected (status changed from false to true)
-        if (adminConnected && !previousAdminConnected) {
-            showAdminConnectedNotification();
-        }
-        previousAdminConnected = adminConnected;
-
-        // Check if chat is closed
-        if (chatStatus === 'closed') {
-            const closedMessage = document.createElement('div');
-            closedMessage.className = 'system-message closed-message';
-            closedMessage.innerHTML = `
-                <div style="text-align: center; padding: 20px; color: #dc2626;">
-                    <div style="font-size: 16px; margin-bottom: 8px; font-weight: 600;">🔒 This chat has been closed</div>
-                    <div style="font-size: 14px; opacity: 0.8;">You can no longer send messages in this conversation.</div>
-                </div>
-            `;
-            container.appendChild(closedMessage);
-            disableChatInput();
-        } else if (!adminConnected) {
-            // Show waiting message if admin not connected
-            const waitingMessage = document.createElement('div');
-            waitingMessage.className = 'system-message waiting-message';
-            waitingMessage.innerHTML = `
-                <div style="text-align: center; padding: 20px; color: #64748b;">
-                    <div style="font-size: 16px; margin-bottom: 8px;">⏳ Please hold while we connect you to one of our admins...</div>
-                    <div style="font-size: 14px; opacity: 0.8;">You'll be able to chat once an admin joins the conversation.</div>
-                </div>
-            `;
-            container.appendChild(waitingMessage);
-            disableChatInput();
-        } else {
-            enableChatInput();
-        }
+// Show the waiting/closed banner at the top of the conversation and toggle the input
+function renderChatStatus(adminConnected, chatStatus) {
+    const container = document.querySelector('.chat-messages');
+    container.querySelectorAll('.system-message').forEach(el => el.remove());
+
+    // Show notification if admin just connected (status changed from false to true)
+    if (adminConnected && !previousAdminConnected) {
+        showAdminConnectedNotification();
+    }
+    previousAdminConnected = adminConnected;
+
+    // Check if chat is closed
+    if (chatStatus === 'closed') {
+        const closedMessage = document.createElement('div');
+        closedMessage.className = 'system-message closed-message';
+        closedMessage.innerHTML = `
+            <div style="text-align: center; padding: 20px; color: #dc2626;">
+                <div style="font-size: 16px; margin-bottom: 8px; font-weight: 600;">🔒 This chat has been closed</div>
+                <div style="font-size: 14px; opacity: 0.8;">You can no longer send messages in this conversation.</div>
+            </div>
+        `;
+        container.prepend(closedMessage);
+        disableChatInput();
+    } else if (!adminConnected) {
+        // Show waiting message if admin not connected
+        const waitingMessage = document.createElement('div');
+        waitingMessage.className = 'system-message waiting-message';
+        waitingMessage.innerHTML = `
+            <div style="text-align: center; padding: 20px; color: #64748b;">
+                <div style="font-size: 16px; margin-bottom: 8px;">⏳ Please hold while we connect you to one of our admins...</div>
+                <div style="font-size: 14px; opacity: 0.8;">You'll be able to chat once an admin joins the conversation.</div>
+            </div>
+        `;
+        container.prepend(waitingMessage);
+        disableChatInput();
+    } else {
+        enableChatInput();
+    }
+}
 
-        // Display messages
-        data.messages.forEach(msg => {
-            const bubble = document.createElement('div');
-            bubble.className = `message-bubble message-${msg.sender_type}`;
+// Append one message bubble (skips messages already shown)
+function appendMessage(msg) {
+    if (msg.message_id <= lastMessageId) return;
+    lastMessageId = msg.message_id;
 
-            let senderName = 'System';
-            if (msg.sender_type === 'user') {
-                senderName = 'You';
-            } else if (msg.sender_type === 'admin') {
-                senderName = 'Support Agent';
-            }
+    const container = document.querySelector('.chat-messages');
+    const bubble = document.createElement('div');
+    bubble.className = `message-bubble message-${msg.sender_type}`;
 
-            bubble.innerHTML = `
-                <div class="message-sender">${senderName}</div>
-                <div class="message-text">${escapeHtml(msg.message_text)}</div>
-                <div class="message-time">${formatChatTime(msg.created_at)}</div>
-            `;
-            container.appendChild(bubble);
-        });
+    let senderName = 'System';
+    if (msg.sender_type === 'user') {
+        senderName = 'You';
+    } else if (msg.sender_type === 'admin') {
+        senderName = 'Support Agent';
+    }
 
-        container.scrollTop = container.scrollHeight;
-    } catch (error) {
+    bubble.innerHTML = `
+        <div class="message-sender">${senderName}</div>
+        <div class="message-text">${escapeHtml(msg.message_text)}</div>
+        <div class="message-time">${formatChatTime(msg.created_at)}</div>
+    `;
+    container.appendChild(bubble);
+    container.scrollTop = container.scrollHeight;
+}
+
+// Server push: new messages and status changes arrive over Server-Sent Events
+function openChatStream(sessionId) {
+    closeChatStream();
+    chatEventSource = new EventSource(`/chat-stream/${sessionId}?after=${lastMessageId}`);
 
+    chatEventSource.addEventListener('message', (e) => {
+        appendMessage(JSON.parse(e.data));
+    });
+    // After a dropped connection, pick up anything sent in between
+    chatEventSource.addEventListener('error', () => {
+        if (currentChatSessionId) loadMessages(currentChatSessionId);
+    });
+    chatEventSource.addEventListener('status', (e) => {
+        const state = JSON.parse(e.data);
+        renderChatStatus(state.admin_connected, state.status);
+    });
+}
+
+function closeChatStream() {
+    if (chatEventSource) {
+        chatEventSource.close();
+        chatEventSource = null;
     }
 }
 
 async function loadChatSession(sessionId) {
     currentChatSessionId = sessionId;
-    await loadMessages(sessionId);
-
-    // Start auto-refresh for messages
-    if (chatRefreshInterval) {
-        clearInterval(chatRefreshInterval);
-    }
-    chatRefreshInterval = setInterval(() => {
-        if (currentChatSessionId) {
-            loadMessages(currentChatSessionId);
-        }
-    }, 3000); // Refresh every 3 seconds
+    await loadMessages(sessionId, true);
+    openChatStream(sessionId);
 }
 
 async function checkActiveChat() {
@@ -331,7 +360,7 @@ async function loadChatHistory() {
                     <p class="chat-list-preview">${escapeHtml(chat.last_message || 'No messages yet')}</p>
                     <div class="chat-list-meta">
                         <span class="chat-status ${statusClass}">${statusText}</span>
-                        <span class="chat-duration">${chat.message_count} messages</span>
+                        <span class="chat-duration">${chat.message_count} messages${chat.unread_count ? ` · ${chat.unread_count} new` : ''}</span>
                     </div>
                 </div>
             `;
@@ -347,11 +376,8 @@ function showChatList() {
     document.getElementById('chat-list-view').classList.add('active');
     document.getElementById('chat-conversation-view').classList.remove('active');
 
-    // Stop auto-refresh
-    if (chatRefreshInterval) {
-        clearInterval(chatRefreshInterval);
-        chatRefreshInterval = null;
-    }
+    // Stop listening for new messages
+    closeChatStream();
 
     loadChatHistory();
 }
@@ -453,11 +479,8 @@ async function confirmEndChat() {
         console.log('Response data:', data);
 
         if (response.ok && data.status === 'closed') {
-            // Stop auto-refresh
-            if (chatRefreshInterval) {
-                clearInterval(chatRefreshInterval);
-                chatRefreshInterval = null;
-            }
+            // Stop listening for new messages
+            closeChatStream();
 
             // Show success notification
             showCustomAlert('Chat ended successfully', 'success');
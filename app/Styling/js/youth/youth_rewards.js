@@ -59,21 +59,22 @@ document.addEventListener('DOMContentLoaded', function () {
             const name = this.dataset.name;
             const vendor = this.dataset.vendor;
             const points = parseInt(this.dataset.points) || 0;
+            const rewardId = this.dataset.rewardId;
 
-            if (name && vendor && points) {
-                attemptRedeem(name, vendor, points);
+            if (rewardId && name && vendor && points) {
+                attemptRedeem(rewardId, name, vendor, points);
             }
         });
     });
 
     let pendingRedemption = null;
 
-    function attemptRedeem(title, vendor, points) {
+    function attemptRedeem(rewardId, title, vendor, points) {
         if (userPoints < points) {
             showSnackbar('Error: Insufficient points');
             setTimeout(hideSnackbar, 5000);
         } else {
-            pendingRedemption = { title, vendor, points };
+            pendingRedemption = { rewardId, title, vendor, points };
             showRedeemModal(title, vendor, points);
         }
     }
@@ -113,7 +114,7 @@ document.addEventListener('DOMContentLoaded', function () {
     window.confirmRedeem = function () {
         if (!pendingRedemption) return;
 
-        const { title, vendor, points } = pendingRedemption;
+        const { rewardId, points } = pendingRedemption;
         hideRedeemModal();
 
         // Perform AJAX request
@@ -123,16 +124,14 @@ document.addEventListener('DOMContentLoaded', function () {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
-                reward_name: title,
-                reward_vendor: vendor,
-                points_required: points
+                reward_id: rewardId
             })
         })
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
-                    // Deduct points locally
-                    userPoints -= points;
+                    // Points are reserved on the server; show its balance
+                    userPoints = (typeof data.points === 'number') ? data.points : userPoints - points;
                     const pointsDisplay = document.getElementById('user-points');
                     if (pointsDisplay) {
                         pointsDisplay.textContent = userPoints + ' Points';
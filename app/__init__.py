@@ -34,8 +34,12 @@ def create_app():
     )
     
     # Run database migrations
-    from .db import migrate_database
+    from .db import migrate_database, close_db, check_db_settings
     migrate_database()
+    check_db_settings()
+
+    # Return each request's pooled connection at teardown
+    app.teardown_appcontext(close_db)
 
     # Register blueprints (Youth/Senior only - NO admin)
     from .Python_Files.Home import home_bp
@@ -71,8 +75,16 @@ def create_admin_app():
     app.config['TEMPLATES_AUTO_RELOAD'] = True
     
     # Run database migrations
-    from .db import migrate_database
+    from .db import migrate_database, close_db, check_db_settings
     migrate_database()
+    check_db_settings()
+
+    # Return each request's pooled connection at teardown
+    app.teardown_appcontext(close_db)
+
+    # Background worker that sends queued bulk notifications
+    from .notifications import start_fanout_worker
+    start_fanout_worker()
 
     # Register ONLY admin blueprint
     from .Python_Files.Admin import admin_bp